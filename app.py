@@ -1,24 +1,44 @@
+from __future__ import annotations
+
+from device_app.startup import Lazy, StartupReport
+
+# Import and initialization times, printed once the app is ready and reported by /health
+startup = StartupReport()
+
 import dash
+import flask
 import dash_bootstrap_components as dbc
 from dash import dcc
 from dash import html
-from dash.dependencies import Input, Output, State
+from dash.dependencies import ClientsideFunction, Input, Output, State
+from dash import Patch
+from dash.exceptions import PreventUpdate
 import plotly.graph_objs as go
-import pandas as pd
 import threading
-from sqlalchemy import create_engine
-from typing import Optional, Dict, Tuple
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+import base64
+from typing import Optional, Dict, Tuple, TYPE_CHECKING
 
-# Import the sensor class
-from device_app.sensor1 import TemperatureSensor
-from device_app.sensor2 import PressureSensor
-from device_app.sensor3 import RadiationSensor
+startup.mark('import dash')
 
-from device_app.monitoring_service import MonitoringService
+# pandas, numpy, SQLAlchemy and the sensor modules are imported on first use
+from device_app.profiling import CallbackProfiler
+from device_app.push import PushHub
+from device_app.query_cache import QueryCache
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+    from device_app.control_plane import SensorSnapshot
 
 from dotenv import load_dotenv
+import hmac
 import os
 
+startup.mark('import app modules')
+
 # Load the .env file
 load_dotenv()
 
@@ -28,56 +48,224 @@ load_dotenv()
 #db_password = os.getenv("DB_PASSWORD")
 #db_host = os.getenv("DB_HOST")
 #db_port = os.getenv("DB_PORT")
-database_url = os.getenv("DATABASE_URL")
+# Without DATABASE_URL the dashboard runs on an embedded SQLite file next to the CSV logs
+database_url = os.getenv("DATABASE_URL", "sqlite:///logs/sensor_data.db")
 
 # Database connection string
 #db_engine = create_engine(f'postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}')
-db_engine = create_engine(database_url)
+# Sensors write through the ingest pool, dashboard callbacks read through the query pool.
+# A sqlite:/// URL selects the embedded SQLite backend instead of PostgreSQL.
+# Both are created on first use, so the server binds its port without waiting for the database.
+def open_app_database():
+    """Opens the database of DATABASE_URL, with its queries attributed to the callbacks running them."""
+    from device_app.database import open_database
+    db = open_database(
+        database_url,
+        ingest_pool_size=int(os.getenv("DB_INGEST_POOL_SIZE", 3)),
+        query_pool_size=int(os.getenv("DB_QUERY_POOL_SIZE", 5)),
+    )
+    profiler.watch_database(db)
+    return db
+
+
+def open_app_store():
+    """Opens the measurement store: per-sensor tables (default) or a single narrow measurements table."""
+    from device_app.storage import open_store
+    return open_store(
+        database.get(),
+        layout=os.getenv("STORAGE_LAYOUT", "per_sensor"),
+        keep_logged=os.getenv("STORAGE_KEEP_LOGGED", "0") == "1",
+    )
+
+
+# Wall time, database time, rows and response size of every callback; slower ones than the budget are logged
+profiler = CallbackProfiler(budget=float(os.getenv("CALLBACK_BUDGET_MS", 500)) / 1000)
+database = Lazy('database', open_app_database, startup)
+store = Lazy('store', open_app_store, startup)
+# Query results shared by all browser sessions, dropped whenever their sensor ingests a measurement
+query_cache = QueryCache(
+    max_bytes=int(os.getenv("QUERY_CACHE_MAX_MB", 64)) * 2**20,
+    ttl=float(os.getenv("QUERY_CACHE_TTL", 1.0)),
+)
+# 'figure' builds the live graph on the server, 'binary' sends compact arrays rendered in the browser
+GRAPH_PAYLOAD = os.getenv("GRAPH_PAYLOAD", "figure")
+if GRAPH_PAYLOAD not in ('figure', 'binary'):
+    raise ValueError(f"Unknown GRAPH_PAYLOAD: {GRAPH_PAYLOAD}")
+# New measurements and log lines pushed to the browsers over server-sent events. Every open stream holds
+# a server thread: beyond STREAM_MAX_SUBSCRIBERS per process browsers poll, and every STREAM_MAX_AGE
+# seconds a stream ends and its browser reconnects, so the streams take turns with the threads.
+push_hub = PushHub(
+    max_subscribers=int(os.getenv("STREAM_MAX_SUBSCRIBERS", 8)) or None,
+    max_age=float(os.getenv("STREAM_MAX_AGE", 300)) or None,
+)
 
 # Initialize the Dash app
 #app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], suppress_callback_exceptions=True)
+# WSGI entry point for multi-worker servers, e.g. gunicorn app:server
+server = app.server
+
+
+@app.server.route('/health')
+def health() -> flask.Response:
+    """Reports database and control plane reachability, connection pool usage and query cache counters."""
+    status = database.health_check()
+    try:
+        status['control_plane'] = control.ping()
+    except (EOFError, OSError):
+        status['control_plane'] = False
+    code = 200 if all(status.values()) else 503
+    return flask.jsonify(database=status, pools=database.pool_metrics(), cache=query_cache.stats(),
+                         push={'subscribers': push_hub.subscribers, 'published': push_hub.published,
+                               'dropped': push_hub.dropped, 'rejected': push_hub.rejected},
+                         startup=startup.as_dict()), code
+
+
+@app.server.route('/stream')
+def stream() -> flask.Response:
+    """Server-sent events stream of the measurements and log lines of the sensor given by ?sensor=."""
+    start_relay()
+    subscriber = push_hub.subscribe(flask.request.args.get('sensor'))
+    if subscriber is None:
+        # Every stream slot of this worker is taken, the browser polls and tries again later
+        return flask.Response('Too many open streams', status=503, headers={'Retry-After': '30'})
+    return flask.Response(flask.stream_with_context(push_hub.stream(subscriber)),
+                          mimetype='text/event-stream',
+                          headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+# Callback statistics and profiler captures, only served when ADMIN_TOKEN is set
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+
+def check_admin_token() -> None:
+    """Aborts the request unless it carries ADMIN_TOKEN in the X-Admin-Token header or the token parameter."""
+    if not ADMIN_TOKEN:
+        flask.abort(404)
+    token = flask.request.headers.get('X-Admin-Token') or flask.request.args.get('token', '')
+    if not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        flask.abort(403)
+
+
+@app.server.route('/admin/callbacks')
+def admin_callbacks() -> flask.Response:
+    """Rolling statistics of every callback in this worker, the recent slow invocations and the capture status."""
+    check_admin_token()
+    return flask.jsonify(profiler.stats())
+
+
+@app.server.route('/admin/ingest')
+def admin_ingest() -> flask.Response:
+    """Statistics of the socket ingest addresses of the control plane and their senders."""
+    check_admin_token()
+    return flask.jsonify(control.ingest_sources())
+
+
+@app.server.route('/admin/profile', methods=['GET', 'POST'])
+def admin_profile() -> flask.Response:
+    """
+    Arms a capture (POST) or downloads the last completed one (GET).
+
+    POST parameters: kind (cprofile or tracemalloc), invocations (default 10)
+    and callback (default any). GET returns the text report, or with
+    ?format=pstats the cProfile statistics for pstats or snakeviz.
+    """
+    check_admin_token()
+    if flask.request.method == 'POST':
+        try:
+            status = profiler.arm_capture(flask.request.values.get('kind', 'cprofile'),
+                                          int(flask.request.values.get('invocations', 10)),
+                                          flask.request.values.get('callback') or None)
+        except ValueError as e:
+            return flask.jsonify(error=str(e)), 400
+        return flask.jsonify(status), 202
+
+    result = profiler.capture_result()
+    if result is None:
+        return flask.jsonify(error="No capture completed yet", capture=profiler.capture_status()), 404
+    stamp = result['completed_at'].replace(':', '')
+    if flask.request.args.get('format') == 'pstats':
+        if 'stats' not in result:
+            return flask.jsonify(error="The last capture is not a cProfile capture"), 400
+        return flask.Response(result['stats'], mimetype='application/octet-stream', headers={
+            'Content-Disposition': f'attachment; filename=callbacks-{stamp}.prof'})
+    return flask.Response(result['report'], mimetype='text/plain', headers={
+        'Content-Disposition': f'attachment; filename=callbacks-{result["kind"]}-{stamp}.txt'})
+
+
+# Sensors, watchdog and experiments live in the control plane. Without CONTROL_PLANE_ADDRESS it runs
+# inside this process; with it the dashboard is stateless and talks to the controller process
+# (python -m device_app.control_plane), so it can be served by several worker processes.
+# The control plane is created on first use as well.
+def open_control_plane():
+    """Connects to the controller process of CONTROL_PLANE_ADDRESS, or starts the control plane in this process."""
+    from device_app.control_plane import ControlPlane, ControlPlaneClient
+    address = os.getenv("CONTROL_PLANE_ADDRESS")
+    if address:
+        return ControlPlaneClient(address, os.getenv("CONTROL_PLANE_AUTHKEY"))
+    control_plane = ControlPlane(store.get())
+    control_plane.start()
+    control_plane.listen(os.getenv("INGEST_LISTEN"))
+    return control_plane
+
+
+control = Lazy('control plane', open_control_plane, startup)
+
+
+def relay_events() -> None:
+    """Forwards the measurements and log lines published by the control plane to this worker's browsers."""
+    sequence = None
+    while True:
+        try:
+            sequence, events = control.events_since(sequence, timeout=5.0)
+        except (EOFError, OSError) as e:
+            print(f"Control plane unreachable, retrying: {e}")
+            sequence = None
+            time.sleep(1.0)
+            continue
+        for topic, event, data in events:
+            push_hub.publish(topic, event, data)
+
+
+relay_lock = threading.Lock()
+relay_thread = None
+
+
+def start_relay() -> None:
+    """Starts relaying the control plane's events once the first browser subscribes to them."""
+    global relay_thread
+    with relay_lock:
+        if relay_thread is None:
+            relay_thread = threading.Thread(target=relay_events, name='control-plane-relay', daemon=True)
+            relay_thread.start()
+
+# Data version of every sensor the cached query results were read at
+cached_versions = {}
+
+
+def sync_query_cache(snapshots: list) -> None:
+    """Drops the cached results of the sensors which ingested data since they were read."""
+    for snapshot in snapshots:
+        if cached_versions.get(snapshot.name) != snapshot.data_version:
+            query_cache.invalidate(snapshot.name)
+            cached_versions[snapshot.name] = snapshot.data_version
 
-# Initialize the TemperatureSensor
-temperature_sensor = TemperatureSensor(name="temperature_sensor", db_conn=db_engine.raw_connection())
-# Initialize the PressureSensor
-pressure_sensor = PressureSensor(name="pressure_sensor", db_conn=db_engine.raw_connection(), loglogs=True)
-# Initialize the RadiationSensor
-radiation_sensor = RadiationSensor(name="radiation_sensor", db_conn=db_engine.raw_connection())
 
 sensor_details = {
     'temperature_sensor': {
-        'sensor': temperature_sensor,
         'data_column': 'temperature',
         'xaxis_title': 'Temperature (°C)'
     },
     'pressure_sensor': {
-        'sensor': pressure_sensor,
         'data_column': 'pressure',
         'xaxis_title': 'Pressure (bar)'
     },
     'radiation_sensor': {
-        'sensor': radiation_sensor,
         'data_column': 'radiation',
         'xaxis_title': 'Radiation (mSv/h)'
     }
 }
 
-# Import experiment modules
-import threading
-import experiment_app.experiment1 as experiment1
-import experiment_app.experiment2 as experiment2
-import experiment_app.experiment3 as experiment3
-from queue import Empty  # Import Empty exception for queues
-
-# Function to get the log message from the queue
-def get_log_message(log_queue):
-    try:
-        # Try to get the message from the queue with a timeout
-        return log_queue.get(timeout=2)
-    except Empty:
-        return "No log message returned."
-
 
 # Functions ------------------------------------------------------------------------------------
 
@@ -154,6 +342,13 @@ def build_tabs() -> html.Div:
                         value="tab3",
                         className="custom-tab",
                         selected_className="custom-tab--selected",
+                    ),
+                    dcc.Tab(
+                        id="Fleet-tab",
+                        label="Fleet Overview",
+                        value="tab4",
+                        className="custom-tab",
+                        selected_className="custom-tab--selected",
                     )
                 ],
             )
@@ -274,6 +469,7 @@ app.layout = html.Div(
         generate_modal(),
     ],
 )
+startup.mark('layout')
 
 
 def build_tab1() -> html.Div:
@@ -325,6 +521,22 @@ def build_tab1() -> html.Div:
                                'padding-left': '10px'}
                     ),
                 ], style={'margin-bottom': '20px'}),
+                html.Div([
+                    html.H4('Overlay Sensors', style={'padding-left': '10px'}),
+                    dcc.Dropdown(
+                        id='overlay-sensors',
+                        options=[
+                            {'label': 'Temperature Sensor', 'value': 'temperature_sensor'},
+                            {'label': 'Pressure Sensor', 'value': 'pressure_sensor'},
+                            {'label': 'Radiation Sensor', 'value': 'radiation_sensor'},
+                        ],
+                        value=[],
+                        multi=True,
+                        placeholder='None',
+                        style={'width': '80%',
+                               'padding-left': '10px'}
+                    ),
+                ], style={'margin-bottom': '20px'}),
 
                 html.Hr(),
                 html.Div([
@@ -334,21 +546,25 @@ def build_tab1() -> html.Div:
                     html.Button('Start Measuring', id='start-measuring', n_clicks=0, style={'margin-left': '10px'}),
                     html.Button('Stop Measuring', id='stop-measuring', n_clicks=0, style={'margin-left': '10px'}),
                     html.Div(id='sensor-status', style={'margin-left': '20px', 'margin-right': 'auto', 'padding-top': '10px'}),                    
+                    html.Div(id='sensor-rate', style={'margin-left': '20px', 'margin-right': 'auto', 'padding-top': '5px'}),
+                    html.Div(id='push-status', style={'margin-left': '20px', 'margin-right': 'auto', 'padding-top': '5px'}),
                 ]),
                 
                 html.Div(id='alert-banner', style={'color': 'red', 'font-weight': 'bold', 'margin': '10px', 'padding-left': '10px', 'padding-top': '100px'}),
-                dcc.Interval(id='alert-update', interval=2000, n_intervals=0),
 
             ], width=3),
             # Right Column: Graph and Logs
             dbc.Col([
                 # The plot
                 dcc.Graph(id='live-graph', animate=False, style={'margin-left': '10px', 'margin-right': '10px', 'border-radius': '25px'}),#,'border': '1px solid blue'}), # borde radius doesn't work to round out borders, doesn't matter tho
+                # One timer refreshes the graph, logs, alert and rate; unchanged parts are skipped
                 dcc.Interval(
-                    id='graph-update',
+                    id='refresh-update',
                     interval=2000,  # in milliseconds
                     n_intervals=0, 
                 ),
+                dcc.Store(id='refresh-versions', data={}),
+                dcc.Store(id='live-graph-payload'),
                 html.Hr(),
                 html.Div([
                     #html.H4('Sensor Logs'),
@@ -367,7 +583,6 @@ def build_tab1() -> html.Div:
                         'backgroundColor': '#000000',
                         'margin-right': '20px'
                     }),
-                    dcc.Interval(id='log-update', interval=2000, n_intervals=0),
                 ]),
             ], width=9),
         ]),
@@ -382,6 +597,7 @@ def build_tab2() -> html.Div:
     html.Div
         A Dash component representing the second tab's content.
     """
+    limits = {snapshot.name: snapshot for snapshot in control.snapshots()}
     return html.Div([
         html.H3('Specification Settings', style={'margin-left': '10px'}),
         html.Div([
@@ -401,13 +617,13 @@ def build_tab2() -> html.Div:
                         html.Td(dcc.Input(
                             id='temp-ucl',
                             type='number',
-                            value=temperature_sensor.ucl,
+                            value=limits['temperature_sensor'].ucl,
                             style={'width': '100px'}
                         )),
                         html.Td(dcc.Input(
                             id='temp-lcl',
                             type='number',
-                            value=temperature_sensor.lcl,
+                            value=limits['temperature_sensor'].lcl,
                             style={'width': '100px'}
                         )),
                         html.Td(html.Button('Update Limits', id='update-temp-limits', n_clicks=0)),
@@ -418,13 +634,13 @@ def build_tab2() -> html.Div:
                         html.Td(dcc.Input(
                             id='pressure-ucl',
                             type='number',
-                            value=pressure_sensor.ucl,
+                            value=limits['pressure_sensor'].ucl,
                             style={'width': '100px'}
                         )),
                         html.Td(dcc.Input(
                             id='pressure-lcl',
                             type='number',
-                            value=pressure_sensor.lcl,
+                            value=limits['pressure_sensor'].lcl,
                             style={'width': '100px'}
                         )),
                         html.Td(html.Button('Update Limits', id='update-pressure-limits', n_clicks=0)),
@@ -435,13 +651,13 @@ def build_tab2() -> html.Div:
                         html.Td(dcc.Input(
                             id='radiation-ucl',
                             type='number',
-                            value=radiation_sensor.ucl,
+                            value=limits['radiation_sensor'].ucl,
                             style={'width': '100px'}
                         )),
                         html.Td(dcc.Input(
                             id='radiation-lcl',
                             type='number',
-                            value=radiation_sensor.lcl,
+                            value=limits['radiation_sensor'].lcl,
                             style={'width': '100px'}
                         )),
                         html.Td(html.Button('Update Limits', id='update-radiation-limits', n_clicks=0)),
@@ -512,12 +728,28 @@ def build_tab3() -> html.Div:
         ], style={'width': '100%', 'border': '1px solid #000', 'padding': '10px', 'margin-bottom': '10px'}),
 
 
-        # Terminal log
+        # Terminal log, refreshed from the lifecycle events of the experiments and sensors
         html.H3("Log", style={'margin-left': '10px'}),
         html.Div(id='terminal_experiment', style={
             'whiteSpace': 'pre-line', 'border': '1px solid white', 'padding': '10px', 'margin-left': '20px', 'margin-right': '20px',
             'height': '300px', 'overflowY': 'scroll', 'backgroundColor': '#000000'
         }),
+        dcc.Interval(id='experiment-update', interval=1000, n_intervals=0),
+        dcc.Store(id='experiment-log-version', data=None),
+    ])
+
+
+def build_tab4() -> html.Div:
+    """
+    Builds the fourth tab of the application, an overview tile for every sensor.
+
+    Returns:
+        html.Div: The fourth tab of the application
+    """
+    return html.Div([
+        html.H3("Fleet Overview", style={'margin-left': '10px'}),
+        html.Div(id='fleet-tiles', className='fleet-grid', children=build_fleet_tiles()),
+        dcc.Interval(id='fleet-update', interval=5000, n_intervals=0),
     ])
 
 
@@ -546,6 +778,8 @@ def render_tab_content(
         return build_tab2()
     elif tab_switch == "tab3":
         return build_tab3()
+    elif tab_switch == "tab4":
+        return build_tab4()
     
 
 # ======= Callbacks for modal popup =======
@@ -642,16 +876,13 @@ def update_limits(
         button_id = ctx.triggered[0]['prop_id'].split('.')[0]
 
     if button_id == 'update-temp-limits' and temp_n_clicks:
-        temperature_sensor.ucl = temp_ucl
-        temperature_sensor.lcl = temp_lcl
+        control.set_limits('temperature_sensor', temp_ucl, temp_lcl)
         return 'Temperature sensor limits updated.'
     elif button_id == 'update-pressure-limits' and pressure_n_clicks:
-        pressure_sensor.ucl = pressure_ucl
-        pressure_sensor.lcl = pressure_lcl
+        control.set_limits('pressure_sensor', pressure_ucl, pressure_lcl)
         return 'Pressure sensor limits updated.'
     elif button_id == 'update-radiation-limits' and radiation_n_clicks:
-        radiation_sensor.ucl = radiation_ucl
-        radiation_sensor.lcl = radiation_lcl
+        control.set_limits('radiation_sensor', radiation_ucl, radiation_lcl)
         return 'Radiation sensor limits updated.'
     return ''
 
@@ -711,250 +942,419 @@ def control_sensor(
     Returns:
         html.Span: A color-coded Span element with the current sensor status.
     """
-    details = sensor_details[device_name]
-    current_sensor = details['sensor']
+    commands = {
+        'start-sensor': 'start',
+        'stop-sensor': 'stop',
+        'start-measuring': 'start_measuring',
+        'stop-measuring': 'stop_measuring',
+        'detailed-logs': 'toggle_loglogs',
+    }
 
     ctx = dash.callback_context
-    if not ctx.triggered:
-        # Color-coded status
-        status = current_sensor.state.value
-        color = get_status_color(status)
-        return html.Span(f"Sensor Status: {status}", style={'color': color})
+    button_id = ctx.triggered[0]['prop_id'].split('.')[0] if ctx.triggered else None
+    if button_id in commands:
+        status = control.sensor_command(device_name, commands[button_id])
     else:
-        button_id = ctx.triggered[0]['prop_id'].split('.')[0]
-
-    if button_id == 'start-sensor':
-        current_sensor.start()
-    elif button_id == 'stop-sensor':
-        current_sensor.stop()
-    elif button_id == 'start-measuring':
-        if current_sensor.state in (current_sensor.state.ON, current_sensor.state.IDLE):
-            current_sensor.start_measuring()
-    elif button_id == 'stop-measuring':
-        current_sensor.stop_measuring()
-    elif button_id == 'detailed-logs':
-        current_sensor.change_loglogs()
+        status = control.snapshot(device_name).state.value
 
     # Color-coded status
-    status = current_sensor.state.value
     color = get_status_color(status)
     return html.Span(f"Sensor Status: {status}", style={'color': color})
 
 
+# Effective polling rate ____________________________________________________________________________
+def build_sensor_rate(snapshot: SensorSnapshot) -> str:
+    """
+    Shows the effective polling rate of the selected sensor.
+
+    Parameters
+    ----------
+    snapshot : SensorSnapshot
+        The snapshot of the device to show the rate for.
+
+    Returns
+    -------
+    str
+        The polling interval and rate of the sensor.
+    """
+    return f"Polling every {snapshot.interval:.2f} s ({snapshot.rate:.2f} Hz)"
+
+
+# Subscribe to the pushed updates of the selected sensor (assets/push.js) ___________________________
+app.clientside_callback(
+    ClientsideFunction(namespace='push', function_name='subscribe'),
+    Output('push-status', 'children'),
+    Input('device-selector', 'value')
+)
+
+# Render the compact live graph payload in the browser (assets/live_graph.js) _______________________
+if GRAPH_PAYLOAD == 'binary':
+    app.clientside_callback(
+        ClientsideFunction(namespace='live_graph', function_name='render'),
+        Output('live-graph', 'figure'),
+        Input('live-graph-payload', 'data')
+    )
+
+
 # Callback to update the live graph __________________________________________________________________
 from plotly.subplots import make_subplots
 
-@app.callback(
-    Output('live-graph', 'figure'),
-    [Input('graph-update', 'n_intervals'),
-     Input('device-selector', 'value'),
-     Input('time-interval', 'value')]
-)
-def update_graph_live(
-    n: int,  # Number of times the update interval has passed
-    device_name: str,  # Name of the selected device
-    time_interval: str  # Selected time interval
-) -> go.Figure:
+# Map the time-interval dropdown values to time deltas
+TIME_DELTAS = {
+    '5min': timedelta(minutes=5),
+    '15min': timedelta(minutes=15),
+    '1h': timedelta(hours=1),
+    '12h': timedelta(hours=12),
+    '1d': timedelta(days=1),
+    '5d': timedelta(days=5),
+    '1M': timedelta(days=30),
+}
+
+# Above this many points in a trace the live graph is drawn with WebGL (Scattergl)
+WEBGL_THRESHOLD = int(os.getenv("GRAPH_WEBGL_THRESHOLD", 5000))
+
+# Colors of the selected sensor and of the overlaid ones
+SERIES_COLORS = ['blue', 'green', 'purple']
+
+
+def load_live_window(device_name: str, time_interval: str) -> pd.DataFrame:
     """
-    Updates the live graph with the latest data from the database.
+    Reads the live graph's time window.
+
+    The monitoring checks do not run here: the control plane checks every new
+    measurement once as it is ingested, and its watchdog detects device failures.
 
     Args:
-        n (int): Number of times the update interval has passed.
-        device_name (str): Name of the selected device.
+        device_name (str): Name of the device.
         time_interval (str): Selected time interval.
 
     Returns:
-        go.Figure: The updated graph figure.
+        pd.DataFrame: Columns timestamp_measured and the sensor's data column.
     """
-    #current_sensor, data_column, yaxis_title = current_sensor_device_name(device_name)
-    details = sensor_details[device_name]
-    current_sensor = details['sensor']
-    data_column = details['data_column']
-    yaxis_title = details['xaxis_title']
-
-    # Get control limits from the sensor object
-    ucl = current_sensor.ucl
-    lcl = current_sensor.lcl
+    data_column = sensor_details[device_name]['data_column']
 
     # Map time_interval to time delta ___________________________________
-    time_deltas = {
-        '5min': '5 minutes',
-        '15min': '15 minutes',
-        '1h': '1 hour',
-        '12h': '12 hours',
-        '1d': '1 day',
-        '5d': '5 days',
-        '1M': '1 month'
-    }
-    time_delta = time_deltas[time_interval]
+    time_delta = TIME_DELTAS[time_interval]
 
-    # Monitoring service ________________________________________________
-    
-    # Build the query to get data within the time interval
-    table_name = f"{current_sensor.name}_measurements"
-    query = f"""
-        SELECT * FROM {table_name}
-        WHERE timestamp_measured >= NOW() - INTERVAL '{time_delta}'
-        ORDER BY timestamp_measured ASC
-    """
-    df = pd.read_sql_query(query, db_engine)
+    # Read the data within the time interval, shared with every session showing the same view
+    return query_cache.get(
+        (device_name, time_interval, 'raw'),
+        lambda: store.fetch_window(device_name, data_column, since=datetime.now() - time_delta),
+    )
 
-    monitoring_service = MonitoringService(current_sensor)
 
-    # Check for device failure
-    warnings = monitoring_service.check_device_failure(df)
+def overlay_axis(index: int) -> str:
+    """Name of the y axis of the index-th overlaid sensor, after the two axes of the subplots."""
+    return f'y{index + 3}'
 
-    if df.empty:
-        # Log warnings
-        for warning in warnings:
-            current_sensor.log_warning(warning)
-        return go.Figure()
 
-    # Check for out-of-control points
-    out_of_control_warnings = monitoring_service.check_out_of_control(df, data_column)
-    warnings.extend(out_of_control_warnings)
+def series_traces(device_name: str, df: pd.DataFrame, color: str, yaxis: str = 'y') -> list:
+    """
+    Builds the traces of one sensor on the live graph.
 
-    # Log warnings
-    for warning in warnings:
-        current_sensor.log_warning(warning)
+    The values are one single-colored trace and the out-of-control points a
+    separate red marker trace on top of it, instead of one color per point.
+    Above WEBGL_THRESHOLD points both are drawn with WebGL.
 
-    # Create subplots __________________________________________________
-    fig = make_subplots(rows=1, cols=2, shared_yaxes=True,
-                        column_widths=[0.7, 0.3],
-                        horizontal_spacing=0.02)
+    Args:
+        device_name (str): Name of the device.
+        df (pd.DataFrame): The sensor's time window.
+        color (str): Color of the values.
+        yaxis (str, optional): The y axis the traces are drawn on. Defaults to 'y'.
 
-    # Set marker colors based on control limits
-    colors = ['red' if y > current_sensor.ucl or y < current_sensor.lcl else 'blue' for y in df[data_column]]
+    Returns:
+        list: The value trace and the out-of-control trace.
+    """
+    details = sensor_details[device_name]
+    sensor = control.snapshot(device_name)
+    data_column = details['data_column']
+    label = device_name.replace("_", " ").title()
+    values = df[data_column]
+    out_of_control = (values > sensor.ucl) | (values < sensor.lcl)
 
-    # Main time-series plot
-    fig.add_trace(
-        go.Scatter(
+    scatter = go.Scattergl if len(df) > WEBGL_THRESHOLD else go.Scatter
+    return [
+        scatter(
             x=df['timestamp_measured'],
-            y=df[data_column],
+            y=values,
             mode='lines+markers',
-            name=data_column.capitalize(),
-            marker=dict(color=colors)
+            name=label,
+            line=dict(color=color),
+            marker=dict(color=color),
+            yaxis=yaxis,
         ),
-        row=1, col=1
-    )
-
-    # Lines for control limits
-    fig.add_trace(
-        go.Scatter(
-            x=[df['timestamp_measured'].iloc[0], df['timestamp_measured'].iloc[-1]],
-            y=[ucl, ucl],
-            mode='lines',
-            name='UCL',
-            line=dict(color='red', dash='dash')
+        scatter(
+            x=df['timestamp_measured'][out_of_control],
+            y=values[out_of_control],
+            mode='markers',
+            name=f'{label} out of control',
+            marker=dict(color='red', size=9),
+            yaxis=yaxis,
         ),
-        row=1, col=1
-    )
+    ]
 
-    fig.add_trace(
-        go.Scatter(
-            x=[df['timestamp_measured'].iloc[0], df['timestamp_measured'].iloc[-1]],
-            y=[lcl, lcl],
-            mode='lines',
-            name='LCL',
-            line=dict(color='red', dash='dash')
-        ),
-        row=1, col=1
-    )
 
-    # Rotated histogram plot
-    fig.add_trace(
-        go.Histogram(
-            y=df[data_column],
-            nbinsy=20,
-            name='Distribution',
-            orientation='h',
-            showlegend=False
-        ),
-        row=1, col=2
-    )
+@lru_cache(maxsize=None)
+def live_graph_template(device_name: str, overlays: tuple[str, ...] = ()) -> dict:
+    """
+    Layout of the live graph, built once per device and overlay selection.
 
+    Args:
+        device_name (str): Name of the selected device.
+        overlays (tuple[str, ...], optional): Names of the overlaid devices. Defaults to none.
+
+    Returns:
+        dict: The Plotly layout as JSON-compatible dict.
+    """
+    fig = make_subplots(rows=1, cols=2, shared_yaxes=True,
+                        column_widths=[0.7, 0.3],
+                        horizontal_spacing=0.02)
+    title = device_name.replace("_", " ").title()
+    if overlays:
+        title += ' vs ' + ', '.join(name.replace("_", " ").title() for name in overlays)
     fig.update_layout(
-        title=f'{device_name.replace("_", " ").title()} Over Time',
-        xaxis=dict(title='Time'),
-        yaxis=dict(title=yaxis_title),
+        title=f'{title} Over Time',
+        xaxis=dict(title='Time', type='date'),
+        yaxis=dict(title=sensor_details[device_name]['xaxis_title']),
         bargap=0.1,
         hovermode='closest',
         showlegend=True,
     )
+    # Every overlaid sensor gets its own y axis on the right, since the units differ
+    for index, name in enumerate(overlays):
+        fig.layout[f'yaxis{index + 3}'] = dict(
+            title=sensor_details[name]['xaxis_title'], overlaying='y', side='right',
+            anchor='free', autoshift=True, showgrid=False,
+            tickfont=dict(color=SERIES_COLORS[(index + 1) % len(SERIES_COLORS)]),
+        )
+    return fig.to_plotly_json()['layout']
 
-    return fig
 
-# Callback to update the distribution graph __________________________________________________
-@app.callback(
-    Output('distribution-graph', 'figure'),
-    [Input('graph-update', 'n_intervals'),  # type: int
-     Input('device-selector', 'value')]  # type: str
-)
-def update_distribution(n: int, device_name: str) -> go.Figure:
+# Numeric arrays as base64 typed arrays, decoded by Plotly and assets/live_graph.js __________________
+def encode_array(values: np.ndarray) -> str:
+    """Encodes a numeric array as base64 of its little-endian bytes, decoded as a typed array in the browser."""
+    import numpy as np
+    little_endian = np.ascontiguousarray(values, dtype=values.dtype.newbyteorder('<'))
+    return base64.b64encode(little_endian.tobytes()).decode('ascii')
+
+
+def typed_array(values: np.ndarray) -> dict:
+    """Wraps a numeric array in Plotly's base64 typed array format, e.g. {'dtype': 'f8', 'bdata': ...}."""
+    return {'dtype': f'{values.dtype.kind}{values.dtype.itemsize}', 'bdata': encode_array(values)}
+
+
+def epoch_milliseconds(timestamps: pd.Series) -> np.ndarray:
+    """Converts timestamps to milliseconds since the epoch, keeping the wall clock time Plotly shows for datetimes."""
+    if timestamps.dt.tz is not None:
+        timestamps = timestamps.dt.tz_localize(None)
+    return timestamps.to_numpy(dtype='datetime64[ms]').astype('float64')
+
+
+def load_live_windows(device_name: str, time_interval: str, overlays: tuple[str, ...] = ()) -> list:
     """
-    Callback to update the distribution graph.
+    Reads the time windows of the selected device and the overlaid ones.
 
-    Reads the data from the database using the selected device's name and
-    returns a Figure object with a histogram of the data.
+    Returns:
+        list: (device name, DataFrame) pairs, the selected device first.
+    """
+    windows = [(device_name, load_live_window(device_name, time_interval))]
+    for name in overlays:
+        windows.append((name, load_live_window(name, time_interval)))
+    return windows
 
-    Parameters
-    ----------
-    n : int
-        The number of intervals since the last update.
-    device_name : str
-        The name of the device to read the data from.
 
-    Returns
-    -------
-    fig : go.Figure
-        A Figure object with a histogram of the data.
+def live_graph_shape(windows: list) -> list:
+    """
+    Describes the traces of the live graph: whether it has data, and which series use WebGL.
+
+    A tick can only patch the data of the figure shown while the shape stays the same.
+    """
+    return [not windows[0][1].empty] + [len(df) > WEBGL_THRESHOLD for _, df in windows]
+
+
+def build_live_graph(
+    device_name: str,  # Name of the selected device
+    time_interval: str,  # Selected time interval
+    overlays: tuple[str, ...] = (),  # Names of the overlaid devices
+    windows: Optional[list] = None  # Already loaded windows
+) -> go.Figure:
     """
+    Builds the live graph from the latest data in the database.
+
+    Args:
+        device_name (str): Name of the selected device.
+        time_interval (str): Selected time interval.
+        overlays (tuple[str, ...], optional): Names of the devices overlaid on the graph. Defaults to none.
+        windows (list, optional): The windows from load_live_windows. Read if not given.
+
+    Returns:
+        go.Figure: The updated graph figure.
+    """
+    #current_sensor, data_column, yaxis_title = current_sensor_device_name(device_name)
     details = sensor_details[device_name]
-    current_sensor = details['sensor']
+    current_sensor = control.snapshot(device_name)
     data_column = details['data_column']
-    xaxis_title = details['xaxis_title']
-
-    # Read data from the database
-    table_name = f"{current_sensor.name}_measurements"
-    query = f"""
-        --beginsql
-        SELECT * FROM {table_name}
-        --endsql
-        """
-    df = pd.read_sql_query(query, db_engine)
 
+    # Get control limits from the control plane
+    ucl = current_sensor.ucl
+    lcl = current_sensor.lcl
+
+    if windows is None:
+        windows = load_live_windows(device_name, time_interval, overlays)
+    df = windows[0][1]
     if df.empty:
         return go.Figure()
 
-    hist = go.Histogram(
-        x=df['temperature'],
-        nbinsx=20,
-        name='Temperature Distribution'
-    )
+    fig = go.Figure(layout=live_graph_template(device_name, overlays))
+
+    # Main time-series plot and its out-of-control points
+    for trace in series_traces(device_name, df, SERIES_COLORS[0]):
+        fig.add_trace(trace)
 
-    layout = go.Layout(
-        title='Temperature Distribution',
-        xaxis=dict(title='Temperature (°C)'),
-        yaxis=dict(title='Count'),
+    # Lines for control limits
+    for name, limit in (('UCL', ucl), ('LCL', lcl)):
+        fig.add_trace(
+            go.Scatter(
+                x=[df['timestamp_measured'].iloc[0], df['timestamp_measured'].iloc[-1]],
+                y=[limit, limit],
+                mode='lines',
+                name=name,
+                line=dict(color='red', dash='dash')
+            )
+        )
+
+    # Rotated histogram plot
+    fig.add_trace(
+        go.Histogram(
+            y=df[data_column],
+            nbinsy=20,
+            name='Distribution',
+            orientation='h',
+            showlegend=False,
+            xaxis='x2',
+            yaxis='y2'
+        )
     )
 
-    fig = go.Figure(data=[hist], layout=layout)
+    # Overlaid sensors, each on its own y axis
+    for index, (name, overlay_df) in enumerate(windows[1:]):
+        color = SERIES_COLORS[(index + 1) % len(SERIES_COLORS)]
+        for trace in series_traces(name, overlay_df, color, yaxis=overlay_axis(index)):
+            fig.add_trace(trace)
+
     return fig
 
-# Callback to update the logs ______________________________________________________________________
-@app.callback(
-    Output('sensor-logs', 'children'),
-    [Input('log-update', 'n_intervals'),
-     Input('device-selector', 'value')]
-)
-def update_logs(n_intervals: int, device_name: str) -> str:
+
+def patch_live_graph(windows: list) -> Patch:
+    """
+    Updates the data of the live graph shown in the browser.
+
+    Only the data arrays, the limit line coordinates and the histogram values
+    are sent, as base64 typed arrays with the timestamps in milliseconds since
+    the epoch (the x axis is a date axis). The layout and the traces stay as
+    build_live_graph made them, so the traces are addressed by their position
+    there.
+
+    Args:
+        windows (list): The windows from load_live_windows, with the shape of the figure shown.
+
+    Returns:
+        Patch: The partial figure update.
+    """
+    patch = Patch()
+    index = 0
+    for position, (name, df) in enumerate(windows):
+        sensor = control.snapshot(name)
+        timestamps = epoch_milliseconds(df['timestamp_measured'])
+        values = df[sensor_details[name]['data_column']].to_numpy(dtype='float64')
+        out_of_control = (values > sensor.ucl) | (values < sensor.lcl)
+
+        patch['data'][index]['x'] = typed_array(timestamps)
+        patch['data'][index]['y'] = typed_array(values)
+        patch['data'][index + 1]['x'] = typed_array(timestamps[out_of_control])
+        patch['data'][index + 1]['y'] = typed_array(values[out_of_control])
+        index += 2
+
+        if position == 0:
+            span = [timestamps[0], timestamps[-1]]
+            patch['data'][2]['x'] = span
+            patch['data'][2]['y'] = [sensor.ucl, sensor.ucl]
+            patch['data'][3]['x'] = span
+            patch['data'][3]['y'] = [sensor.lcl, sensor.lcl]
+            patch['data'][4]['y'] = typed_array(values)
+            index = 5
+    return patch
+
+
+# Compact live graph payload for the clientside renderer (GRAPH_PAYLOAD=binary) ____________________
+def encode_series(device_name: str, df: pd.DataFrame, color: str, yaxis: str) -> dict:
+    """
+    Encodes one sensor's time window for the clientside renderer.
+
+    Timestamps (milliseconds since the epoch) and values are sent as float64
+    arrays and the out-of-control points as a uint8 mask, all base64 encoded.
+
+    Args:
+        device_name (str): Name of the device.
+        df (pd.DataFrame): The sensor's time window.
+        color (str): Color of the values.
+        yaxis (str): The y axis the series is drawn on.
+
+    Returns:
+        dict: The encoded series.
+    """
+    details = sensor_details[device_name]
+    sensor = control.snapshot(device_name)
+    values = df[details['data_column']].to_numpy(dtype='float64')
+    violations = (values > sensor.ucl) | (values < sensor.lcl)
+    return {
+        'name': device_name.replace("_", " ").title(),
+        'n': len(df),
+        't': encode_array(epoch_milliseconds(df['timestamp_measured'])),
+        'y': encode_array(values),
+        'violations': encode_array(violations.astype('uint8')),
+        'ucl': sensor.ucl,
+        'lcl': sensor.lcl,
+        'color': color,
+        'yaxis': yaxis,
+    }
+
+
+def build_live_graph_payload(device_name: str, time_interval: str, overlays: tuple[str, ...],
+                             with_layout: bool) -> dict:
+    """
+    Builds the compact live graph payload.
+
+    The first series is the selected device, followed by the overlaid ones. The
+    layout template is only included when the view changed.
+
+    Args:
+        device_name (str): Name of the selected device.
+        time_interval (str): Selected time interval.
+        overlays (tuple[str, ...]): Names of the overlaid devices.
+        with_layout (bool): Whether to include the layout template.
+
+    Returns:
+        dict: The payload rendered by assets/live_graph.js.
+    """
+    series = [encode_series(device_name, load_live_window(device_name, time_interval), SERIES_COLORS[0], 'y')]
+    for index, name in enumerate(overlays):
+        series.append(encode_series(name, load_live_window(name, time_interval),
+                                    SERIES_COLORS[(index + 1) % len(SERIES_COLORS)], overlay_axis(index)))
+    return {
+        'series': series,
+        'webgl_threshold': WEBGL_THRESHOLD,
+        'layout': live_graph_template(device_name, overlays) if with_layout else None,
+    }
+
+
+# Logs ______________________________________________________________________________________________
+def build_logs(device_name: str) -> str:
     """
-    Updates the logs on the page based on the selected device and the interval.
+    Builds the logs shown on the page for the selected device.
 
     Parameters
     ----------
-    n_intervals : int
-        The number of times the interval has passed.
     device_name : str
         The name of the device to show logs for.
 
@@ -963,27 +1363,17 @@ def update_logs(n_intervals: int, device_name: str) -> str:
     str
         The text of the logs to display.
     """
-    details = sensor_details[device_name]
-    current_sensor = details['sensor']
-
-    logs = '\n'.join(current_sensor.get_logs()[-10:])  # Show last 100 logs
+    logs = '\n'.join(control.logs(device_name, last=10))  # Show last 10 logs
     return logs
 
 
-# Callback to update the alert banner ______________________________________________________________
-@app.callback(
-    Output('alert-banner', 'children'),  # Output: String
-    [Input('alert-update', 'n_intervals'),  # Input: Number of times the interval has passed
-     Input('device-selector', 'value')]  # Input: String device name
-)
-def update_alert(n_intervals: int, device_name: str) -> str:
+# Alert banner ______________________________________________________________________________________
+def build_alert(device_name: str) -> str:
     """
-    Updates the alert banner based on the selected device and the interval.
+    Builds the alert banner for the selected device.
 
     Parameters
     ----------
-    n_intervals : int
-        The number of times the interval has passed.
     device_name : str
         The name of the device to show logs for.
 
@@ -992,11 +1382,8 @@ def update_alert(n_intervals: int, device_name: str) -> str:
     str
         The text of the alert banner to display.
     """
-    details = sensor_details[device_name]
-    current_sensor = details['sensor']
-
     # Get the latest warnings
-    recent_logs = current_sensor.get_logs()[-5:]  # Get last 5 logs
+    recent_logs = control.logs(device_name, last=5)  # Get last 5 logs
     warnings = [log for log in recent_logs if 'WARNING' in log]
 
     if warnings:
@@ -1005,75 +1392,247 @@ def update_alert(n_intervals: int, device_name: str) -> str:
         return ''
 
 
+# Callback refreshing the sensor view ______________________________________________________________
+@app.callback(
+    [Output('live-graph', 'figure') if GRAPH_PAYLOAD == 'figure' else Output('live-graph-payload', 'data'),
+     Output('sensor-logs', 'children'),
+     Output('alert-banner', 'children'),
+     Output('sensor-rate', 'children'),
+     Output('refresh-versions', 'data')],
+    [Input('refresh-update', 'n_intervals'),
+     Input('device-selector', 'value'),
+     Input('time-interval', 'value'),
+     Input('overlay-sensors', 'value')],
+    [State('refresh-versions', 'data')]
+)
+def refresh_sensor_view(
+    n_intervals: int,
+    device_name: str,
+    time_interval: str,
+    overlay_names: Optional[list],
+    versions: Optional[Dict]
+) -> Tuple:
+    """
+    Refreshes the parts of the sensor view that changed since the last tick.
+
+    The graph is refreshed when the sensor ingested new data or its control
+    limits changed: as a Patch of its data arrays while the view and its traces
+    stay the same, as a full figure otherwise. The logs and alert banner are
+    refreshed when the sensor logged new lines. The
+    versions shown in this browser session are kept in the refresh-versions
+    store and every unchanged output is skipped with no_update, so a tick on an
+    idle sensor costs a few comparisons.
+
+    Parameters
+    ----------
+    n_intervals : int
+        The number of times the interval has passed.
+    device_name : str
+        The name of the selected device.
+    time_interval : str
+        The selected time interval.
+    overlay_names : list, optional
+        The devices overlaid on the live graph.
+    versions : dict, optional
+        The versions currently shown in this session.
+
+    Returns
+    -------
+    tuple
+        The graph figure (or its compact payload), logs, alert banner, polling rate and the new versions.
+    """
+    versions = versions or {}
+    overlays = tuple(name for name in overlay_names or [] if name != device_name)
+    view = [device_name, time_interval, list(overlays)]
+    view_changed = versions.get('view') != view
+    # One call to the control plane for every sensor shown
+    snapshots = control.snapshots([device_name, *overlays])
+    current = {
+        'view': view,
+        'data': [[snapshot.data_version, snapshot.ucl, snapshot.lcl] for snapshot in snapshots],
+        'logs': snapshots[0].log_count,
+        'rate': build_sensor_rate(snapshots[0]),
+        'shape': versions.get('shape'),
+    }
+    if current == versions:
+        raise PreventUpdate
+
+    figure = dash.no_update
+    if view_changed or current['data'] != versions.get('data'):
+        sync_query_cache(snapshots)
+        if GRAPH_PAYLOAD == 'figure':
+            # Rebuild the figure when the view or its traces change, otherwise only patch the data
+            windows = load_live_windows(device_name, time_interval, overlays)
+            current['shape'] = live_graph_shape(windows)
+            if view_changed or current['shape'] != versions.get('shape') or not current['shape'][0]:
+                figure = build_live_graph(device_name, time_interval, overlays, windows)
+            else:
+                figure = patch_live_graph(windows)
+        else:
+            figure = build_live_graph_payload(device_name, time_interval, overlays, with_layout=view_changed)
+
+    logs = alert = dash.no_update
+    if view_changed or current['logs'] != versions.get('logs'):
+        logs = build_logs(device_name)
+        alert = build_alert(device_name)
+
+    rate = current['rate'] if view_changed or current['rate'] != versions.get('rate') else dash.no_update
+    return figure, logs, alert, rate, current
+
+
+# Fleet overview ____________________________________________________________________________________
+# Time window shown by the tiles
+FLEET_WINDOW = timedelta(minutes=15)
+
+
+def sparkline(values: np.ndarray, ucl: float, lcl: float, width: int = 160, height: int = 40) -> str:
+    """
+    Draws a sparkline with its control limits as an SVG data URI.
+
+    The values are thinned out to at most one point per pixel, so a tile stays a
+    couple of kilobytes however many measurements the window holds.
+
+    Args:
+        values (np.ndarray): The values, oldest first.
+        ucl (float): Upper control limit, drawn dashed.
+        lcl (float): Lower control limit, drawn dashed.
+        width (int, optional): Width in pixels. Defaults to 160.
+        height (int, optional): Height in pixels. Defaults to 40.
+
+    Returns:
+        str: The image as data URI, usable as html.Img src.
+    """
+    import numpy as np
+    if len(values) > width:
+        values = values[np.linspace(0, len(values) - 1, width).astype(int)]
+    low = min(values.min(), lcl) if len(values) else lcl
+    high = max(values.max(), ucl) if len(values) else ucl
+    scale = (height - 4) / (high - low) if high > low else 0.0
+
+    def y(value):
+        return height - 2 - (value - low) * scale
+
+    xs = np.linspace(0, width, len(values)) if len(values) > 1 else np.zeros(len(values))
+    points = ' '.join(f'{x:.1f},{y(v):.1f}' for x, v in zip(xs, values))
+    svg = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}">'
+        f'<line x1="0" x2="{width}" y1="{y(ucl):.1f}" y2="{y(ucl):.1f}" stroke="red" stroke-dasharray="3,3"/>'
+        f'<line x1="0" x2="{width}" y1="{y(lcl):.1f}" y2="{y(lcl):.1f}" stroke="red" stroke-dasharray="3,3"/>'
+        f'<polyline points="{points}" fill="none" stroke="#91dfd2" stroke-width="1.5"/>'
+        '</svg>'
+    )
+    return 'data:image/svg+xml;base64,' + base64.b64encode(svg.encode()).decode('ascii')
+
+
+def build_fleet_tiles() -> list:
+    """
+    Builds one tile per registered sensor: sparkline, current value, polling rate,
+    share of out-of-control points and time since the last measurement.
+
+    All sensors are read with one batched query, shared by every session for
+    a couple of seconds.
+
+    Returns:
+        list: The tiles.
+    """
+    import numpy as np
+    df = query_cache.get(('fleet', 'fleet', 'raw'),
+                         lambda: store.fetch_fleet(since=datetime.now() - FLEET_WINDOW), ttl=2.0)
+    windows = {name: group for name, group in df.groupby('name', sort=False)}
+
+    snapshots = {snapshot.name: snapshot for snapshot in control.snapshots()}
+
+    tiles = []
+    for name, details in sensor_details.items():
+        sensor = snapshots[name]
+        window = windows.get(name)
+        values = window['value'].to_numpy(dtype='float64') if window is not None else np.empty(0)
+        unit = details['xaxis_title']
+
+        if len(values):
+            current = f"{values[-1]:.2f}"
+            violations = f"{np.mean((values > sensor.ucl) | (values < sensor.lcl)) * 100:.1f}%"
+        else:
+            current = violations = "-"
+        age = sensor.age
+        stale = sensor.stale
+        last_data = "not measuring" if age is None else f"{age:.0f} s ago"
+
+        tiles.append(html.Div(
+            className='fleet-tile fleet-tile--stale' if stale else 'fleet-tile',
+            children=[
+                html.H6(name.replace("_", " ").title()),
+                html.Img(src=sparkline(values, sensor.ucl, sensor.lcl), alt=f"{name} sparkline"),
+                html.Div(f"{unit}: {current}", className='fleet-tile__value'),
+                html.Div(f"Rate: {sensor.rate:.2f} Hz"),
+                html.Div(f"Out of control: {violations}"),
+                html.Div(f"Last data: {last_data}" + (" (stale)" if stale else "")),
+            ],
+        ))
+    return tiles
+
+
+@app.callback(
+    Output('fleet-tiles', 'children'),
+    Input('fleet-update', 'n_intervals')
+)
+def update_fleet(n_intervals: int) -> list:
+    """
+    Refreshes the fleet overview tiles.
+
+    Parameters
+    ----------
+    n_intervals : int
+        The number of times the interval has passed.
+
+    Returns
+    -------
+    list
+        The tiles.
+    """
+    return build_fleet_tiles()
+
+
 # Experiments -------------------------------------------------------------------------------
 
 # Callback to control the experiments __________________________________________________________
+# Experiment number and command of every experiment button
+EXPERIMENT_BUTTONS = {
+    f'{button}{number}': (number, command)
+    for number in (1, 2, 3)
+    for button, command in (('start-experiment', 'start'), ('stop-experiment', 'stop'),
+                            ('inject-bias', 'toggle_bias'), ('device-failure', 'toggle_device_failure'))
+}
+
+
 @app.callback(
-    [Output('terminal_experiment', 'children'),
-     Output('experiment1-state', 'data'),
+    [Output('experiment1-state', 'data'),
      Output('experiment2-state', 'data'),
      Output('experiment3-state', 'data')],
-    [Input('start-experiment1', 'n_clicks'),
-     Input('stop-experiment1', 'n_clicks'),
-     Input('inject-bias1', 'n_clicks'),
-     Input('device-failure1', 'n_clicks'),
-     Input('start-experiment2', 'n_clicks'),
-     Input('stop-experiment2', 'n_clicks'),
-     Input('inject-bias2', 'n_clicks'),
-     Input('device-failure2', 'n_clicks'),
-     Input('start-experiment3', 'n_clicks'),
-     Input('stop-experiment3', 'n_clicks'),
-     Input('inject-bias3', 'n_clicks'),
-     Input('device-failure3', 'n_clicks')],
+    [Input(button_id, 'n_clicks') for button_id in EXPERIMENT_BUTTONS]
+    + [Input('experiment-update', 'n_intervals')],
     [State('experiment1-state', 'data'),
      State('experiment2-state', 'data'),
      State('experiment3-state', 'data')]
 )
-def control_experiments(
-        start1: int, stop1: int, inject_bias1: int, device_failure1: int,
-        start2: int, stop2: int, inject_bias2: int, device_failure2: int,
-        start3: int, stop3: int, inject_bias3: int, device_failure3: int,
-        state1: dict, state2: dict, state3: dict) -> Tuple[str, dict, dict, dict]:
+def control_experiments(*args) -> Tuple[dict, dict, dict]:
     """
     Controls the experiments based on button clicks.
 
+    The commands return without waiting for the experiments; their lifecycle
+    events are shown in the terminal by refresh_experiment_log. The states are
+    read back from the experiment supervisor, also on every experiment-update
+    tick, so the indicators follow changes made by a scenario or another
+    browser.
+
     Parameters
     ----------
-    start1 : int
-        Number of times the start button for experiment 1 was clicked.
-    stop1 : int
-        Number of times the stop button for experiment 1 was clicked.
-    inject_bias1 : int
-        Number of times the bias injection button for experiment 1 was clicked.
-    device_failure1 : int
-        Number of times the device failure button for experiment 1 was clicked.
-    start2 : int
-        Number of times the start button for experiment 2 was clicked.
-    stop2 : int
-        Number of times the stop button for experiment 2 was clicked.
-    inject_bias2 : int
-        Number of times the bias injection button for experiment 2 was clicked.
-    device_failure2 : int
-        Number of times the device failure button for experiment 2 was clicked.
-    start3 : int
-        Number of times the start button for experiment 3 was clicked.
-    stop3 : int
-        Number of times the stop button for experiment 3 was clicked.
-    inject_bias3 : int
-        Number of times the bias injection button for experiment 3 was clicked.
-    device_failure3 : int
-        Number of times the device failure button for experiment 3 was clicked.
-    state1 : dict
-        State dictionary for experiment 1.
-    state2 : dict
-        State dictionary for experiment 2.
-    state3 : dict
-        State dictionary for experiment 3.
+    *args : int | dict
+        Number of clicks of every button in EXPERIMENT_BUTTONS, the n_intervals
+        of experiment-update and the current state dictionaries of experiments 1 to 3.
 
     Returns
     -------
-    str
-        Log messages for the experiment control.
     dict
         Updated state dictionary for experiment 1.
     dict
@@ -1081,100 +1640,70 @@ def control_experiments(
     dict
         Updated state dictionary for experiment 3.
     """
+    states = args[-3:]
     ctx = dash.callback_context
-    if not ctx.triggered:
-        return "", state1, state2, state3  # No changes
-
-    button_id = ctx.triggered[0]['prop_id'].split('.')[0]
-    log = ""
-
-    # Ensure state dictionaries are mutable copies
-    state1 = state1.copy()
-    state2 = state2.copy()
-    state3 = state3.copy()
-
-    # Experiment 1 controls
-    if button_id in ['start-experiment1', 'stop-experiment1', 'inject-bias1', 'device-failure1']:
-        if button_id == 'start-experiment1':
-            threading.Thread(target=experiment1.run_experiment).start()
-            log += "Experiment 1 started.\n"
-            state1['running'] = True
-            # Do not change bias or failure flags
-        elif button_id == 'stop-experiment1':
-            experiment1.exp.stop_experiment()
-            log_message = get_log_message(experiment1.log_queue)
-            log += f"{log_message}\n"
-            state1['running'] = False
-            state1['bias'] = False
-            state1['failure'] = False
-        elif button_id == 'inject-bias1':
-            experiment1.exp.toggle_bias()
-            log_message = get_log_message(experiment1.log_queue)
-            log += f"{log_message}\n"
-            state1['bias'] = not state1.get('bias', False)
-        elif button_id == 'device-failure1':
-            experiment1.exp.toggle_device_failure()
-            log_message = get_log_message(experiment1.log_queue)
-            log += f"{log_message}\n"
-            state1['failure'] = not state1.get('failure', False)
-
-    # Experiment 2 controls
-    if button_id in ['start-experiment2', 'stop-experiment2', 'inject-bias2', 'device-failure2']:
-        if button_id == 'start-experiment2':
-            threading.Thread(target=experiment2.run_experiment).start()
-            log += "Experiment 2 started.\n"
-            state2['running'] = True
-            # Do not change bias or failure flags
-        elif button_id == 'stop-experiment2':
-            experiment2.exp.stop_experiment()
-            log_message = get_log_message(experiment2.log_queue)
-            log += f"{log_message}\n"
-            state2['running'] = False
-            state2['bias'] = False
-            state2['failure'] = False
-        elif button_id == 'inject-bias2':
-            experiment2.exp.toggle_bias()
-            log_message = get_log_message(experiment2.log_queue)
-            log += f"{log_message}\n"
-            state2['bias'] = not state2.get('bias', False)
-        elif button_id == 'device-failure2':
-            experiment2.exp.toggle_device_failure()
-            log_message = get_log_message(experiment2.log_queue)
-            log += f"{log_message}\n"
-            state2['failure'] = not state2.get('failure', False)
-
-    # Experiment 3 controls
-    if button_id in ['start-experiment3', 'stop-experiment3', 'inject-bias3', 'device-failure3']:
-        if button_id == 'start-experiment3':
-            threading.Thread(target=experiment3.run_experiment).start()
-            log += "Experiment 3 started.\n"
-            state3['running'] = True
-            # Do not change bias or failure flags
-        elif button_id == 'stop-experiment3':
-            experiment3.exp.stop_experiment()
-            log_message = get_log_message(experiment3.log_queue)
-            log += f"{log_message}\n"
-            state3['running'] = False
-            state3['bias'] = False
-            state3['failure'] = False
-        elif button_id == 'inject-bias3':
-            experiment3.exp.toggle_bias()
-            log_message = get_log_message(experiment3.log_queue)
-            log += f"{log_message}\n"
-            state3['bias'] = not state3.get('bias', False)
-        elif button_id == 'device-failure3':
-            experiment3.exp.toggle_device_failure()
-            log_message = get_log_message(experiment3.log_queue)
-            log += f"{log_message}\n"
-            state3['failure'] = not state3.get('failure', False)
+    button_id = ctx.triggered[0]['prop_id'].split('.')[0] if ctx.triggered else None
+    if button_id in EXPERIMENT_BUTTONS:
+        control.experiment_command(*EXPERIMENT_BUTTONS[button_id])
+
+    status = control.experiment_status()
+    new_states = tuple(status[number] for number in (1, 2, 3))
+    if new_states == tuple(states):
+        raise PreventUpdate
+    return new_states
+
+
+@app.callback(
+    [Output('terminal_experiment', 'children'),
+     Output('experiment-log-version', 'data')],
+    [Input('experiment-update', 'n_intervals'),
+     Input('experiment1-state', 'data'),
+     Input('experiment2-state', 'data'),
+     Input('experiment3-state', 'data')],
+    [State('experiment-log-version', 'data')]
+)
+def refresh_experiment_log(
+        n_intervals: int, state1: dict, state2: dict, state3: dict, shown: Optional[int]) -> Tuple[str, int]:
+    """
+    Shows the latest lifecycle events of the experiments and sensors in the terminal.
+
+    Runs on every tick of the experiments tab and right after a button click
+    changed an experiment's state. Reading the events never waits, and a tick
+    without new events is skipped.
+
+    Parameters
+    ----------
+    n_intervals : int
+        The number of times the interval has passed.
+    state1 : dict
+        State dictionary for experiment 1.
+    state2 : dict
+        State dictionary for experiment 2.
+    state3 : dict
+        State dictionary for experiment 3.
+    shown : int, optional
+        Sequence number of the newest event shown in this session.
+
+    Returns
+    -------
+    str
+        The terminal text.
+    int
+        Sequence number of the newest event shown.
+    """
+    sequence, events = control.lifecycle_events(0, last=30)
+    if sequence == shown:
+        raise PreventUpdate
+
+    log = "".join(f"{datetime.fromtimestamp(event['time']):%H:%M:%S} {event['message']}\n" for event in events)
 
     # Print expected values
     log += "\nExpected Generated Data:\n"
-    log += f"Experiment 1: {{Temperature mean: {experiment1.exp.mean} °C, stddev: {experiment1.exp.stddev} °C, bias: {experiment1.exp.bias} °C}}\n"
-    log += f"Experiment 2: {{Pressure mean: {experiment2.exp.mean} bar, stddev: {experiment2.exp.stddev} bar, bias: {experiment2.exp.bias} bar}}\n"
-    log += f"Experiment 3: {{Temperature mean: {experiment3.exp.mean} mSv/h, stddev: {experiment3.exp.stddev} mSv/h, bias: {experiment3.exp.bias} mSv/h}}\n"
-
-    return log, state1, state2, state3
+    exp1, exp2, exp3 = (control.experiment_settings(number) for number in (1, 2, 3))
+    log += f"Experiment 1: {{Temperature mean: {exp1['mean']} °C, stddev: {exp1['stddev']} °C, bias: {exp1['bias']} °C}}\n"
+    log += f"Experiment 2: {{Pressure mean: {exp2['mean']} bar, stddev: {exp2['stddev']} bar, bias: {exp2['bias']} bar}}\n"
+    log += f"Experiment 3: {{Temperature mean: {exp3['mean']} mSv/h, stddev: {exp3['stddev']} mSv/h, bias: {exp3['bias']} mSv/h}}\n"
+    return log, sequence
 
 
 # Callback to control the experiments states ___________________________________________________
@@ -1232,6 +1761,11 @@ def update_status_indicators(
     return style1, style2, style3
 
 
+if os.getenv("CALLBACK_PROFILING", "1") == "1":
+    profiler.instrument(app.callback_map)
+startup.mark('callbacks')
+print(startup.summary())
+
 
 if __name__ == '__main__':
     #app.run_server(debug=True)
@@ -0,0 +1,89 @@
+// Clientside renderer of the compact live graph payload (GRAPH_PAYLOAD=binary).
+//
+// The server sends base64 typed arrays (timestamps, values, out-of-control
+// mask) for the selected and the overlaid sensors, and the layout template
+// only when the view changes. The template is kept here and the figure is
+// rebuilt from it on every new payload.
+
+let liveGraphLayout = null;
+
+function decode(base64, ArrayType) {
+    const binary = atob(base64);
+    const bytes = new Uint8Array(binary.length);
+    for (let i = 0; i < binary.length; i++) {
+        bytes[i] = binary.charCodeAt(i);
+    }
+    return new ArrayType(bytes.buffer);
+}
+
+function seriesTraces(series, webglThreshold) {
+    // Same traces as series_traces() in app.py: the values in one color and
+    // the out-of-control points as a red marker trace on top
+    const t = decode(series.t, Float64Array);
+    const y = decode(series.y, Float64Array);
+    const violations = decode(series.violations, Uint8Array);
+    const outT = [];
+    const outY = [];
+    for (let i = 0; i < violations.length; i++) {
+        if (violations[i]) {
+            outT.push(t[i]);
+            outY.push(y[i]);
+        }
+    }
+    const type = series.n > webglThreshold ? 'scattergl' : 'scatter';
+    return {
+        t: t,
+        y: y,
+        traces: [
+            {
+                type: type, x: t, y: y, mode: 'lines+markers', name: series.name,
+                line: {color: series.color}, marker: {color: series.color}, yaxis: series.yaxis
+            },
+            {
+                type: type, x: outT, y: outY, mode: 'markers', name: series.name + ' out of control',
+                marker: {color: 'red', size: 9}, yaxis: series.yaxis
+            }
+        ]
+    };
+}
+
+function render(payload) {
+    if (!payload) {
+        return window.dash_clientside.no_update;
+    }
+    if (payload.layout) {
+        liveGraphLayout = payload.layout;
+    }
+    if (!liveGraphLayout) {
+        return window.dash_clientside.no_update;
+    }
+    const primary = payload.series[0];
+    if (primary.n === 0) {
+        return {data: [], layout: {}};
+    }
+
+    const main = seriesTraces(primary, payload.webgl_threshold);
+    const span = [main.t[0], main.t[main.t.length - 1]];
+    let data = main.traces.concat([
+        {
+            type: 'scatter', x: span, y: [primary.ucl, primary.ucl], mode: 'lines', name: 'UCL',
+            line: {color: 'red', dash: 'dash'}
+        },
+        {
+            type: 'scatter', x: span, y: [primary.lcl, primary.lcl], mode: 'lines', name: 'LCL',
+            line: {color: 'red', dash: 'dash'}
+        },
+        {
+            type: 'histogram', y: main.y, nbinsy: 20, name: 'Distribution', orientation: 'h',
+            showlegend: false, xaxis: 'x2', yaxis: 'y2'
+        }
+    ]);
+    payload.series.slice(1).forEach(function (series) {
+        data = data.concat(seriesTraces(series, payload.webgl_threshold).traces);
+    });
+    return {data: data, layout: liveGraphLayout};
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    live_graph: {render: render}
+});
@@ -0,0 +1,122 @@
+// Live updates pushed by the server over server-sent events (/stream).
+//
+// New measurements are appended to the live graph and log lines to the log
+// panel as soon as the sensor ingests them. While the stream is connected the
+// dcc.Interval timer only resyncs the page every RESYNC_INTERVAL; if the
+// stream drops it falls back to polling every POLL_INTERVAL. The server ends
+// every stream after a while and the browser reconnects by itself; if the
+// server turns the stream away (all its stream slots are taken) the page
+// polls and subscribes again after REJECTED_RETRY.
+
+const POLL_INTERVAL = 2000;
+const RESYNC_INTERVAL = 10000;
+const REJECTED_RETRY = 30000;
+const LOG_LINES = 10;
+const TIMERS = ['refresh-update'];
+
+let source = null;
+let retryTimer = null;
+
+function setTimers(interval) {
+    TIMERS.forEach(function (id) {
+        window.dash_clientside.set_props(id, {interval: interval});
+    });
+}
+
+function setStatus(text) {
+    window.dash_clientside.set_props('push-status', {children: text});
+}
+
+function traceArray(plot, index, attr) {
+    // Arrays the server sent as base64 typed array specs are replaced by the
+    // typed array Plotly decoded them to, extendTraces only extends arrays
+    const trace = plot.data[index];
+    if (trace[attr] && trace[attr]._inputArray) {
+        trace[attr] = trace[attr]._inputArray;
+    }
+    return trace[attr];
+}
+
+function insert(plot, index, attr, value) {
+    // extendTraces needs the new values in an array of the same type as the trace's
+    const values = traceArray(plot, index, attr);
+    return ArrayBuffer.isView(values) ? new values.constructor([value]) : [value];
+}
+
+function appendMeasurement(point) {
+    const plot = document.querySelector('#live-graph .js-plotly-plot');
+    // Nothing to extend until the server has drawn the time series, its
+    // control limits and histogram (traces 0 to 4, the overlays follow)
+    if (!window.Plotly || !plot || !plot.data || plot.data.length < 5) {
+        return;
+    }
+    // point.timestamp is in milliseconds since the epoch, like the x values
+    // the server sends. Trace 0 holds the values, trace 1 the out-of-control points.
+    const outOfControl = point.value > point.ucl || point.value < point.lcl;
+    const traces = outOfControl ? [0, 1] : [0];
+    window.Plotly.extendTraces(plot, {
+        x: traces.map(function (index) { return insert(plot, index, 'x', point.timestamp); }),
+        y: traces.map(function (index) { return insert(plot, index, 'y', point.value); })
+    }, traces);
+    // Trace 4 is the histogram of the values
+    window.Plotly.extendTraces(plot, {y: [insert(plot, 4, 'y', point.value)]}, [4]);
+    // Stretch the UCL and LCL lines (traces 2 and 3) to the new point, at the current limits
+    const start = traceArray(plot, 2, 'x')[0];
+    window.Plotly.restyle(plot, {
+        x: [[start, point.timestamp], [start, point.timestamp]],
+        y: [[point.ucl, point.ucl], [point.lcl, point.lcl]]
+    }, [2, 3]);
+}
+
+function appendLog(entry) {
+    const logs = document.getElementById('sensor-logs');
+    const lines = logs && logs.innerText ? logs.innerText.split('\n') : [];
+    lines.push(entry.message);
+    window.dash_clientside.set_props('sensor-logs', {children: lines.slice(-LOG_LINES).join('\n')});
+    if (entry.message.indexOf('WARNING') !== -1) {
+        window.dash_clientside.set_props('alert-banner', {children: 'ALERT: ' + entry.message});
+    }
+}
+
+function subscribe(sensor) {
+    if (source) {
+        source.close();
+        source = null;
+    }
+    clearTimeout(retryTimer);
+    if (!sensor || typeof EventSource === 'undefined') {
+        return 'Live updates: off';
+    }
+    source = new EventSource('/stream?sensor=' + encodeURIComponent(sensor));
+    source.onopen = function () {
+        setTimers(RESYNC_INTERVAL);
+        setStatus('Live updates: connected');
+    };
+    source.onerror = function () {
+        // Poll until the stream is back
+        setTimers(POLL_INTERVAL);
+        if (this === source && this.readyState === EventSource.CLOSED) {
+            // Refused by the server (e.g. 503), EventSource does not retry by itself
+            setStatus('Live updates: unavailable, polling');
+            retryTimer = setTimeout(function () { setStatus(subscribe(sensor)); }, REJECTED_RETRY);
+        } else {
+            setStatus('Live updates: reconnecting');
+        }
+    };
+    source.addEventListener('measurement', function (e) {
+        appendMeasurement(JSON.parse(e.data));
+    });
+    source.addEventListener('log', function (e) {
+        appendLog(JSON.parse(e.data));
+    });
+    source.addEventListener('resync', function () {
+        // Events were dropped, let the timers reload everything once
+        setTimers(POLL_INTERVAL);
+        setTimeout(function () { setTimers(RESYNC_INTERVAL); }, POLL_INTERVAL * 1.5);
+    });
+    return 'Live updates: connecting';
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    push: {subscribe: subscribe}
+});
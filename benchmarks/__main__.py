@@ -0,0 +1,128 @@
+"""
+Run the micro-benchmarks of the hot paths.
+
+Every case is timed with timeit: the number of calls per measurement is
+picked automatically and the best and median of several measurements are
+reported per call. Results can be saved as a baseline and later runs compared
+against it; a case slower than its baseline by more than the threshold is a
+regression and fails the run.
+
+Usage:
+    python -m benchmarks [--filter check_out_of_control] [--max-rows 100000]
+    python -m benchmarks --save benchmarks/baseline.json
+    python -m benchmarks --compare benchmarks/baseline.json [--threshold 0.25]
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+
+def format_seconds(seconds: float) -> str:
+    """Formats a duration with a unit suited to its magnitude."""
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f} us"
+    if seconds < 1:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds:.3f} s"
+
+
+def time_case(factory, repeat: int) -> dict[str, float | int]:
+    """
+    Times one case.
+
+    Args:
+        factory: The case factory, see benchmarks.cases.
+        repeat (int): Number of measurements.
+
+    Returns:
+        dict[str, float | int]: Calls per measurement, best and median seconds per call.
+    """
+    with tempfile.TemporaryDirectory() as workdir, contextlib.ExitStack() as stack:
+        # The ingest path prints every measurement, keep it out of the report
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            run = factory(Path(workdir), stack)
+            run()  # Warm up caches and lazy imports
+            timer = timeit.Timer(run)
+            number, _ = timer.autorange()
+            timings = [seconds / number for seconds in timer.repeat(repeat=repeat, number=number)]
+    return {'number': number, 'best': min(timings), 'median': statistics.median(timings)}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Prints every case's median against its baseline.
+
+    Returns:
+        list[str]: The cases slower than their baseline by more than threshold.
+    """
+    regressions = []
+    print(f"\n{'case':<45} {'baseline':>12} {'median':>12} {'change':>8}")
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            print(f"{name:<45} {'-':>12} {format_seconds(result['median']):>12} {'new':>8}")
+            continue
+        change = result['median'] / reference['median'] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<45} {format_seconds(reference['median']):>12} {format_seconds(result['median']):>12} "
+              f"{change:>+8.1%}{flag}")
+    return regressions
+
+
+def main() -> None:
+    """Parses the command line, runs the selected cases and saves or compares the results."""
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of the ingest, monitoring and dashboard hot paths.")
+    parser.add_argument('--filter', default='', help="Only run the cases whose name contains this text.")
+    parser.add_argument('--max-rows', type=int, help="Skip the cases with more input rows.")
+    parser.add_argument('--repeat', type=int, default=5, help="Measurements per case (default: 5).")
+    parser.add_argument('--save', help="Write the results as a baseline to this JSON file.")
+    parser.add_argument('--compare', help="Compare the results against this baseline and fail on regressions.")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="Slowdown of the median counted as a regression (default: 0.25, i.e. 25%%).")
+    args = parser.parse_args()
+
+    from benchmarks.cases import CASES
+    selected = {name: factory for name, (factory, rows) in CASES.items()
+                if args.filter in name and (args.max_rows is None or rows is None or rows <= args.max_rows)}
+    if not selected:
+        parser.error("no benchmark case matches the filter")
+
+    results = {}
+    print(f"{'case':<45} {'calls':>8} {'best':>12} {'median':>12}")
+    for name, factory in selected.items():
+        result = results[name] = time_case(factory, args.repeat)
+        print(f"{name:<45} {result['number']:>8} {format_seconds(result['best']):>12} "
+              f"{format_seconds(result['median']):>12}")
+
+    if args.save:
+        previous = {}
+        if os.path.exists(args.save):
+            with open(args.save) as file:
+                previous = json.load(file).get('results', {})
+        with open(args.save, 'w') as file:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(),
+                       'results': {**previous, **results}}, file, indent=2, sort_keys=True)
+        print(f"\nBaseline written to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nNo regressions.")
+
+
+if __name__ == "__main__":
+    main()
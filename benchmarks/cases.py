@@ -0,0 +1,134 @@
+"""
+The benchmarked hot paths.
+
+Every case is a factory which prepares its inputs and returns the callable to
+time. Factories get a working directory for their files and an ExitStack for
+their cleanup, and use the fakes instead of a database server.
+"""
+import contextlib
+import functools
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable
+
+from benchmarks.fakes import FakeControlPlane, FakeStore, make_window
+from device_app.monitoring_service import MonitoringService
+from device_app.sensor1 import TemperatureSensor
+
+# name -> (factory, rows); rows is the input size, None for cases without one
+CASES = {}
+
+SENSOR = 'temperature_sensor'
+
+
+def register(name: str, factory: Callable[[Path, contextlib.ExitStack], Callable[[], Any]],
+             rows: int | None = None) -> None:
+    """Adds a case."""
+    CASES[name] = (factory, rows)
+
+
+def make_sensor(workdir: Path, store=None) -> TemperatureSensor:
+    """Creates a temperature sensor reading and logging to files in workdir."""
+    sensor = TemperatureSensor(name=SENSOR, store=store)
+    sensor.data_file = str(workdir / 'data_exp1.txt')
+    sensor.log_file = str(workdir / f'{SENSOR}.csv')
+    sensor.current_temperature = 45.0
+    return sensor
+
+
+# Sensor ingest _____________________________________________________________________________________
+def read_data(workdir: Path, stack: contextlib.ExitStack) -> Callable[[], Any]:
+    """Parses one sample of the data file, without logging it."""
+    sensor = make_sensor(workdir)
+    sensor.log_data = lambda timestamp_file, timestamp_read: None
+    with open(sensor.data_file, 'w') as file:
+        file.write(f"45.12, {datetime.now().isoformat()}, 1726536696.6151683\n")
+
+    def run():
+        sensor.last_timestamp_file = None  # Every read is a new sample
+        return sensor.read_data()
+    return run
+
+
+def log_data(workdir: Path, stack: contextlib.ExitStack, backend: str) -> Callable[[], Any]:
+    """Logs one measurement to the CSV log and, depending on backend, a store."""
+    if backend == 'csv':
+        store = None
+    elif backend == 'fake':
+        store = FakeStore()
+    else:
+        from device_app.database import open_database
+        from device_app.storage import open_store
+        database = open_database(f"sqlite:///{workdir / 'bench.db'}", ingest_pool_size=1, query_pool_size=1)
+        stack.callback(database.dispose)
+        store = open_store(database, layout=backend.split(':')[1])
+    sensor = make_sensor(workdir, store)
+
+    def run():
+        now = datetime.now()
+        sensor.log_data(now, now.isoformat())
+    return run
+
+
+register('sensor.read_data', read_data)
+register('sensor.log_data[csv]', functools.partial(log_data, backend='csv'))
+register('sensor.log_data[csv+fake store]', functools.partial(log_data, backend='fake'))
+register('sensor.log_data[csv+sqlite per_sensor]', functools.partial(log_data, backend='sqlite:per_sensor'))
+register('sensor.log_data[csv+sqlite narrow]', functools.partial(log_data, backend='sqlite:narrow'))
+
+
+# Monitoring ________________________________________________________________________________________
+def check_out_of_control(workdir: Path, stack: contextlib.ExitStack, rows: int) -> Callable[[], Any]:
+    """Checks a window of rows measurements against the control limits."""
+    df = make_window(rows)
+    service = MonitoringService(FakeControlPlane().snapshot(SENSOR))
+    return lambda: service.check_out_of_control(df, 'temperature')
+
+
+for rows in (1_000, 10_000, 100_000, 1_000_000):
+    register(f'monitoring.check_out_of_control[{rows}]', functools.partial(check_out_of_control, rows=rows), rows)
+
+
+# Dashboard _________________________________________________________________________________________
+def dashboard(store: FakeStore):
+    """Imports the dashboard with its control plane and store replaced by the fakes."""
+    import app
+    app.control = FakeControlPlane()
+    app.store = store
+    app.query_cache.clear()
+    return app
+
+
+def build_live_graph(workdir: Path, stack: contextlib.ExitStack, rows: int) -> Callable[[], Any]:
+    """Builds the full live graph figure from an already loaded window."""
+    app = dashboard(FakeStore())
+    windows = [(SENSOR, make_window(rows))]
+    return lambda: app.build_live_graph(SENSOR, '1d', (), windows)
+
+
+def patch_live_graph(workdir: Path, stack: contextlib.ExitStack, rows: int) -> Callable[[], Any]:
+    """Builds the Patch refreshing the data of a shown live graph."""
+    app = dashboard(FakeStore())
+    windows = [(SENSOR, make_window(rows))]
+    return lambda: app.patch_live_graph(windows)
+
+
+def refresh_live_graph(workdir: Path, stack: contextlib.ExitStack, rows: int) -> Callable[[], Any]:
+    """
+    Reads the window from the fake store and builds the live graph with its histogram, on every call.
+
+    The path of a refresh_sensor_view tick after new data, without the cache hit.
+    """
+    app = dashboard(FakeStore({SENSOR: make_window(rows)}))
+
+    def run():
+        app.query_cache.clear()
+        windows = app.load_live_windows(SENSOR, '1M')
+        return app.build_live_graph(SENSOR, '1M', (), windows)
+    return run
+
+
+for rows in (300, 3_600, 86_400):
+    register(f'app.build_live_graph[{rows}]', functools.partial(build_live_graph, rows=rows), rows)
+    register(f'app.patch_live_graph[{rows}]', functools.partial(patch_live_graph, rows=rows), rows)
+    register(f'app.refresh_live_graph[{rows}]', functools.partial(refresh_live_graph, rows=rows), rows)
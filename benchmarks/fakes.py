@@ -0,0 +1,90 @@
+"""In-memory stand-ins for the database and the control plane, so the benchmarks run offline."""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from device_app.control_plane import SensorSnapshot
+from device_app.sensor_runtime import SensorState
+from device_app.storage import MeasurementStore
+
+# Control limits of the benchmarked sensors, like the temperature sensor's defaults
+UCL = 60.0
+LCL = 30.0
+
+
+def make_window(rows: int, data_column: str = 'temperature', seed: int = 0) -> pd.DataFrame:
+    """
+    Builds a time window like MeasurementStore.fetch_window returns.
+
+    One measurement per second ending now, normally distributed around the
+    middle of the control limits so about 1% of them are out of control.
+
+    Args:
+        rows (int): Number of measurements.
+        data_column (str, optional): Name of the value column. Defaults to 'temperature'.
+        seed (int, optional): Seed of the values. Defaults to 0.
+
+    Returns:
+        pd.DataFrame: Columns timestamp_measured and data_column.
+    """
+    rng = np.random.default_rng(seed)
+    end = datetime.now()
+    timestamps = pd.date_range(end=end, periods=rows, freq='s')
+    values = rng.normal((UCL + LCL) / 2, (UCL - LCL) / 2 / 2.6, rows).round(2)
+    return pd.DataFrame({'timestamp_measured': timestamps, data_column: values})
+
+
+class FakeStore(MeasurementStore):
+    def __init__(self, windows: dict[str, pd.DataFrame] | None = None) -> None:
+        """
+        Initialize the FakeStore.
+
+        Counts inserted measurements and serves fixed windows instead of querying.
+
+        Args:
+            windows (dict[str, pd.DataFrame], optional): Window returned per sensor name.
+        """
+        super().__init__(db=None)
+        self.windows = windows or {}
+        self.inserted = 0
+
+    def create(self, sensor_name: str, data_column: str) -> None:
+        pass
+
+    def insert(self, sensor_name: str, value: float, timestamp_measured: datetime,
+               timestamp_logged: datetime | str) -> None:
+        self.inserted += 1
+
+    def fetch_window(self, sensor_name: str, data_column: str, since: datetime | None = None) -> pd.DataFrame:
+        window = self.windows[sensor_name]
+        if since is not None:
+            window = window[window['timestamp_measured'] >= since]
+        return window
+
+    def fetch_fleet(self, since: datetime) -> pd.DataFrame:
+        frames = [window[window['timestamp_measured'] >= since].set_axis(['timestamp_measured', 'value'], axis=1)
+                  .assign(name=name) for name, window in sorted(self.windows.items())]
+        if not frames:
+            return pd.DataFrame(columns=['name', 'timestamp_measured', 'value'])
+        return pd.concat(frames, ignore_index=True)[['name', 'timestamp_measured', 'value']]
+
+
+class FakeControlPlane:
+    """Answers the control plane calls of the live graph with fixed snapshots."""
+
+    def snapshot(self, name: str) -> SensorSnapshot:
+        return SensorSnapshot(name=name, state=SensorState.MEASURING, ucl=UCL, lcl=LCL, interval=1.0, rate=1.0,
+                              data_version=0, log_count=0, age=0.0, stale=False)
+
+    def snapshots(self, names: list[str] | None = None) -> list[SensorSnapshot]:
+        return [self.snapshot(name) for name in names or []]
+
+    def is_stale(self, name: str) -> bool:
+        return False
+
+    def age(self, name: str) -> float:
+        return 0.0
+
+    def log_warnings(self, name: str, messages: list[str]) -> None:
+        pass
@@ -0,0 +1,190 @@
+"""
+Backfill the database from the CSV logs written next to it by the sensors.
+
+Every sensor appends its measurements to logs/<sensor>.csv before inserting
+them into <sensor>_measurements, so after a database outage the CSV files hold
+rows the database is missing. This command streams the CSV files in chunks,
+normalizes their mixed timestamp formats, COPYs them into a staging table and
+merges the rows whose timestamp_measured is not in the database yet, using the
+storage layout selected by STORAGE_LAYOUT. Running it twice inserts nothing
+the second time.
+
+Usage:
+    python -m device_app.backfill [--sensors temperature_sensor ...] [--workers 3] [--chunksize 100000]
+"""
+import argparse
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+from dotenv import load_dotenv
+from sqlalchemy import make_url
+
+from device_app.database import Database
+from device_app.storage import MeasurementStore, NarrowTableStore, open_store
+
+# Measurement column of every sensor table
+SENSOR_COLUMNS = {
+    'temperature_sensor': 'temperature',
+    'pressure_sensor': 'pressure',
+    'radiation_sensor': 'radiation',
+}
+
+LOGS_DIR = Path(__file__).parent.parent / 'logs'
+CSV_COLUMNS = ['value', 'timestamp_measured', 'timestamp_logged']
+
+
+def normalize_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    """
+    Parses one chunk of a sensor CSV log.
+
+    The logs mix 'YYYY-MM-DDTHH:MM:SS' and 'YYYY-MM-DD HH:MM:SS' timestamps, some
+    with leading spaces. Both are parsed in one vectorized pass; rows with an
+    unparseable value or timestamp are dropped.
+
+    Args:
+        chunk (pd.DataFrame): Raw chunk with the columns value, timestamp_measured and timestamp_logged as strings.
+
+    Returns:
+        pd.DataFrame: The chunk with a float value and datetime timestamp columns.
+    """
+    chunk = chunk.copy()
+    chunk['value'] = pd.to_numeric(chunk['value'].str.strip(), errors='coerce')
+    for column in ('timestamp_measured', 'timestamp_logged'):
+        chunk[column] = pd.to_datetime(chunk[column].str.strip(), format='ISO8601', errors='coerce')
+    return chunk.dropna()
+
+
+def merge_sql(store: MeasurementStore, sensor_name: str, column: str, staging_name: str) -> str:
+    """Builds the statement moving new rows from the staging table into the store's layout."""
+    if isinstance(store, NarrowTableStore):
+        sensor_id = store.sensor_id(sensor_name)
+        logged = ", ts_logged" if store.keep_logged else ""
+        staged_logged = ", s.timestamp_logged" if store.keep_logged else ""
+        return f"""
+            INSERT INTO measurements (sensor_id, ts{logged}, value)
+            SELECT DISTINCT ON (s.timestamp_measured) {sensor_id}, s.timestamp_measured{staged_logged}, s.value
+            FROM {staging_name} s
+            WHERE NOT EXISTS (
+                SELECT 1 FROM measurements m WHERE m.sensor_id = {sensor_id} AND m.ts = s.timestamp_measured
+            )
+            ORDER BY s.timestamp_measured, s.timestamp_logged
+        """
+    table_name = f"{sensor_name}_measurements"
+    return f"""
+        INSERT INTO {table_name} ({column}, timestamp_measured, timestamp_logged)
+        SELECT DISTINCT ON (s.timestamp_measured) s.value, s.timestamp_measured, s.timestamp_logged
+        FROM {staging_name} s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM {table_name} t WHERE t.timestamp_measured = s.timestamp_measured
+        )
+        ORDER BY s.timestamp_measured, s.timestamp_logged
+    """
+
+
+def backfill_sensor(database_url: str, sensor_name: str, column: str, csv_path: str,
+                    chunksize: int = 100_000, layout: str = 'per_sensor',
+                    keep_logged: bool = False) -> dict[str, int | float | str]:
+    """
+    Backfills one sensor from its CSV log.
+
+    Runs in its own process, so it opens its own database connection.
+
+    Args:
+        database_url (str): SQLAlchemy URL of the PostgreSQL database.
+        sensor_name (str): The name of the sensor.
+        column (str): The measurement column of the sensor.
+        csv_path (str): Path to the sensor's CSV log.
+        chunksize (int, optional): Rows read and copied per chunk. Defaults to 100000.
+        layout (str, optional): Storage layout, see device_app.storage.open_store. Defaults to 'per_sensor'.
+        keep_logged (bool, optional): Whether the narrow layout keeps timestamp_logged. Defaults to False.
+
+    Returns:
+        dict[str, int | float | str]: Rows read, staged and inserted, and the elapsed seconds.
+    """
+    started = time.perf_counter()
+    staging_name = f"{sensor_name}_staging"
+    read = staged = 0
+
+    db = Database(database_url, ingest_pool_size=1, query_pool_size=1)
+    store = open_store(db, layout, keep_logged=keep_logged)
+    store.create(sensor_name, column)
+    conn = db.ingest_engine.raw_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                CREATE TEMP TABLE {staging_name} (
+                    value DOUBLE PRECISION,
+                    timestamp_measured TIMESTAMPTZ,
+                    timestamp_logged TIMESTAMPTZ
+                ) ON COMMIT DROP;
+            """)
+
+            reader = pd.read_csv(csv_path, header=None, names=CSV_COLUMNS, dtype=str,
+                                 chunksize=chunksize, on_bad_lines='skip')
+            for chunk in reader:
+                read += len(chunk)
+                chunk = normalize_chunk(chunk)
+                staged += len(chunk)
+                buffer = io.StringIO()
+                chunk.to_csv(buffer, header=False, index=False, date_format='%Y-%m-%d %H:%M:%S.%f')
+                buffer.seek(0)
+                cur.copy_expert(f"COPY {staging_name} FROM STDIN WITH (FORMAT csv)", buffer)
+
+            # Keep one row per measurement and skip the ones already stored
+            cur.execute(merge_sql(store, sensor_name, column, staging_name))
+            inserted = cur.rowcount
+        conn.commit()
+    finally:
+        conn.close()
+        db.dispose()
+
+    return {
+        "sensor": sensor_name,
+        "read": read,
+        "staged": staged,
+        "inserted": inserted,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+def main() -> None:
+    """Parses the command line and backfills the selected sensors in parallel processes."""
+    parser = argparse.ArgumentParser(description="Backfill sensor tables from the CSV logs.")
+    parser.add_argument('--sensors', nargs='+', default=list(SENSOR_COLUMNS), choices=list(SENSOR_COLUMNS),
+                        help="Sensors to backfill (default: all).")
+    parser.add_argument('--workers', type=int, default=len(SENSOR_COLUMNS),
+                        help="Number of sensors processed in parallel.")
+    parser.add_argument('--chunksize', type=int, default=100_000, help="CSV rows per COPY chunk.")
+    parser.add_argument('--logs-dir', default=str(LOGS_DIR), help="Directory holding the <sensor>.csv files.")
+    args = parser.parse_args()
+
+    load_dotenv()
+    database_url = os.getenv("DATABASE_URL")
+    layout = os.getenv("STORAGE_LAYOUT", "per_sensor")
+    keep_logged = os.getenv("STORAGE_KEEP_LOGGED", "0") == "1"
+    if not database_url or make_url(database_url).get_backend_name() != 'postgresql':
+        parser.error("the backfill loads the CSV logs with COPY and needs a PostgreSQL DATABASE_URL")
+
+    jobs = []
+    for sensor_name in args.sensors:
+        csv_path = os.path.join(args.logs_dir, f"{sensor_name}.csv")
+        if not os.path.exists(csv_path):
+            print(f"{sensor_name}: no CSV log at {csv_path}, skipping")
+            continue
+        jobs.append((database_url, sensor_name, SENSOR_COLUMNS[sensor_name], csv_path, args.chunksize,
+                     layout, keep_logged))
+
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = [pool.submit(backfill_sensor, *job) for job in jobs]
+        for future in futures:
+            result = future.result()
+            print(f"{result['sensor']}: read {result['read']}, staged {result['staged']}, "
+                  f"inserted {result['inserted']} rows in {result['seconds']}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,541 @@
+"""
+Control plane of the sensors and experiments.
+
+The ControlPlane owns the stateful part of the dashboard: the sensor objects
+with their measuring threads, the heartbeat watchdog and the experiments. The
+web tier only talks to it through the plain-data methods listed in EXPOSED, so
+the same calls work on an in-process ControlPlane and, through a
+ControlPlaneClient, on one running in a separate controller process. The web
+tier then keeps no device state and can run as several worker processes.
+
+Usage:
+    CONTROL_PLANE_ADDRESS=127.0.0.1:50051 CONTROL_PLANE_AUTHKEY=... python -m device_app.control_plane
+"""
+import os
+import signal
+import threading
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Any
+
+from dotenv import load_dotenv
+
+import experiment_app.experiment1 as experiment1
+import experiment_app.experiment2 as experiment2
+import experiment_app.experiment3 as experiment3
+from device_app.database import open_database
+from device_app.events import bus
+from device_app.monitoring_service import MonitoringService
+from device_app.sensor1 import TemperatureSensor
+from device_app.sensor2 import PressureSensor
+from device_app.sensor3 import RadiationSensor
+from device_app.sensor_runtime import SensorState
+from device_app.socket_ingest import SocketIngestServer
+from device_app.storage import MeasurementStore, open_store
+from device_app.watchdog import HeartbeatWatchdog
+from experiment_app.scenario import Scenario
+from experiment_app.supervisor import ExperimentSupervisor
+
+# Sensor class and constructor options of every sensor
+SENSORS = {
+    'temperature_sensor': (TemperatureSensor, {}),
+    'pressure_sensor': (PressureSensor, {'loglogs': True}),
+    'radiation_sensor': (RadiationSensor, {}),
+}
+
+EXPERIMENTS = {1: experiment1, 2: experiment2, 3: experiment3}
+
+# Origin of the measurement timestamps published to the browsers
+EPOCH = datetime(1970, 1, 1)
+
+SENSOR_COMMANDS = ('start', 'stop', 'start_measuring', 'stop_measuring', 'toggle_loglogs')
+EXPERIMENT_COMMANDS = ('start', 'stop', 'restart', 'toggle_bias', 'toggle_device_failure')
+
+
+def poll_interval(sensor_name: str, default: float = 1.0) -> float:
+    """Nominal polling interval of a sensor, configurable through <SENSOR_NAME>_POLL_INTERVAL."""
+    return float(os.getenv(f"{sensor_name.upper()}_POLL_INTERVAL", default))
+
+
+@dataclass(frozen=True)
+class SensorSnapshot:
+    """
+    Point-in-time view of a sensor, as returned by ControlPlane.snapshot.
+
+    Exposes name, state, ucl and lcl like the sensor itself, so it can be handed
+    to MonitoringService.
+    """
+    name: str
+    state: SensorState
+    ucl: float
+    lcl: float
+    interval: float
+    rate: float
+    data_version: int
+    log_count: int
+    age: float | None
+    stale: bool
+
+
+class ControlPlane:
+    # Methods callable through a ControlPlaneClient
+    EXPOSED = (
+        'ping', 'sensor_names', 'snapshot', 'snapshots', 'sensor_command', 'set_limits', 'logs',
+        'log_warnings', 'age', 'is_stale', 'experiment_command', 'experiment_settings', 'events_since',
+        'lifecycle_events', 'experiment_status', 'run_scenario', 'ingest_sources',
+    )
+
+    def __init__(self, store: MeasurementStore, max_events: int = 1024, max_lifecycle_events: int = 200) -> None:
+        """
+        Initialize the ControlPlane.
+
+        Creates the sensors on the given store, registers them with one heartbeat
+        watchdog and records their new measurements and log lines in a bounded
+        event log, from which every web worker relays them to its browsers.
+        The lifecycle events the experiments and sensors publish on the event
+        bus are kept in a second, numbered history read by the experiments tab.
+        The experiments' generator threads are owned by an ExperimentSupervisor.
+
+        Args:
+            store (MeasurementStore): The measurement store the sensors write to.
+            max_events (int, optional): Events kept for the web workers to catch up. Defaults to 1024.
+            max_lifecycle_events (int, optional): Lifecycle events kept. Defaults to 200.
+        """
+        self.sensors = {
+            name: sensor_class(name=name, store=store, poll_interval=poll_interval(name), **options)
+            for name, (sensor_class, options) in SENSORS.items()
+        }
+        # One watchdog thread checks the heartbeat of every sensor,
+        # the experiments produce a new sample every few seconds
+        self.watchdog = HeartbeatWatchdog(check_interval=1.0, tolerance=3.0)
+        self.supervisor = ExperimentSupervisor({experiment.TOPIC: experiment.exp for experiment in EXPERIMENTS.values()})
+        # Number of measurements ingested per sensor, the web tier redraws a graph when it changes.
+        # Each counter is only written by its sensor's worker thread.
+        self._data_versions = {name: 0 for name in self.sensors}
+        self._events = deque(maxlen=max_events)  # (sequence, topic, event, data)
+        self._sequence = 0
+        self._changed = threading.Condition()
+        self._lifecycle = bus.subscribe()
+        self._lifecycle_history = deque(maxlen=max_lifecycle_events)  # (sequence, event)
+        self._lifecycle_sequence = 0
+        self._lifecycle_lock = threading.Lock()
+        self.ingest_servers = []
+
+        # Out-of-control checks of every new measurement, device failures are the watchdog's
+        self._monitors = {name: MonitoringService(sensor) for name, sensor in self.sensors.items()}
+
+        for sensor in self.sensors.values():
+            self.watchdog.register(sensor, expected_interval=3.0)
+            sensor.ingest_listeners.append(self._on_ingest)
+            sensor.log_messages.listeners.append(self._log_listener(sensor.name))
+
+    def start(self) -> None:
+        """Starts the watchdog."""
+        self.watchdog.start()
+
+    def listen(self, addresses: str | None) -> None:
+        """
+        Starts ingesting measurements sent to sockets, see device_app.socket_ingest.
+
+        Args:
+            addresses (str | None): Comma separated 'udp://host:port' or 'unix:///path' addresses,
+                e.g. INGEST_LISTEN. None or empty for none.
+        """
+        for address in filter(None, (part.strip() for part in (addresses or '').split(','))):
+            server = SocketIngestServer(self.sensors, address)
+            server.start()
+            self.ingest_servers.append(server)
+
+    def shutdown(self) -> None:
+        """Stops the experiments, the sensors' measuring threads and the watchdog."""
+        self.supervisor.shutdown()
+        for server in self.ingest_servers:
+            server.close()
+        for sensor in self.sensors.values():
+            sensor.stop_measuring()
+        self.watchdog.stop()
+        bus.unsubscribe(self._lifecycle)
+
+    # Events _____________________________________________________________________________________
+    def _publish(self, topic: str, event: str, data: dict[str, Any]) -> None:
+        """Appends an event to the event log and wakes the waiting web workers."""
+        with self._changed:
+            self._sequence += 1
+            self._events.append((self._sequence, topic, event, data))
+            self._changed.notify_all()
+
+    def _on_ingest(self, sensor_name: str, value: float, timestamp: datetime) -> None:
+        """
+        Ingest listener counting the measurement and publishing it with the sensor's control limits.
+
+        An out-of-control measurement is logged as a warning here, once, rather
+        than by every browser session redrawing a window that contains it.
+        """
+        self._data_versions[sensor_name] += 1
+        sensor = self.sensors[sensor_name]
+        measurement = {'timestamp_measured': [timestamp], 'value': [value]}
+        for warning in self._monitors[sensor_name].check_out_of_control(measurement, 'value'):
+            sensor.log_warning(warning)
+        # Milliseconds since the epoch of the wall clock time, like the x values of the live graph
+        timestamp_ms = (timestamp.replace(tzinfo=None) - EPOCH).total_seconds() * 1000
+        self._publish(sensor_name, 'measurement', {
+            'value': value, 'timestamp': timestamp_ms, 'ucl': sensor.ucl, 'lcl': sensor.lcl,
+        })
+
+    def _log_listener(self, sensor_name: str):
+        """Returns a log listener publishing the sensor's new log lines."""
+        def publish_log(message: str) -> None:
+            self._publish(sensor_name, 'log', {'message': message})
+        return publish_log
+
+    def events_since(self, sequence: int | None, timeout: float = 1.0) -> tuple[int, list[tuple[str, str, dict]]]:
+        """
+        Returns the events published after sequence, waiting up to timeout for one.
+
+        A caller that fell behind the event log, or whose sequence belongs to a
+        previous controller process, gets one resync event per sensor instead.
+
+        Args:
+            sequence (int | None): The last sequence number seen, None to start at the current one.
+            timeout (float, optional): Seconds to wait when there are no new events. Defaults to 1.0.
+
+        Returns:
+            tuple[int, list[tuple[str, str, dict]]]: The new last sequence and the (topic, event, data) tuples.
+        """
+        with self._changed:
+            if sequence is None:
+                return self._sequence, []
+            self._changed.wait_for(lambda: self._sequence != sequence, timeout=timeout)
+            oldest = self._events[0][0] if self._events else self._sequence + 1
+            if sequence > self._sequence or sequence < oldest - 1:
+                return self._sequence, [(name, 'resync', {}) for name in self.sensors]
+            events = [(topic, event, data) for seq, topic, event, data in self._events if seq > sequence]
+            return self._sequence, events
+
+    def lifecycle_events(self, since: int = 0, last: int = 50) -> tuple[int, list[dict[str, Any]]]:
+        """
+        Returns the lifecycle events of the experiments and sensors published after since, without waiting.
+
+        Args:
+            since (int, optional): The last sequence number seen, 0 for the whole history. Defaults to 0.
+            last (int, optional): Return at most this many of the newest events. Defaults to 50.
+
+        Returns:
+            tuple[int, list[dict[str, Any]]]: The sequence number of the newest event and the events, oldest
+                first, each with sequence, time, topic, event and message.
+        """
+        with self._lifecycle_lock:
+            for event in self._lifecycle.drain():
+                self._lifecycle_sequence += 1
+                self._lifecycle_history.append((self._lifecycle_sequence, event))
+            events = [{'sequence': sequence, 'time': event.time, 'topic': event.topic, 'event': event.name,
+                       'message': event.message}
+                      for sequence, event in self._lifecycle_history if sequence > since]
+            return self._lifecycle_sequence, events[-last:]
+
+    # Sensors ____________________________________________________________________________________
+    def ping(self) -> bool:
+        """Returns True, to check that the control plane is reachable."""
+        return True
+
+    def sensor_names(self) -> list[str]:
+        """Returns the names of the sensors."""
+        return list(self.sensors)
+
+    def snapshot(self, name: str) -> SensorSnapshot:
+        """Returns the current state, control limits, polling rate and versions of a sensor."""
+        sensor = self.sensors[name]
+        return SensorSnapshot(
+            name=name,
+            state=sensor.state,
+            ucl=sensor.ucl,
+            lcl=sensor.lcl,
+            interval=sensor.poller.interval,
+            rate=sensor.poller.rate,
+            data_version=self._data_versions[name],
+            log_count=sensor.log_messages.total,
+            age=self.watchdog.age(name),
+            stale=self.watchdog.is_stale(name),
+        )
+
+    def snapshots(self, names: list[str] | None = None) -> list[SensorSnapshot]:
+        """Returns the snapshots of the given sensors, or of all sensors, in one call."""
+        return [self.snapshot(name) for name in (self.sensors if names is None else names)]
+
+    def sensor_command(self, name: str, command: str) -> str:
+        """
+        Runs a command on a sensor.
+
+        Args:
+            name (str): The name of the sensor.
+            command (str): One of SENSOR_COMMANDS.
+
+        Returns:
+            str: The state of the sensor afterwards.
+        """
+        if command not in SENSOR_COMMANDS:
+            raise ValueError(f"Unknown sensor command: {command}")
+        sensor = self.sensors[name]
+        if command == 'start':
+            sensor.start()
+        elif command == 'stop':
+            sensor.stop()
+        elif command == 'start_measuring':
+            if sensor.state in (SensorState.ON, SensorState.IDLE):
+                sensor.start_measuring()
+        elif command == 'stop_measuring':
+            sensor.stop_measuring()
+        elif command == 'toggle_loglogs':
+            sensor.change_loglogs()
+        return sensor.state.value
+
+    def set_limits(self, name: str, ucl: float, lcl: float) -> None:
+        """Sets the control limits of a sensor."""
+        sensor = self.sensors[name]
+        sensor.ucl = ucl
+        sensor.lcl = lcl
+
+    def logs(self, name: str, last: int | None = None) -> list[str]:
+        """Returns the log messages of a sensor, only the last ones if last is given."""
+        messages = self.sensors[name].get_logs()
+        return list(messages if last is None else messages[-last:])
+
+    def log_warnings(self, name: str, messages: list[str]) -> None:
+        """Logs warning messages to a sensor's log."""
+        sensor = self.sensors[name]
+        for message in messages:
+            sensor.log_warning(message)
+
+    def ingest_sources(self) -> list[dict[str, Any]]:
+        """Returns the statistics of every socket ingest address and its senders."""
+        return [server.stats() for server in self.ingest_servers]
+
+    def age(self, name: str) -> float | None:
+        """Seconds since the sensor last produced data while measuring, see HeartbeatWatchdog.age."""
+        return self.watchdog.age(name)
+
+    def is_stale(self, name: str) -> bool:
+        """Whether the sensor is measuring without data, see HeartbeatWatchdog.is_stale."""
+        return self.watchdog.is_stale(name)
+
+    # Experiments ________________________________________________________________________________
+    def experiment_command(self, number: int, command: str) -> str:
+        """
+        Runs a command on an experiment.
+
+        Args:
+            number (int): The experiment, 1 to 3.
+            command (str): One of EXPERIMENT_COMMANDS.
+
+        Starting a running experiment does nothing, stopping one waits for its
+        generator thread to end. The experiment publishes the resulting
+        lifecycle event, see lifecycle_events.
+
+        Returns:
+            str: The log message of the experiment.
+        """
+        if command not in EXPERIMENT_COMMANDS:
+            raise ValueError(f"Unknown experiment command: {command}")
+        name = EXPERIMENTS[number].TOPIC
+        if command == 'start':
+            return self.supervisor.start(name)
+        if command == 'stop':
+            return self.supervisor.stop(name)
+        if command == 'restart':
+            return self.supervisor.restart(name)
+        return self.supervisor.toggle_fault(name, 'bias' if command == 'toggle_bias' else 'failure')
+
+    def experiment_status(self) -> dict[int, dict[str, bool]]:
+        """Returns whether every experiment is running, and has bias or a device failure injected, by number."""
+        status = self.supervisor.status()
+        return {number: status[experiment.TOPIC] for number, experiment in EXPERIMENTS.items()}
+
+    def run_scenario(self, scenario: dict[str, Any], speed: float = 1.0) -> str:
+        """
+        Runs a fault-injection scenario on the experiments, see ExperimentSupervisor.run_scenario.
+
+        Args:
+            scenario (dict[str, Any]): The scenario in its JSON representation.
+            speed (float, optional): Runs the schedule this many times faster than real time. Defaults to 1.0.
+
+        Returns:
+            str: The log message of the supervisor.
+        """
+        return self.supervisor.run_scenario(Scenario.from_dict(scenario), speed)
+
+    def experiment_settings(self, number: int) -> dict[str, float]:
+        """Returns the mean, standard deviation and bias of the data generated by an experiment."""
+        exp = EXPERIMENTS[number].exp
+        return {'mean': exp.mean, 'stddev': exp.stddev, 'bias': exp.bias}
+
+
+# Remote access ________________________________________________________________________________
+def parse_address(address: str) -> tuple[str, int] | str:
+    """Parses CONTROL_PLANE_ADDRESS: 'host:port' for TCP, a file system path for a Unix socket."""
+    if address.startswith('/') or ':' not in address:
+        return address
+    host, port = address.rsplit(':', 1)
+    return host, int(port)
+
+
+def parse_authkey(address: tuple[str, int] | str, authkey: str | None) -> bytes | None:
+    """Returns the authkey as bytes. TCP addresses need one, the calls are pickled."""
+    if authkey:
+        return authkey.encode()
+    if isinstance(address, tuple):
+        raise ValueError("CONTROL_PLANE_AUTHKEY is required for a TCP CONTROL_PLANE_ADDRESS")
+    return None
+
+
+class ControlPlaneServer:
+    def __init__(self, control: ControlPlane, address: str, authkey: str | None = None) -> None:
+        """
+        Initialize the ControlPlaneServer.
+
+        Serves the EXPOSED methods of a ControlPlane to ControlPlaneClients, one
+        thread per connection, so a web worker waiting for events does not hold
+        up the calls of the others.
+
+        Args:
+            control (ControlPlane): The control plane to serve.
+            address (str): 'host:port' or the path of a Unix socket.
+            authkey (str, optional): Shared secret of the connections. Required for TCP.
+        """
+        self.control = control
+        self.address = parse_address(address)
+        self.authkey = parse_authkey(self.address, authkey)
+        self._listener = None
+
+    def serve_forever(self) -> None:
+        """Accepts connections until close() is called."""
+        self._listener = Listener(self.address, authkey=self.authkey)
+        print(f"Control plane listening on {self._listener.address}")
+        while True:
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                if self._listener is None:
+                    return
+                continue  # Failed handshake, e.g. a wrong authkey
+            threading.Thread(target=self._handle, args=(conn,), name='control-plane-conn', daemon=True).start()
+
+    def close(self) -> None:
+        """Stops accepting connections."""
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.close()
+
+    def _handle(self, conn: Connection) -> None:
+        """Answers the calls of one client until it disconnects."""
+        with conn:
+            while True:
+                try:
+                    method, args, kwargs = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    if method not in ControlPlane.EXPOSED:
+                        raise AttributeError(f"ControlPlane has no exposed method {method!r}")
+                    reply = ('ok', getattr(self.control, method)(*args, **kwargs))
+                except Exception as e:
+                    reply = ('error', e)
+                try:
+                    conn.send(reply)
+                except (EOFError, OSError):
+                    return
+
+
+class ControlPlaneClient:
+    def __init__(self, address: str, authkey: str | None = None) -> None:
+        """
+        Initialize the ControlPlaneClient.
+
+        Calls the EXPOSED methods of a ControlPlane served by a controller
+        process, e.g. client.snapshot('temperature_sensor'). Every thread uses its
+        own connection, which is reopened if the controller restarted.
+
+        Args:
+            address (str): 'host:port' or the path of a Unix socket.
+            authkey (str, optional): Shared secret of the connections. Required for TCP.
+        """
+        self.address = parse_address(address)
+        self.authkey = parse_authkey(self.address, authkey)
+        self._local = threading.local()
+
+    def _call(self, method: str, *args, **kwargs) -> Any:
+        """
+        Sends one call and returns its result, raising the exception raised by the control plane.
+
+        A call is only sent again if connecting or sending failed. Once it went
+        out, a lost reply raises instead, as the control plane may have run it
+        and commands such as toggle_bias must not run twice.
+        """
+        for attempt in (1, 2):
+            conn = getattr(self._local, 'conn', None)
+            try:
+                if conn is not None and conn.poll(0):
+                    # An idle connection has nothing to read unless the controller closed it
+                    conn.close()
+                    conn = None
+                if conn is None:
+                    conn = self._local.conn = Client(self.address, authkey=self.authkey)
+                conn.send((method, args, kwargs))
+                break
+            except (EOFError, OSError):
+                self._local.conn = None
+                if attempt == 2:
+                    raise
+        try:
+            status, result = conn.recv()
+        except (EOFError, OSError):
+            self._local.conn = None
+            raise
+        if status == 'error':
+            raise result
+        return result
+
+    def __getattr__(self, method: str):
+        if method not in ControlPlane.EXPOSED:
+            raise AttributeError(method)
+        def call(*args, **kwargs):
+            return self._call(method, *args, **kwargs)
+        return call
+
+
+def main() -> None:
+    """Runs the controller process: the sensors, the watchdog and the experiments behind a ControlPlaneServer."""
+    load_dotenv()
+    address = os.getenv("CONTROL_PLANE_ADDRESS", "127.0.0.1:50051")
+    database = open_database(
+        os.getenv("DATABASE_URL", "sqlite:///logs/sensor_data.db"),
+        ingest_pool_size=int(os.getenv("DB_INGEST_POOL_SIZE", 3)),
+        query_pool_size=1,
+    )
+    store = open_store(
+        database,
+        layout=os.getenv("STORAGE_LAYOUT", "per_sensor"),
+        keep_logged=os.getenv("STORAGE_KEEP_LOGGED", "0") == "1",
+    )
+    control = ControlPlane(store)
+    server = ControlPlaneServer(control, address, os.getenv("CONTROL_PLANE_AUTHKEY"))
+
+    def stop(signum, frame):
+        server.close()
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    control.start()
+    control.listen(os.getenv("INGEST_LISTEN"))
+    try:
+        server.serve_forever()
+    finally:
+        control.shutdown()
+        database.dispose()
+
+
+if __name__ == "__main__":
+    # Run the imported module, so the snapshots are pickled as device_app.control_plane.SensorSnapshot
+    from device_app.control_plane import main
+    main()
@@ -0,0 +1,358 @@
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable
+
+from sqlalchemy import create_engine, event, inspect, make_url, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+
+
+class DatabaseUnavailableError(Exception):
+    """Raised when a statement still fails after all reconnect attempts."""
+
+
+class Database:
+    # Dialect specific DDL used by the measurement stores
+    serial_primary_key = "SERIAL PRIMARY KEY"
+    small_serial_primary_key = "SMALLSERIAL PRIMARY KEY"
+    supports_index_include = True
+
+    def __init__(self, url: str, ingest_pool_size: int = 3, query_pool_size: int = 5,
+                 max_overflow: int = 2, pool_timeout: float = 10.0, retries: int = 3,
+                 retry_backoff: float = 0.5) -> None:
+        """
+        Initialize the Database access layer.
+
+        Sensors write through a small ingest pool while dashboard callbacks read
+        through a separate query pool, so slow dashboard queries can never starve
+        measurement inserts. Every connection is checked with a ping before use,
+        and statements failing because the server went away are retried on a
+        fresh connection with exponential backoff.
+
+        Args:
+            url (str): SQLAlchemy database URL.
+            ingest_pool_size (int, optional): Connections kept for sensor inserts. Defaults to 3.
+            query_pool_size (int, optional): Connections kept for dashboard queries. Defaults to 5.
+            max_overflow (int, optional): Extra connections each pool may open under load. Defaults to 2.
+            pool_timeout (float, optional): Seconds to wait for a free connection. Defaults to 10.0.
+            retries (int, optional): Attempts after the first failed one. Defaults to 3.
+            retry_backoff (float, optional): Seconds before the first retry, doubled on every retry. Defaults to 0.5.
+        """
+        self.url = url
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self._metrics_lock = threading.Lock()
+        self._metrics = {}
+        self._query_listeners = []
+
+        pool_options = dict(max_overflow=max_overflow, pool_timeout=pool_timeout,
+                            pool_pre_ping=True, pool_recycle=1800)
+        self.ingest_engine = self._create_engine('ingest', pool_size=ingest_pool_size, **pool_options)
+        self.query_engine = self._create_engine('query', pool_size=query_pool_size, **pool_options)
+
+    def _create_engine(self, name: str, **options) -> Engine:
+        """Creates one of the two engines and hooks its pool events into the metrics."""
+        engine = create_engine(self.url, **options)
+        self._metrics[name] = {'connects': 0, 'checkouts': 0, 'invalidated': 0,
+                               'statements': 0, 'retries': 0, 'failures': 0}
+
+        def count(key):
+            def listener(*args):
+                self._count(name, key)
+            return listener
+
+        event.listen(engine.pool, 'connect', count('connects'))
+        event.listen(engine.pool, 'checkout', count('checkouts'))
+        event.listen(engine.pool, 'invalidate', count('invalidated'))
+        return engine
+
+    def _count(self, pool: str, key: str, amount: int = 1) -> None:
+        """Increments one of the metrics counters."""
+        with self._metrics_lock:
+            self._metrics[pool][key] += amount
+
+    def _run(self, pool: str, engine: Engine, work: Callable[[Any], Any]) -> Any:
+        """
+        Runs work(connection) inside a transaction, retrying on lost connections.
+
+        Raises:
+            DatabaseUnavailableError: If the last attempt failed as well.
+        """
+        delay = self.retry_backoff
+        for attempt in range(self.retries + 1):
+            connected = False
+            try:
+                with engine.connect() as conn:
+                    connected = True
+                    with conn.begin():
+                        result = work(conn)
+                self._count(pool, 'statements')
+                return result
+            except DBAPIError as e:
+                self._count(pool, 'failures')
+                # Only a failed connect or a dropped connection is worth retrying
+                if connected and not e.connection_invalidated:
+                    raise
+                if attempt == self.retries:
+                    raise DatabaseUnavailableError(str(e)) from e
+                self._count(pool, 'retries')
+                print(f"Database {pool} connection lost, retrying in {delay:.1f}s: {e.__class__.__name__}")
+                time.sleep(delay)
+                delay *= 2
+
+    def execute(self, sql: str, params: dict | list[dict] | None = None) -> None:
+        """
+        Executes a write statement through the ingest pool.
+
+        Args:
+            sql (str): SQL with :name style parameters.
+            params (dict | list[dict], optional): Parameters, a list executes the statement for each entry.
+        """
+        self._run('ingest', self.ingest_engine, lambda conn: conn.execute(text(sql), params))
+
+    def insert(self, sql: str, params: dict) -> None:
+        """
+        Writes one measurement row through the ingest pool.
+
+        Backends may buffer the row and write it together with others later on.
+
+        Args:
+            sql (str): INSERT statement with :name style parameters.
+            params (dict): Parameters of the row.
+        """
+        self.execute(sql, params)
+
+    def flush(self) -> None:
+        """Writes out buffered rows. Nothing is buffered by default."""
+
+    def add_query_listener(self, listener: Callable[[float, int], None]) -> None:
+        """
+        Registers a listener called after every query of read_sql.
+
+        Args:
+            listener (Callable[[float, int], None]): Called with the seconds the query took, including
+                its retries, and the number of rows it returned, on the thread that ran it.
+        """
+        self._query_listeners.append(listener)
+
+    def read_sql(self, sql: str, params: dict | None = None, parse_dates: list[str] | None = None):
+        """
+        Runs a query through the query pool.
+
+        Args:
+            sql (str): SQL with :name style parameters.
+            params (dict, optional): Query parameters.
+            parse_dates (list[str], optional): Columns to convert to datetimes.
+
+        Returns:
+            pd.DataFrame: The query result.
+        """
+        import pandas as pd
+        started = time.perf_counter()
+        df = self._run('query', self.query_engine,
+                       lambda conn: pd.read_sql_query(text(sql), conn, params=params, parse_dates=parse_dates))
+        for listener in self._query_listeners:
+            listener(time.perf_counter() - started, len(df))
+        return df
+
+    def scalar(self, sql: str, params: dict | None = None) -> Any:
+        """
+        Runs a query returning a single value through the query pool, without pandas.
+
+        Args:
+            sql (str): SQL with :name style parameters.
+            params (dict, optional): Query parameters.
+
+        Returns:
+            Any: The first column of the first row, None if there is no row.
+        """
+        return self._run('query', self.query_engine, lambda conn: conn.execute(text(sql), params).scalar())
+
+    def table_columns(self) -> dict[str, list[str]]:
+        """Returns the column names of every table in the database, read from its catalog through the query pool."""
+        def work(conn):
+            inspector = inspect(conn)
+            return {table: [column['name'] for column in inspector.get_columns(table)]
+                    for table in inspector.get_table_names()}
+        return self._run('query', self.query_engine, work)
+
+    def health_check(self) -> dict[str, bool]:
+        """Runs SELECT 1 on both pools and reports which of them can reach the database."""
+        health = {}
+        for pool, engine in (('ingest', self.ingest_engine), ('query', self.query_engine)):
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text('SELECT 1'))
+                health[pool] = True
+            except DBAPIError:
+                health[pool] = False
+        return health
+
+    def pool_metrics(self) -> dict[str, dict[str, int]]:
+        """Returns the usage counters and the current occupancy of both pools."""
+        metrics = {}
+        for pool, engine in (('ingest', self.ingest_engine), ('query', self.query_engine)):
+            with self._metrics_lock:
+                metrics[pool] = dict(self._metrics[pool])
+            metrics[pool].update(size=engine.pool.size(), checked_out=engine.pool.checkedout(),
+                                 overflow=engine.pool.overflow())
+        return metrics
+
+    def dispose(self) -> None:
+        """Closes all pooled connections."""
+        self.ingest_engine.dispose()
+        self.query_engine.dispose()
+
+
+class SQLiteDatabase(Database):
+    serial_primary_key = "INTEGER PRIMARY KEY"
+    small_serial_primary_key = "INTEGER PRIMARY KEY"
+    supports_index_include = False
+
+    def __init__(self, url: str, batch_size: int = 50, flush_interval: float = 1.0,
+                 busy_timeout: float = 5.0, **options) -> None:
+        """
+        Initialize the embedded SQLite backend.
+
+        The database file is opened in WAL mode, so dashboard reads never block
+        sensor writes and the other way around. Since SQLite has a single writer
+        and every commit costs an fsync, inserted rows are buffered and written
+        in one transaction once batch_size rows are pending or flush_interval
+        seconds have passed. Queries flush the buffer first so they always see
+        every inserted row.
+
+        Args:
+            url (str): SQLAlchemy URL of a SQLite file, e.g. sqlite:///data/sensors.db.
+            batch_size (int, optional): Buffered rows that trigger a write. Defaults to 50.
+            flush_interval (float, optional): Maximum seconds a row stays buffered. Defaults to 1.0.
+            busy_timeout (float, optional): Seconds to wait for the write lock. Defaults to 5.0.
+            **options: Pool and retry options, see Database.
+        """
+        if make_url(url).database in (None, '', ':memory:'):
+            raise ValueError("The SQLite backend needs a database file, in-memory databases are not shared between connections")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.busy_timeout = busy_timeout
+        self._buffer = {}
+        self._buffered = 0
+        self._buffer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._flusher = None
+        super().__init__(url, **options)
+
+    def _create_engine(self, name: str, **options) -> Engine:
+        """Creates the engine and switches every new connection to WAL mode."""
+        engine = super()._create_engine(name, **options)
+
+        def set_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA busy_timeout={int(self.busy_timeout * 1000)}")
+            cursor.execute("PRAGMA foreign_keys=ON")
+            cursor.close()
+
+        event.listen(engine, 'connect', set_pragmas)
+        return engine
+
+    @staticmethod
+    def _adapt(params: dict | None) -> dict | None:
+        """Stores datetimes as fixed width ISO strings, which sort and compare chronologically."""
+        if params is None:
+            return None
+        return {key: value.isoformat(sep=' ', timespec='microseconds') if isinstance(value, datetime) else value
+                for key, value in params.items()}
+
+    def execute(self, sql: str, params: dict | list[dict] | None = None) -> None:
+        if isinstance(params, list):
+            params = [self._adapt(row) for row in params]
+        else:
+            params = self._adapt(params)
+        super().execute(sql, params)
+
+    def insert(self, sql: str, params: dict) -> None:
+        with self._buffer_lock:
+            self._buffer.setdefault(sql, []).append(self._adapt(params))
+            self._buffered += 1
+            full = self._buffered >= self.batch_size
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name="sqlite-flusher", daemon=True)
+                self._flusher.start()
+        if full:
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes all buffered rows, one executemany per statement, in a single transaction."""
+        with self._flush_lock:
+            with self._buffer_lock:
+                batches, self._buffer, self._buffered = self._buffer, {}, 0
+            if not batches:
+                return
+
+            def work(conn):
+                for sql, rows in batches.items():
+                    conn.execute(text(sql), rows)
+
+            try:
+                self._run('ingest', self.ingest_engine, work)
+            except DatabaseUnavailableError:
+                # Keep the rows for the next flush instead of dropping them
+                with self._buffer_lock:
+                    for sql, rows in batches.items():
+                        self._buffer[sql] = rows + self._buffer.get(sql, [])
+                        self._buffered += len(rows)
+                raise
+            except DBAPIError as e:
+                # Rejected by the database, retrying would fail again; the rows are still in the CSV logs
+                print(f"Dropped {sum(len(rows) for rows in batches.values())} buffered rows: {e}")
+
+    def _flush_loop(self) -> None:
+        """Flushes the buffer every flush_interval seconds until dispose."""
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+            except DatabaseUnavailableError:
+                pass
+
+    def read_sql(self, sql: str, params: dict | None = None, parse_dates: list[str] | None = None):
+        self.flush()
+        return super().read_sql(sql, self._adapt(params), parse_dates)
+
+    def scalar(self, sql: str, params: dict | None = None) -> Any:
+        self.flush()
+        return super().scalar(sql, self._adapt(params))
+
+    def pool_metrics(self) -> dict[str, dict[str, int]]:
+        metrics = super().pool_metrics()
+        with self._buffer_lock:
+            metrics['ingest']['buffered'] = self._buffered
+        return metrics
+
+    def dispose(self) -> None:
+        """Writes out the buffered rows and closes all connections."""
+        self._stop_event.set()
+        try:
+            self.flush()
+        finally:
+            super().dispose()
+
+
+def open_database(url: str, **options) -> Database:
+    """
+    Creates the database backend matching the URL.
+
+    sqlite:///path/to/file.db selects the embedded SQLite backend, any other
+    URL (postgresql://...) the pooled server backend.
+
+    Args:
+        url (str): SQLAlchemy database URL.
+        **options: Backend options, see Database and SQLiteDatabase.
+
+    Returns:
+        Database: The database backend.
+    """
+    if make_url(url).get_backend_name() == 'sqlite':
+        return SQLiteDatabase(url, **options)
+    return Database(url, **options)
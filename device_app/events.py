@@ -0,0 +1,116 @@
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Iterable
+
+
+@dataclass(frozen=True)
+class Event:
+    """A lifecycle event, e.g. an experiment that started or a sensor that changed state."""
+    topic: str  # 'experiment1' ... or a sensor name
+    name: str  # e.g. 'started', 'stopped', 'bias', 'device_failure', 'state'
+    data: dict[str, Any] = field(default_factory=dict)
+    time: float = field(default_factory=time.time)
+
+    @property
+    def message(self) -> str:
+        """The human readable message of the event."""
+        return self.data.get('message', f"{self.topic}: {self.name}")
+
+
+class Subscription:
+    def __init__(self, topics: Iterable[str] | None = None, max_buffer: int = 256) -> None:
+        """
+        Initialize the Subscription.
+
+        Buffers the events of its topics until they are drained. The buffer is
+        bounded: once full, every new event pushes out the oldest one, which is
+        counted in dropped, so a subscriber that stops reading never holds up
+        the publishers or grows without bound.
+
+        Args:
+            topics (Iterable[str], optional): Topics to receive, None for all topics.
+            max_buffer (int, optional): Events buffered until drained. Defaults to 256.
+        """
+        self.topics = None if topics is None else frozenset(topics)
+        self.dropped = 0
+        self._buffer = deque(maxlen=max_buffer)
+        self._lock = threading.Lock()
+
+    def wants(self, topic: str) -> bool:
+        """Whether the subscription receives events of topic."""
+        return self.topics is None or topic in self.topics
+
+    def put(self, event: Event) -> None:
+        """Buffers an event without blocking, dropping the oldest one if the buffer is full."""
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+            self._buffer.append(event)
+
+    def drain(self) -> list[Event]:
+        """Returns the buffered events, oldest first, and empties the buffer. Never waits."""
+        with self._lock:
+            events = list(self._buffer)
+            self._buffer.clear()
+        return events
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+
+class EventBus:
+    def __init__(self, max_buffer: int = 256) -> None:
+        """
+        Initialize the EventBus.
+
+        Publish/subscribe of lifecycle events between the experiments, the
+        sensors and their readers in the same process. Publishing never blocks:
+        it only appends to the bounded buffer of every interested subscription,
+        and subscribers read their buffer without waiting.
+
+        Args:
+            max_buffer (int, optional): Default buffer size of a subscription. Defaults to 256.
+        """
+        self.max_buffer = max_buffer
+        self.published = 0
+        self._subscriptions = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, topics: Iterable[str] | None = None, max_buffer: int | None = None) -> Subscription:
+        """Registers a subscription to the events of topics, or of all topics."""
+        subscription = Subscription(topics, max_buffer or self.max_buffer)
+        with self._lock:
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Removes a subscription."""
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def publish(self, topic: str, name: str, data: dict[str, Any] | None = None) -> Event:
+        """
+        Publishes an event to the subscriptions of its topic without blocking.
+
+        Args:
+            topic (str): The experiment or sensor the event belongs to.
+            name (str): The event name.
+            data (dict[str, Any], optional): Payload, with the human readable text under 'message'.
+
+        Returns:
+            Event: The published event.
+        """
+        event = Event(topic, name, data or {})
+        with self._lock:
+            self.published += 1
+            targets = [subscription for subscription in self._subscriptions if subscription.wants(topic)]
+        for subscription in targets:
+            subscription.put(event)
+        return event
+
+
+# Lifecycle events of the experiments and sensors of this process
+bus = EventBus()
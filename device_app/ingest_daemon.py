@@ -0,0 +1,115 @@
+"""
+Headless ingest daemon.
+
+Runs the sensors and experiments of the control plane without the dashboard:
+the selected experiments are started, the selected sensors switched on and
+measuring, and their measurements written to the database until the process
+is stopped. Neither Dash, Plotly nor pandas is imported, so the daemon stays
+small and keeps ingesting while the dashboard restarts.
+
+With --listen or INGEST_LISTEN, it also ingests the measurements external
+devices send to UDP or Unix datagram sockets, see device_app.socket_ingest.
+
+If CONTROL_PLANE_ADDRESS is set, the daemon also serves its control plane
+there, so dashboards started with the same address show and control it.
+
+Signals:
+    SIGTERM, SIGINT: stop the experiments and sensors, flush the buffered rows and exit.
+    SIGHUP: flush the buffered rows now.
+
+Usage:
+    python -m device_app.ingest_daemon [--sensors temperature_sensor ...] [--experiments 1 2 3]
+        [--scenario experiment_app/scenarios/experiments.json [--scenario-speed 2]]
+        [--listen udp://127.0.0.1:9750 unix:///tmp/ingest.sock]
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from dotenv import load_dotenv
+
+from device_app.control_plane import EXPERIMENTS, SENSORS, ControlPlane, ControlPlaneServer
+from device_app.database import open_database
+from device_app.storage import open_store
+
+
+def main() -> None:
+    """Parses the command line, starts the selected experiments and sensors and ingests until signalled."""
+    parser = argparse.ArgumentParser(description="Ingest sensor measurements without the dashboard.")
+    parser.add_argument('--sensors', nargs='*', default=list(SENSORS), choices=list(SENSORS),
+                        help="Sensors to start measuring (default: all).")
+    parser.add_argument('--experiments', nargs='*', type=int, default=list(EXPERIMENTS), choices=list(EXPERIMENTS),
+                        help="Experiments generating data to start (default: all).")
+    parser.add_argument('--listen', nargs='*', default=None,
+                        help="udp://host:port or unix:///path addresses to ingest measurements from "
+                             "(default: INGEST_LISTEN).")
+    parser.add_argument('--scenario', help="JSON file of a fault-injection scenario to run on the experiments.")
+    parser.add_argument('--scenario-speed', type=float, default=1.0,
+                        help="Runs the scenario's schedule this many times faster than real time (default: 1).")
+    args = parser.parse_args()
+
+    load_dotenv()
+    database = open_database(
+        os.getenv("DATABASE_URL", "sqlite:///logs/sensor_data.db"),
+        ingest_pool_size=int(os.getenv("DB_INGEST_POOL_SIZE", 3)),
+        query_pool_size=1,
+    )
+    store = open_store(
+        database,
+        layout=os.getenv("STORAGE_LAYOUT", "per_sensor"),
+        keep_logged=os.getenv("STORAGE_KEEP_LOGGED", "0") == "1",
+    )
+    control = ControlPlane(store)
+
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stopping.set())
+    if hasattr(signal, 'SIGHUP'):
+        signal.signal(signal.SIGHUP, lambda signum, frame: database.flush())
+
+    server = None
+    address = os.getenv("CONTROL_PLANE_ADDRESS")
+    if address:
+        server = ControlPlaneServer(control, address, os.getenv("CONTROL_PLANE_AUTHKEY"))
+        threading.Thread(target=server.serve_forever, name='control-plane-server', daemon=True).start()
+
+    control.start()
+    control.listen(os.getenv("INGEST_LISTEN") if args.listen is None else ','.join(args.listen))
+    for number in args.experiments:
+        print(control.experiment_command(number, 'start'))
+    for name in args.sensors:
+        control.sensor_command(name, 'start')
+        control.sensor_command(name, 'start_measuring')
+    if args.scenario:
+        with open(args.scenario) as file:
+            print(control.run_scenario(json.load(file), args.scenario_speed))
+    print(f"Ingest daemon running (pid {os.getpid()}), stop with SIGTERM or Ctrl+C")
+
+    # Wake up regularly, signal handlers only run between bytecodes of the main thread
+    while not stopping.wait(1.0):
+        pass
+
+    print("Ingest daemon stopping")
+    if server is not None:
+        server.close()
+    control.shutdown()
+    database.dispose()  # Writes out the rows still buffered
+    measurements = sum(snapshot.data_version for snapshot in control.snapshots())
+    report = f"Ingest daemon stopped after {measurements} measurements"
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        report += f", peak RSS {peak_rss / (2**20 if sys.platform == 'darwin' else 2**10):.1f} MB"
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import time
+
+
+class AdaptivePoller:
+    def __init__(self, nominal_interval: float = 1.0, min_interval: float | None = None,
+                 max_interval: float | None = None, backoff: float = 1.5, margin: float = 0.1,
+                 idle_after: float | None = None) -> None:
+        """
+        Initialize the AdaptivePoller object.
+
+        The poller decides how long a sensor waits before its next read. It backs off
+        geometrically once no new data arrived for idle_after seconds and polls at its
+        fastest rate while the latest value is close to (or beyond) the control limits.
+
+        Args:
+            nominal_interval (float, optional): Seconds between reads in normal operation. Defaults to 1.0.
+            min_interval (float, optional): Fastest polling interval. Defaults to nominal_interval / 4.
+            max_interval (float, optional): Slowest polling interval. Defaults to nominal_interval * 5.
+            backoff (float, optional): Factor the interval grows by for every idle read. Defaults to 1.5.
+            margin (float, optional): Fraction of the UCL-LCL band next to each limit that
+                counts as approaching the limit. Defaults to 0.1.
+            idle_after (float, optional): Seconds without new data before the poller starts
+                backing off. Defaults to nominal_interval * 5.
+        """
+        self.nominal_interval = nominal_interval
+        self.min_interval = nominal_interval / 4 if min_interval is None else min_interval
+        self.max_interval = nominal_interval * 5 if max_interval is None else max_interval
+        self.backoff = backoff
+        self.margin = margin
+        self.idle_after = nominal_interval * 5 if idle_after is None else idle_after
+        self.interval = nominal_interval
+        self._last_new_data = time.monotonic()
+
+    def near_limits(self, value: float, ucl: float | None, lcl: float | None) -> bool:
+        """Returns True if the value lies within the margin of a control limit or outside them."""
+        if ucl is None or lcl is None:
+            return False
+        band = (ucl - lcl) * self.margin
+        return value >= ucl - band or value <= lcl + band
+
+    def next_interval(self, value: float | None, ucl: float | None = None, lcl: float | None = None) -> float:
+        """
+        Computes the wait before the next read.
+
+        Args:
+            value (float | None): The newly read value, or None if the read produced no new data.
+            ucl (float | None, optional): The sensor's upper control limit.
+            lcl (float | None, optional): The sensor's lower control limit.
+
+        Returns:
+            float: Seconds to wait before the next read.
+        """
+        now = time.monotonic()
+        if value is None:
+            if now - self._last_new_data >= self.idle_after:
+                self.interval = min(self.interval * self.backoff, self.max_interval)
+            return self.interval
+
+        self._last_new_data = now
+        if self.near_limits(value, ucl, lcl):
+            self.interval = self.min_interval
+        else:
+            self.interval = self.nominal_interval
+        return self.interval
+
+    def reset(self) -> None:
+        """Returns to the nominal interval, e.g. when measuring restarts."""
+        self.interval = self.nominal_interval
+        self._last_new_data = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        """The current polling rate in Hz."""
+        return 1.0 / self.interval
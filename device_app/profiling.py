@@ -0,0 +1,395 @@
+import bisect
+import cProfile
+import functools
+import inspect
+import io
+import marshal
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable
+
+from dash.exceptions import PreventUpdate
+
+# Upper bucket bounds of the histograms, the last bucket holds everything above
+MILLISECOND_BOUNDS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+BYTE_BOUNDS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+ROW_BOUNDS = (0, 10, 100, 1000, 10000, 100000, 1000000)
+
+CAPTURE_KINDS = ('cprofile', 'tracemalloc')
+
+
+class RollingHistogram:
+    def __init__(self, bounds: tuple[float, ...], window: int = 1000) -> None:
+        """
+        Initialize the RollingHistogram.
+
+        Keeps the last window samples, so the summary follows the current load
+        instead of averaging over the whole uptime.
+
+        Args:
+            bounds (tuple[float, ...]): Ascending upper bounds of the buckets.
+            window (int, optional): Number of most recent samples kept. Defaults to 1000.
+        """
+        self.bounds = bounds
+        self.samples = deque(maxlen=window)
+        self.total = 0
+
+    def add(self, value: float) -> None:
+        """Adds a sample, dropping the oldest one once the window is full."""
+        self.samples.append(value)
+        self.total += 1
+
+    def summary(self) -> dict[str, Any]:
+        """
+        Summarizes the samples in the window.
+
+        Returns:
+            dict[str, Any]: Sample counts, mean, p50, p95, p99 and max, and the [upper bound, count] of
+                every bucket, 'inf' for the last one.
+        """
+        values = sorted(self.samples)
+        summary = {'count': len(values), 'total': self.total}
+        if not values:
+            return summary
+
+        def percentile(fraction):
+            return values[min(int(fraction * len(values)), len(values) - 1)]
+
+        buckets = [0] * (len(self.bounds) + 1)
+        for value in values:
+            buckets[bisect.bisect_left(self.bounds, value)] += 1
+        summary.update(
+            mean=round(sum(values) / len(values), 3), p50=percentile(0.5), p95=percentile(0.95),
+            p99=percentile(0.99), max=values[-1],
+            buckets=[[bound, count] for bound, count in zip((*self.bounds, 'inf'), buckets)],
+        )
+        return summary
+
+
+class CallbackStats:
+    def __init__(self, window: int = 1000) -> None:
+        """
+        Initialize the CallbackStats of one callback.
+
+        Args:
+            window (int, optional): Invocations kept by the rolling histograms. Defaults to 1000.
+        """
+        self.calls = 0
+        self.prevented = 0
+        self.errors = 0
+        self.slow = 0
+        self.wall_ms = RollingHistogram(MILLISECOND_BOUNDS, window)
+        self.db_ms = RollingHistogram(MILLISECOND_BOUNDS, window)
+        self.response_bytes = RollingHistogram(BYTE_BOUNDS, window)
+        self.rows = RollingHistogram(ROW_BOUNDS, window)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Returns the counters and the histogram summaries."""
+        return {
+            'calls': self.calls, 'prevented': self.prevented, 'errors': self.errors, 'slow': self.slow,
+            'wall_ms': self.wall_ms.summary(), 'db_ms': self.db_ms.summary(),
+            'response_bytes': self.response_bytes.summary(), 'rows': self.rows.summary(),
+        }
+
+
+class _Invocation:
+    __slots__ = ('db_seconds', 'queries', 'rows')
+
+    def __init__(self) -> None:
+        self.db_seconds = 0.0
+        self.queries = 0
+        self.rows = 0
+
+
+class CallbackProfiler:
+    def __init__(self, budget: float = 0.5, window: int = 1000, slow_log_size: int = 100) -> None:
+        """
+        Initialize the CallbackProfiler.
+
+        Records the wall time, database time, rows read and size of the
+        serialized response of every invocation of the instrumented Dash
+        callbacks, and logs the invocations slower than the budget. The
+        database time and rows are those of the queries the callback ran on its
+        own thread through a watched Database, so concurrent sensor inserts and
+        other requests are not attributed to it; query cache hits read no rows.
+
+        On request the next invocations are captured with cProfile or
+        tracemalloc, one invocation at a time, and the result is kept for
+        download.
+
+        Args:
+            budget (float, optional): Seconds after which an invocation is logged as slow. Defaults to 0.5.
+            window (int, optional): Invocations per callback kept by the rolling histograms. Defaults to 1000.
+            slow_log_size (int, optional): Number of most recent slow invocations kept. Defaults to 100.
+        """
+        self.budget = budget
+        self.window = window
+        self.slow_log = deque(maxlen=slow_log_size)
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Capture state: kind, callback filter, invocations left and the accumulated results
+        self._capture = None
+        self._capture_result = None
+        # cProfile and tracemalloc observe the whole process, so one invocation is captured at a time
+        self._capture_lock = threading.Lock()
+
+    # Instrumentation _______________________________________________________________________________
+    def instrument(self, callback_map: dict[str, dict[str, Any]]) -> int:
+        """
+        Wraps the callbacks registered in a Dash app's callback_map.
+
+        Call it once all callbacks are registered. Clientside callbacks run in
+        the browser and are not part of the map; async callbacks are skipped.
+
+        Args:
+            callback_map (dict[str, dict[str, Any]]): The app's callback_map.
+
+        Returns:
+            int: Number of callbacks instrumented.
+        """
+        instrumented = 0
+        for entry in callback_map.values():
+            callback = entry.get('callback')
+            if (callback is None or getattr(callback, '__profiled__', False)
+                    or inspect.iscoroutinefunction(callback)):
+                continue
+            entry['callback'] = self.wrap(callback.__name__, callback)
+            instrumented += 1
+        return instrumented
+
+    def wrap(self, name: str, callback: Callable[..., Any]) -> Callable[..., Any]:
+        """Returns callback instrumented under name."""
+        with self._lock:
+            self._stats.setdefault(name, CallbackStats(self.window))
+
+        @functools.wraps(callback)
+        def profiled(*args, **kwargs):
+            return self._invoke(name, callback, args, kwargs)
+        profiled.__profiled__ = True
+        return profiled
+
+    def watch_database(self, database) -> None:
+        """Attributes the queries of database to the callbacks running them."""
+        database.add_query_listener(self._on_query)
+
+    def _on_query(self, seconds: float, rows: int) -> None:
+        """Adds a query to the invocation running on this thread, if any."""
+        invocation = getattr(self._local, 'invocation', None)
+        if invocation is not None:
+            invocation.db_seconds += seconds
+            invocation.queries += 1
+            invocation.rows += rows
+
+    def _invoke(self, name: str, callback: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+        """Runs one invocation, captured if a capture is armed for it, and records it."""
+        invocation = self._local.invocation = _Invocation()
+        outcome = 'ok'
+        response = None
+        capturing = self._start_capture(name)
+        started = time.perf_counter()
+        try:
+            if capturing is None:
+                response = callback(*args, **kwargs)
+            else:
+                response = capturing(callback, args, kwargs)
+            return response
+        except PreventUpdate:
+            outcome = 'prevented'
+            raise
+        except Exception:
+            outcome = 'error'
+            raise
+        finally:
+            wall = time.perf_counter() - started
+            self._local.invocation = None
+            if capturing is not None:
+                self._capture_lock.release()
+            # Dash serializes the outputs inside the callback wrapper and returns the JSON string
+            size = len(response) if isinstance(response, (str, bytes)) else 0
+            self._record(name, wall, invocation, size, outcome)
+
+    def _record(self, name: str, wall: float, invocation: _Invocation, size: int, outcome: str) -> None:
+        """Adds an invocation to the statistics and logs it if it exceeded the budget."""
+        slow = wall > self.budget
+        with self._lock:
+            stats = self._stats[name]
+            stats.calls += 1
+            stats.prevented += outcome == 'prevented'
+            stats.errors += outcome == 'error'
+            stats.slow += slow
+            stats.wall_ms.add(round(wall * 1000, 3))
+            stats.db_ms.add(round(invocation.db_seconds * 1000, 3))
+            stats.rows.add(invocation.rows)
+            if outcome == 'ok':
+                stats.response_bytes.add(size)
+            if slow:
+                self.slow_log.append({
+                    'callback': name, 'at': datetime.now().isoformat(timespec='seconds'), 'outcome': outcome,
+                    'wall_ms': round(wall * 1000, 1), 'db_ms': round(invocation.db_seconds * 1000, 1),
+                    'queries': invocation.queries, 'rows': invocation.rows, 'response_bytes': size,
+                })
+        if slow:
+            print(f"Slow callback {name}: {wall * 1000:.0f} ms over the {self.budget * 1000:.0f} ms budget "
+                  f"(database {invocation.db_seconds * 1000:.0f} ms in {invocation.queries} queries, "
+                  f"{invocation.rows} rows, {size} response bytes, {outcome})")
+
+    def stats(self) -> dict[str, Any]:
+        """Returns the statistics of every callback, the slow invocations and the capture status."""
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'budget_ms': self.budget * 1000,
+                'callbacks': {name: stats.as_dict() for name, stats in sorted(self._stats.items())},
+                'slow': list(self.slow_log),
+                'capture': self.capture_status(),
+            }
+
+    # Captures ______________________________________________________________________________________
+    def arm_capture(self, kind: str, invocations: int = 10, callback: str | None = None) -> dict[str, Any]:
+        """
+        Captures the next invocations with cProfile or tracemalloc.
+
+        Arming replaces a capture still in progress; the previous result is
+        kept until the new capture completes.
+
+        Args:
+            kind (str): 'cprofile' or 'tracemalloc'.
+            invocations (int, optional): Number of invocations to capture. Defaults to 10.
+            callback (str, optional): Only capture invocations of this callback. Defaults to any callback.
+
+        Returns:
+            dict[str, Any]: The capture status.
+
+        Raises:
+            ValueError: If kind, invocations or callback is invalid.
+        """
+        if kind not in CAPTURE_KINDS:
+            raise ValueError(f"Unknown capture kind: {kind}, expected one of {', '.join(CAPTURE_KINDS)}")
+        if invocations < 1:
+            raise ValueError("At least one invocation must be captured")
+        with self._lock:
+            if callback is not None and callback not in self._stats:
+                raise ValueError(f"Unknown callback: {callback}")
+            self._capture = {'kind': kind, 'callback': callback, 'left': invocations, 'captured': [],
+                             'armed_at': datetime.now().isoformat(timespec='seconds'),
+                             'profile': None, 'allocations': {}}
+        print(f"Capturing the next {invocations} invocations of {callback or 'any callback'} with {kind}")
+        return self.capture_status()
+
+    def capture_status(self) -> dict[str, Any]:
+        """Returns the armed capture, if any, and the completed capture available for download."""
+        capture = self._capture
+        result = self._capture_result
+        return {
+            'armed': None if capture is None else {
+                'kind': capture['kind'], 'callback': capture['callback'], 'left': capture['left'],
+                'armed_at': capture['armed_at']},
+            'result': None if result is None else {
+                'kind': result['kind'], 'callbacks': result['callbacks'], 'completed_at': result['completed_at']},
+        }
+
+    def capture_result(self) -> dict[str, Any] | None:
+        """
+        Returns the last completed capture.
+
+        Returns:
+            dict[str, Any] | None: kind, callbacks, completed_at and report, a text report; for cProfile also
+                stats, the marshalled pstats data readable by pstats.Stats or snakeviz. None if no capture
+                completed yet.
+        """
+        return self._capture_result
+
+    def _start_capture(self, name: str) -> Callable[[Callable[..., Any], tuple, dict], Any] | None:
+        """
+        Claims an invocation of an armed capture.
+
+        Returns:
+            Callable | None: Runs the callback under the capture, None if this invocation is not captured. The
+                capture lock is held until the invocation ends.
+        """
+        capture = self._capture
+        if capture is None or capture['callback'] not in (None, name):
+            return None
+        if not self._capture_lock.acquire(blocking=False):
+            return None  # Another thread is being captured
+        with self._lock:
+            if self._capture is not capture or capture['left'] <= 0:
+                self._capture_lock.release()
+                return None
+            capture['left'] -= 1
+
+        def run(callback, args, kwargs):
+            try:
+                if capture['kind'] == 'cprofile':
+                    return self._run_cprofile(capture, callback, args, kwargs)
+                return self._run_tracemalloc(capture, callback, args, kwargs)
+            finally:
+                with self._lock:
+                    capture['captured'].append(name)
+                    # Captured invocations run one at a time, so the one claiming the last slot ends last
+                    if self._capture is capture and capture['left'] == 0:
+                        self._complete_capture(capture)
+        return run
+
+    @staticmethod
+    def _run_cprofile(capture: dict[str, Any], callback: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+        """Runs the callback under cProfile, adding its statistics to the capture."""
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(callback, *args, **kwargs)
+        finally:
+            if capture['profile'] is None:
+                capture['profile'] = pstats.Stats(profile)
+            else:
+                capture['profile'].add(profile)
+
+    @staticmethod
+    def _run_tracemalloc(capture: dict[str, Any], callback: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+        """Runs the callback under tracemalloc, adding the memory it allocated and kept, per line, to the capture."""
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(25)
+        before = tracemalloc.take_snapshot()
+        try:
+            return callback(*args, **kwargs)
+        finally:
+            after = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+            capture['peak'] = max(capture.get('peak', 0), peak)
+            allocations = capture['allocations']
+            for difference in after.compare_to(before, 'lineno'):
+                if difference.size_diff > 0:
+                    line = str(difference.traceback[0])
+                    size, count = allocations.get(line, (0, 0))
+                    allocations[line] = (size + difference.size_diff, count + max(difference.count_diff, 0))
+
+    def _complete_capture(self, capture: dict[str, Any]) -> None:
+        """Turns a capture whose invocations all ran into the downloadable result. Called with _lock held."""
+        stream = io.StringIO()
+        result = {'kind': capture['kind'], 'callbacks': sorted(set(capture['captured'])),
+                  'completed_at': datetime.now().isoformat(timespec='seconds')}
+        stream.write(f"{capture['kind']} capture of {len(capture['captured'])} invocations "
+                     f"({', '.join(result['callbacks'])}), completed {result['completed_at']}\n\n")
+        if capture['kind'] == 'cprofile':
+            stats = capture['profile']
+            stats.stream = stream
+            stats.sort_stats('cumulative').print_stats(50)
+            result['stats'] = marshal.dumps(stats.stats)
+        else:
+            stream.write(f"Peak traced memory: {capture.get('peak', 0) / 2**20:.1f} MiB\n"
+                         f"Memory allocated and still held after the invocations, by line:\n\n")
+            top = sorted(capture['allocations'].items(), key=lambda item: item[1][0], reverse=True)[:50]
+            for line, (size, count) in top:
+                stream.write(f"{size / 1024:>12.1f} KiB {count:>9} blocks  {line}\n")
+        result['report'] = stream.getvalue()
+        self._capture_result = result
+        self._capture = None
+        print(f"{capture['kind']} capture of {len(capture['captured'])} invocations completed")
@@ -0,0 +1,147 @@
+import json
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterator
+
+
+class LogBuffer(list):
+    """
+    The log messages of a sensor.
+
+    A plain list whose append also hands the new line to every listener, so log
+    lines can be pushed to the browser as they are written. Only the newest
+    max_lines lines are kept: once a quarter more piled up the oldest are
+    dropped in one go. total counts every line ever appended, so it keeps
+    changing when the length no longer does.
+    """
+
+    def __init__(self, *args, max_lines: int = 10000) -> None:
+        super().__init__(*args)
+        self.listeners: list[Callable[[str], None]] = []
+        self.max_lines = max_lines
+        self.total = len(self)
+
+    def append(self, message: str) -> None:
+        super().append(message)
+        self.total += 1
+        if len(self) > self.max_lines + self.max_lines // 4:
+            del self[:len(self) - self.max_lines]
+        for listener in self.listeners:
+            listener(message)
+
+
+class PushHub:
+    def __init__(self, max_queue: int = 256, keepalive: float = 15.0, max_subscribers: int | None = None,
+                 max_age: float | None = None) -> None:
+        """
+        Initialize the PushHub.
+
+        Fans out events (new measurements, log lines) to the browsers connected
+        to the server-sent events stream. Every subscriber has its own bounded
+        queue; publishing never blocks the sensor threads, and a browser too slow
+        to keep up loses its oldest events and gets a resync event instead.
+
+        An open stream holds a server thread. Beyond max_subscribers further
+        browsers are turned away and poll instead, and every stream ends after
+        max_age seconds, so the browser reconnects and the streams take turns
+        with the thread.
+
+        Args:
+            max_queue (int, optional): Events buffered per subscriber. Defaults to 256.
+            keepalive (float, optional): Seconds between keepalive comments on an idle stream. Defaults to 15.0.
+            max_subscribers (int | None, optional): Subscribers at most, None for no limit. Defaults to None.
+            max_age (float | None, optional): Seconds after which a stream ends, None to never end it. Defaults to None.
+        """
+        self.max_queue = max_queue
+        self.keepalive = keepalive
+        self.max_subscribers = max_subscribers
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._subscribers = {}  # queue -> topic, None for all topics
+        self.published = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    def subscribe(self, topic: str | None = None) -> queue.Queue | None:
+        """
+        Registers a subscriber for the events of topic (a sensor name), or of all topics.
+
+        Returns:
+            queue.Queue | None: The subscriber's queue, None if there already are max_subscribers.
+        """
+        subscriber = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            if self.max_subscribers is not None and len(self._subscribers) >= self.max_subscribers:
+                self.rejected += 1
+                return None
+            self._subscribers[subscriber] = topic
+        return subscriber
+
+    def unsubscribe(self, subscriber: queue.Queue) -> None:
+        """Removes a subscriber."""
+        with self._lock:
+            self._subscribers.pop(subscriber, None)
+
+    @property
+    def subscribers(self) -> int:
+        """Number of connected subscribers."""
+        return len(self._subscribers)
+
+    def publish(self, topic: str, event: str, data: dict[str, Any]) -> None:
+        """
+        Sends an event to the subscribers of topic without blocking.
+
+        Args:
+            topic (str): The sensor the event belongs to.
+            event (str): The event name, e.g. 'measurement' or 'log'.
+            data (dict[str, Any]): JSON serializable payload.
+        """
+        message = (event, json.dumps(data, default=str))
+        with self._lock:
+            targets = [s for s, t in self._subscribers.items() if t is None or t == topic]
+            self.published += 1
+        for subscriber in targets:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                self._overflow(subscriber)
+
+    def _overflow(self, subscriber: queue.Queue) -> None:
+        """Empties the queue of a lagging subscriber and tells it to reload."""
+        while True:
+            try:
+                subscriber.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                break
+        try:
+            subscriber.put_nowait(('resync', '{}'))
+        except queue.Full:
+            pass
+
+    def stream(self, subscriber: queue.Queue) -> Iterator[str]:
+        """
+        Formats the subscriber's events as a server-sent events stream.
+
+        Ends after max_age seconds, the browser reconnects after the retry delay.
+        Unsubscribes when the stream ends or the client disconnects and the
+        generator is closed.
+        """
+        deadline = None if self.max_age is None else time.monotonic() + self.max_age
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                timeout = self.keepalive
+                if deadline is not None:
+                    timeout = min(timeout, deadline - time.monotonic())
+                    if timeout <= 0:
+                        return
+                try:
+                    event, data = subscriber.get(timeout=timeout)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event}\ndata: {data}\n\n"
+        finally:
+            self.unsubscribe(subscriber)
@@ -0,0 +1,150 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate memory footprint of a cached result in bytes."""
+    memory_usage = getattr(value, 'memory_usage', None)
+    if memory_usage is not None:
+        # pandas DataFrame, including the index and string payloads
+        return int(memory_usage(index=True, deep=True).sum())
+    return sys.getsizeof(value)
+
+
+class QueryCache:
+    def __init__(self, max_bytes: int = 64 * 2**20, ttl: float = 1.0,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        """
+        Initialize the QueryCache.
+
+        Query results are shared by all dashboard sessions. Keys are tuples whose
+        first element is the sensor name, e.g. (sensor, window, resolution). An
+        entry is served until its TTL expires or its sensor ingests a new
+        measurement. Concurrent misses for the same key run the query once while
+        the other callers wait for its result, and the least recently used entries
+        are evicted once the cached results exceed max_bytes. The number of
+        queries therefore depends on the number of distinct views, not viewers.
+
+        Cached results are shared, callers must not modify them.
+
+        Args:
+            max_bytes (int, optional): Memory bound of all cached results. Defaults to 64 MiB.
+            ttl (float, optional): Default seconds an entry is served. Defaults to 1.0.
+            clock (Callable[[], float], optional): Monotonic clock in seconds. Defaults to time.monotonic.
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, size, result)
+        self._flights = {}
+        self._epochs = {}
+        self._bytes = 0
+        self._stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get(self, key: tuple[Hashable, ...], loader: Callable[[], Any], ttl: float | None = None) -> Any:
+        """
+        Returns the cached result for key, calling loader on a miss.
+
+        Args:
+            key (tuple): Cache key, starting with the sensor name.
+            loader (Callable[[], Any]): Runs the query.
+            ttl (float, optional): Seconds the result is served. Defaults to the cache's ttl.
+
+        Returns:
+            Any: The query result.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > self.clock():
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry[2]
+
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._stats['coalesced'] += 1
+                leader = False
+            else:
+                flight = self._flights[key] = _Flight()
+                self._stats['misses'] += 1
+                epoch = self._epochs.get(key[0], 0)
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = loader()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+                # A result loaded while its sensor was invalidated may already be stale
+                if flight.error is None and self._epochs.get(key[0], 0) == epoch:
+                    self._store(key, flight.result, self.ttl if ttl is None else ttl)
+            flight.done.set()
+        return flight.result
+
+    def _store(self, key: tuple[Hashable, ...], result: Any, ttl: float) -> None:
+        """Adds an entry and evicts the least recently used ones beyond max_bytes. Needs the lock."""
+        size = estimate_size(result)
+        if size > self.max_bytes:
+            return
+        self._discard(key)
+        self._entries[key] = (self.clock() + ttl, size, result)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._discard(oldest)
+            self._stats['evictions'] += 1
+
+    def _discard(self, key: tuple[Hashable, ...]) -> None:
+        """Removes an entry if present. Needs the lock."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def invalidate(self, sensor_name: str, *args) -> None:
+        """
+        Drops the entries of a sensor.
+
+        The signature matches the sensors' ingest listeners, so the cache can be
+        registered with sensor.ingest_listeners.append(cache.invalidate).
+
+        Args:
+            sensor_name (str): The sensor whose results are outdated.
+        """
+        with self._lock:
+            self._epochs[sensor_name] = self._epochs.get(sensor_name, 0) + 1
+            for key in [key for key in self._entries if key[0] == sensor_name]:
+                self._discard(key)
+            self._stats['invalidations'] += 1
+
+    def clear(self) -> None:
+        """Drops all entries."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        """Returns the hit, miss and eviction counters and the current size."""
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), bytes=self._bytes)
@@ -0,0 +1,123 @@
+import math
+import threading
+import time
+from collections import deque
+from typing import Callable
+
+
+class JitterStats:
+    def __init__(self, window: int = 1000) -> None:
+        """
+        Initialize the JitterStats object.
+
+        Keeps running statistics of how late each tick fired compared to its
+        deadline, plus the most recent samples for percentiles.
+
+        Args:
+            window (int, optional): Number of recent samples kept for percentiles. Defaults to 1000.
+        """
+        self.ticks = 0
+        self.missed = 0
+        self.mean = 0.0
+        self.max = 0.0
+        self._m2 = 0.0
+        self.recent = deque(maxlen=window)
+
+    def record(self, lateness: float) -> None:
+        """Adds the lateness (in seconds) of one tick."""
+        self.ticks += 1
+        delta = lateness - self.mean
+        self.mean += delta / self.ticks
+        self._m2 += delta * (lateness - self.mean)
+        self.max = max(self.max, lateness)
+        self.recent.append(lateness)
+
+    @property
+    def stddev(self) -> float:
+        """Standard deviation of the lateness in seconds."""
+        return math.sqrt(self._m2 / (self.ticks - 1)) if self.ticks > 1 else 0.0
+
+    def percentile(self, q: float) -> float:
+        """Returns the q-th percentile (0-100) of the recent lateness samples."""
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        index = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    def summary(self) -> dict[str, float | int]:
+        """Returns the statistics with times in milliseconds."""
+        return {
+            "ticks": self.ticks,
+            "missed": self.missed,
+            "mean_ms": self.mean * 1000,
+            "stddev_ms": self.stddev * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+
+class TickScheduler:
+    SKIP = 'skip'
+    CATCH_UP = 'catch_up'
+
+    def __init__(self, interval: float, policy: str = SKIP, clock: Callable[[], float] = time.monotonic) -> None:
+        """
+        Initialize the TickScheduler object.
+
+        Ticks are scheduled against absolute deadlines on a monotonic clock, so the
+        time spent doing work between ticks does not make the period drift. When a
+        whole tick was missed, the SKIP policy drops the missed ticks and continues
+        on the original grid, while CATCH_UP fires them back to back.
+
+        Args:
+            interval (float): Seconds between two ticks. May be changed between ticks.
+            policy (str, optional): TickScheduler.SKIP or TickScheduler.CATCH_UP. Defaults to SKIP.
+            clock (Callable[[], float], optional): Monotonic clock in seconds. Defaults to time.monotonic.
+        """
+        if policy not in (self.SKIP, self.CATCH_UP):
+            raise ValueError(f"Unknown tick policy: {policy}")
+        self.interval = interval
+        self.policy = policy
+        self.clock = clock
+        self.stats = JitterStats()
+        self._last_deadline = None
+
+    def reset(self) -> None:
+        """Forgets the previous deadline so the next tick fires immediately."""
+        self._last_deadline = None
+        self.stats = JitterStats()
+
+    def next_deadline(self, now: float) -> float:
+        """Computes the deadline of the next tick, applying the missed-tick policy."""
+        if self._last_deadline is None:
+            return now
+        deadline = self._last_deadline + self.interval
+        behind = now - deadline
+        if behind >= self.interval and self.policy == self.SKIP:
+            missed = int(behind // self.interval)
+            deadline += missed * self.interval
+            self.stats.missed += missed
+        return deadline
+
+    def wait(self, stop_event: threading.Event | None = None) -> bool:
+        """
+        Blocks until the next tick.
+
+        Args:
+            stop_event (threading.Event, optional): Event that interrupts the wait when set.
+
+        Returns:
+            bool: True on a tick, False if stop_event was set.
+        """
+        deadline = self.next_deadline(self.clock())
+        delay = deadline - self.clock()
+        if stop_event is not None:
+            if stop_event.wait(delay) if delay > 0 else stop_event.is_set():
+                return False
+        elif delay > 0:
+            time.sleep(delay)
+
+        self.stats.record(max(0.0, self.clock() - deadline))
+        self._last_deadline = deadline
+        return True
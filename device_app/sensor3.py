@@ -1,13 +1,18 @@
 import time
 import csv
 from datetime import datetime
-from enum import Enum
-import psycopg2
 from pathlib import Path
 import os
 from dotenv import load_dotenv
 import threading
 
+from device_app.database import DatabaseUnavailableError
+from device_app.sensor_runtime import SensorState, SensorRuntime
+from device_app.polling import AdaptivePoller
+from device_app.push import LogBuffer
+from device_app.scheduler import TickScheduler
+from device_app.storage import MeasurementStore
+
 # Load the .env file
 load_dotenv()
 
@@ -19,105 +24,119 @@ load_dotenv()
 #db_port = os.getenv("DB_PORT")
 database_url = os.getenv("DATABASE_URL")
 
-class SensorState(Enum):
-    OFF = 'off'
-    ON = 'on'
-    MEASURING = 'measuring'
-    IDLE = 'idle'
-
 class RadiationSensor:
-    def __init__(self, name: str, data_file: str = 'data_exp3.txt', db_conn: psycopg2.extensions.connection = None, loglogs: bool = False):
+    def __init__(self, name: str, data_file: str = 'data_exp3.txt', store: MeasurementStore = None, loglogs: bool = False, poll_interval: float = 1.0):
         """
         Initialize the TemperatureSensor object.
 
         Args:
             name (str): The name of the sensor.
             data_file (str, optional): The file name of the data file used by the sensor. Defaults to 'data_exp3.txt'.
-            db_conn (psycopg2.extensions.connection, optional): The database connection to use for logging. Defaults to None.
+            store (MeasurementStore, optional): The measurement store to log to. Defaults to None.
             loglogs (bool, optional): Whether to log the log messages to the database. Defaults to False.
+            poll_interval (float, optional): Nominal seconds between two reads of the data file. Defaults to 1.0.
         """
         self.name = name
-        self.state = SensorState.OFF
+        self.runtime = SensorRuntime(name)  # Owns the state and the single measuring worker
         self.current_radiation = None
-        self.log_messages = []  # For storing log messages
+        self.log_messages = LogBuffer()  # For storing log messages, listeners get every new line
+        self.ingest_listeners = []  # Callables notified with (name, value, timestamp) after each logged measurement
 
         current_file = Path(__file__)
         root_dir = current_file.parent.parent
         self.data_file = os.path.join(root_dir, 'logs', data_file)
         self.log_file = os.path.join(root_dir, 'logs', f'{self.name}.csv')
-        self.db_conn = db_conn  # Database connection
+        self.store = store  # Measurement store, safe to share between threads
 
         self.ucl = 0.3  # Default UCL
         self.lcl = 0.1  # Default LCL
 
         self.loglogs = loglogs
 
+        # Polling backs off while idle and tightens close to the control limits
+        self.poller = AdaptivePoller(nominal_interval=poll_interval)
+        self.scheduler = TickScheduler(poll_interval)  # Drift-free read ticks
+        self.last_timestamp_file = None
+        self._ingest_lock = threading.Lock()  # One measurement at a time, from the file or ingest()
+
         # Create the table for this sensor if it doesn't exist
         self.create_table()
 
     def create_table(self) -> None:
-        """Create a table for the device in the PostgreSQL database."""
-        if self.db_conn:
-            with self.db_conn.cursor() as cur:
-                table_name = f"{self.name}_measurements"
-
-                sql = f"""
-                    CREATE TABLE IF NOT EXISTS {table_name} (
-                        id SERIAL PRIMARY KEY,
-                        radiation DOUBLE PRECISION NOT NULL,
-                        timestamp_measured TIMESTAMPTZ NOT NULL,
-                        timestamp_logged TIMESTAMPTZ NOT NULL
-                    );
-                """
-                cur.execute(sql)
-                self.db_conn.commit()
+        """Create the tables for the device in the measurement store."""
+        if self.store:
+            self.store.create(self.name, 'radiation')
 
     def start(self) -> None:
         """Starts the sensor and sets its state to ON."""
-        self.state = SensorState.ON
+        if not self.runtime.transition((SensorState.OFF,), SensorState.ON):
+            print(f"{self.name} is already ON")
+            return
         self.log_messages.append(f"{datetime.now()}: {self.name} is now ON")
         print(f"{self.name} is now ON")
 
     def stop(self) -> None:
         """Stops the sensor and sets its state to OFF."""
-        self.state = SensorState.OFF
+        self.runtime.transition_and_stop(None, SensorState.OFF)
         self.log_messages.append(f"{datetime.now()}: {self.name} is now OFF")
         print(f"{self.name} is now OFF")
 
     def start_measuring(self) -> None:
         """Starts the measuring process for the sensor."""
-        if self.state == SensorState.ON or self.state == SensorState.IDLE:
-            self.state = SensorState.MEASURING
+        if self.runtime.transition((SensorState.ON, SensorState.IDLE), SensorState.MEASURING):
             self.log_messages.append(f"{datetime.now()}: {self.name} started measuring")
             print(f"{self.name} started measuring")
-            threading.Thread(target=self._measure).start()
+            self.poller.reset()
+            self.runtime.start_worker(self._measure)
         else:
             self.log_messages.append(f"{datetime.now()}: {self.name} must be ON to start measuring")
             print(f"{self.name} must be ON to start measuring")
 
     def stop_measuring(self) -> None:
         """Stops the measuring process of the sensor."""
-        if self.state == SensorState.MEASURING:
-            self.state = SensorState.IDLE
+        if self.runtime.transition_and_stop((SensorState.MEASURING,), SensorState.IDLE):
             self.log_messages.append(f"{datetime.now()}: {self.name} is now IDLE")
             print(f"{self.name} is now IDLE")
 
-    def _measure(self) -> None:
+    @property
+    def state(self) -> SensorState:
+        """The current state of the sensor."""
+        return self.runtime.state
+
+    def ensure_measuring(self) -> bool:
+        """
+        Restarts the measuring thread if the sensor is MEASURING but its thread died.
+
+        Returns:
+            bool: True if a new measuring thread was started.
+        """
+        if self.state != SensorState.MEASURING or self.runtime.worker_alive():
+            return False
+        if not self.runtime.start_worker(self._measure):
+            return False
+        self.log_messages.append(f"{datetime.now()}: {self.name} measuring thread restarted")
+        print(f"{self.name} measuring thread restarted")
+        return True
+
+    def _measure(self, stop_event: threading.Event) -> None:
         """Continuously read temperature data from the file."""
-        while self.state == SensorState.MEASURING:
+        self.scheduler.interval = self.poller.interval
+        self.scheduler.reset()
+        while self.scheduler.wait(stop_event):
             data = self.read_data()
             if data is not None:
                 if self.loglogs:
                     self.log_messages.append(f"{datetime.now()}: Measured radiation: {data['radiation']}°C at {data['timestamp_file']}")
                 print(f"Measured radiation: {data['radiation']}°C at {data['timestamp_file']}")
-            time.sleep(1)  # Adjust the sleep time as needed
+            value = data['radiation'] if data is not None else None
+            self.scheduler.interval = self.poller.next_interval(value, self.ucl, self.lcl)
 
     def read_data(self) -> dict[str, float | datetime] | None:
         """
         Reads the radiation and timestamp from the data file.
 
         Returns a dictionary with the radiation and timestamp if the file
-        can be read, otherwise None.
+        can be read and holds a new sample, otherwise None.
 
         Parameters
         ----------
@@ -136,17 +155,45 @@ class RadiationSensor:
                     data = data[0].split(', ')
                     radiation = data[0]
                     timestamp_file = datetime.fromisoformat(data[1])
+                    if timestamp_file == self.last_timestamp_file:
+                        return None  # Same sample as the previous read
+                    self.last_timestamp_file = timestamp_file
                     timeit_file = data[2]
 
-                    self.current_radiation = float(radiation)
-                    timestamp_read = datetime.now().isoformat()
-                    self.log_data(timestamp_file, timestamp_read)
+                    with self._ingest_lock:
+                        self.current_radiation = float(radiation)
+                        timestamp_read = datetime.now().isoformat()
+                        self.log_data(timestamp_file, timestamp_read)
                     return {"radiation": self.current_radiation, "timestamp_file": timestamp_file}
         except (FileNotFoundError, ValueError) as e:
             self.log_messages.append(f"{datetime.now()}: Error reading file: {e}")
             print(f"Error reading file: {e}")
             return None
 
+    def ingest(self, value: float, timestamp: datetime) -> bool:
+        """
+        Ingests a measurement handed over directly instead of through the data file.
+
+        The measurement takes the same path as one read from the file: CSV log,
+        measurement store and ingest listeners. Like the file, it is only read
+        while the sensor is MEASURING.
+
+        Args:
+            value (float): The measured radiation.
+            timestamp (datetime): When the value was measured.
+
+        Returns:
+            bool: True if the measurement was ingested, False if the sensor is not measuring.
+        """
+        # Checked and stored under the runtime's lock, so a stop can not slip in between
+        with self.runtime.while_in(SensorState.MEASURING) as measuring:
+            if not measuring:
+                return False
+            with self._ingest_lock:
+                self.current_radiation = float(value)
+                self.log_data(timestamp, datetime.now().isoformat())
+        return True
+
     def log_data(self, timestamp_file: datetime, timestamp_read: datetime) -> None:
         """
         Logs the radiation to a CSV file and database.
@@ -170,22 +217,26 @@ class RadiationSensor:
                 self.log_messages.append(f"{datetime.now()}: Logged data: {self.current_radiation}, {timestamp_file}, {timestamp_read}")
             print(f"Logged data: {self.current_radiation}, {timestamp_file}, {timestamp_read}")
 
-        # Log to PostgreSQL
-        if self.db_conn:
-            with self.db_conn.cursor() as cur:
-                table_name = f"{self.name}_measurements"
-                cur.execute(f"""
-                    INSERT INTO {table_name} (radiation, timestamp_measured, timestamp_logged)
-                    VALUES (%s, %s, %s)
-                """, (self.current_radiation, timestamp_file, timestamp_read))
-                self.db_conn.commit()
+        # Log to the database
+        if self.store:
+            try:
+                self.store.insert(self.name, self.current_radiation, timestamp_file, timestamp_read)
+            except DatabaseUnavailableError as e:
+                # The measurement is still in the CSV log and can be backfilled later
+                self.log_messages.append(f"{datetime.now()}: Error logging to database: {e}")
+                print(f"Error logging to database: {e}")
+
+        for listener in self.ingest_listeners:
+            listener(self.name, self.current_radiation, timestamp_file)
 
     def get_status(self) -> None:
         """Returns the current state and radiation."""
         return {
             "name": self.name,
             "state": self.state.value,
-            "current_radiation": self.current_radiation
+            "current_radiation": self.current_radiation,
+            "poll_interval": self.poller.interval,
+            "tick_jitter": self.scheduler.stats.summary()
         }
 
     def get_logs(self) -> None:
@@ -0,0 +1,169 @@
+import threading
+from contextlib import contextmanager
+from enum import Enum
+from typing import Callable, Iterable, Iterator
+
+from device_app.events import bus
+
+
+class SensorState(Enum):
+    OFF = 'off'
+    ON = 'on'
+    MEASURING = 'measuring'
+    IDLE = 'idle'
+
+
+class SensorRuntime:
+    def __init__(self, name: str, join_timeout: float = 5.0) -> None:
+        """
+        Initialize the SensorRuntime object.
+
+        The runtime owns a sensor's state and its measuring worker. State transitions
+        are atomic and published as 'state' events on the event bus, at most one
+        worker thread exists per sensor, and workers are cancelled cooperatively
+        through a threading.Event they wait on.
+
+        Args:
+            name (str): The name of the sensor, used to name the worker thread.
+            join_timeout (float, optional): Seconds to wait for a stopping worker to exit. Defaults to 5.0.
+        """
+        self.name = name
+        self.join_timeout = join_timeout
+        self._state = SensorState.OFF
+        self._lock = threading.RLock()
+        self._stop_event = threading.Event()
+        self._worker = None
+
+    @property
+    def state(self) -> SensorState:
+        """The current state of the sensor."""
+        return self._state
+
+    @property
+    def stop_event(self) -> threading.Event:
+        """Event that is set when the current worker should stop."""
+        return self._stop_event
+
+    @contextmanager
+    def while_in(self, *states: SensorState) -> Iterator[bool]:
+        """
+        Holds the state for the duration of the block.
+
+        Transitions wait until the block ends, so what the block does while the
+        state is one of states can not overlap with e.g. a stop.
+
+        Yields:
+            bool: Whether the current state is one of states.
+        """
+        with self._lock:
+            yield self._state in states
+
+    def transition(self, allowed: Iterable[SensorState] | None, new_state: SensorState) -> bool:
+        """
+        Atomically moves to new_state if the current state is one of allowed.
+
+        Args:
+            allowed (Iterable[SensorState] | None): States the transition is valid from, None for any state.
+            new_state (SensorState): The state to move to.
+
+        Returns:
+            bool: True if the transition happened.
+        """
+        with self._lock:
+            old_state = self._swap(allowed, new_state)
+        if old_state is None:
+            return False
+        self._publish(old_state, new_state)
+        return True
+
+    def transition_and_stop(self, allowed: Iterable[SensorState] | None, new_state: SensorState,
+                            wait: bool = True) -> bool:
+        """
+        Atomically moves to new_state, like transition, and signals the worker to stop.
+
+        The state change and the stop signal happen under the same lock, so a
+        start_worker right after sees the stopping worker and waits for it
+        instead of keeping it.
+
+        Args:
+            allowed (Iterable[SensorState] | None): States the transition is valid from, None for any state.
+            new_state (SensorState): The state to move to.
+            wait (bool, optional): Whether to join the worker. Defaults to True.
+
+        Returns:
+            bool: True if the transition happened.
+        """
+        with self._lock:
+            old_state = self._swap(allowed, new_state)
+            if old_state is None:
+                return False
+            self._stop_event.set()
+            worker = self._worker
+        self._publish(old_state, new_state)
+        if wait and worker is not None:
+            self._join(worker)
+        return True
+
+    def _swap(self, allowed: Iterable[SensorState] | None, new_state: SensorState) -> SensorState | None:
+        """Sets the state if allowed, returns the previous one or None. Called with the lock held."""
+        if allowed is not None and self._state not in allowed:
+            return None
+        old_state, self._state = self._state, new_state
+        return old_state
+
+    def _publish(self, old_state: SensorState, new_state: SensorState) -> None:
+        """Publishes a state change on the event bus."""
+        if new_state != old_state:
+            bus.publish(self.name, 'state', {'message': f"{self.name} is now {new_state.value.upper()}",
+                                             'from': old_state.value, 'to': new_state.value})
+
+    def worker_alive(self) -> bool:
+        """Returns True if a worker thread is currently running."""
+        worker = self._worker
+        return worker is not None and worker.is_alive()
+
+    def start_worker(self, target: Callable[[threading.Event], None]) -> bool:
+        """
+        Starts the worker thread unless one is already running.
+
+        A worker that is still winding down after stop_worker or transition_and_stop
+        is joined first, so a stop/start race never leaves two workers polling the
+        same sensor.
+
+        Args:
+            target (Callable[[threading.Event], None]): The worker loop, called with the stop event.
+
+        Returns:
+            bool: True if a new worker was started.
+        """
+        with self._lock:
+            if self.worker_alive():
+                if not self._stop_event.is_set():
+                    return False
+                self._join(self._worker)
+                if self.worker_alive():
+                    print(f"{self.name} worker did not stop within {self.join_timeout}s")
+                    return False
+            self._stop_event = threading.Event()
+            self._worker = threading.Thread(target=target, args=(self._stop_event,),
+                                            name=f"{self.name}-worker", daemon=True)
+            self._worker.start()
+            return True
+
+    def stop_worker(self, wait: bool = True) -> None:
+        """
+        Signals the worker thread to stop.
+
+        Args:
+            wait (bool, optional): Whether to join the worker. Defaults to True.
+        """
+        with self._lock:
+            self._stop_event.set()
+            worker = self._worker
+        if wait and worker is not None:
+            self._join(worker)
+
+    def _join(self, worker: threading.Thread) -> None:
+        """Joins the worker, unless called from the worker itself."""
+        if worker is not threading.current_thread():
+            worker.join(self.join_timeout)
@@ -0,0 +1,379 @@
+"""
+Socket ingestion of measurements from external devices.
+
+A SocketIngestServer listens on a UDP port or a Unix datagram socket and hands
+the measurements it receives to sensor.ingest(), the path the data files take
+too: CSV log, measurement store and ingest listeners. Every datagram carries
+one or more measurements in one of two formats:
+
+    line:   UTF-8 lines of '<sensor name> <value> [<timestamp>]', the timestamp
+            in Unix seconds or ISO 8601. Empty lines and lines starting with #
+            are ignored.
+    binary: a header of magic byte 0xA5, version 1 and the record count as
+            unsigned short, followed by that many records of sensor index
+            (unsigned byte, position in SENSORS), timestamp (double, Unix
+            seconds) and value (double), all in network byte order.
+
+A measurement without timestamp, or with timestamp 0, is measured at its
+arrival. The server drains all waiting datagrams in one batch before
+ingesting them, and accounts datagrams, measurements and their rate per
+sender address.
+
+Usage, as a local sender for tests:
+    python -m device_app.socket_ingest udp://127.0.0.1:9750 [--rate 1000] [--duration 10]
+        [--format line|binary] [--per-datagram 20] [--sensors temperature_sensor ...]
+"""
+import argparse
+import math
+import os
+import random
+import select
+import socket
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from datetime import datetime
+
+BINARY_MAGIC = 0xA5
+BINARY_VERSION = 1
+HEADER = struct.Struct('!BBH')  # magic, version, record count
+RECORD = struct.Struct('!Bdd')  # sensor index, timestamp, value
+MAX_DATAGRAM = 65535
+
+
+def parse_address(address: str) -> tuple[int, tuple[str, int] | str]:
+    """
+    Parses a listen address: 'udp://host:port' or 'unix:///path/of/socket'.
+
+    Returns:
+        tuple[int, tuple[str, int] | str]: The socket family and its address.
+
+    Raises:
+        ValueError: If the address has another scheme.
+    """
+    scheme, _, rest = address.partition('://')
+    if scheme == 'udp':
+        host, _, port = rest.rpartition(':')
+        return socket.AF_INET6 if ':' in host.strip('[]') else socket.AF_INET, (host.strip('[]'), int(port))
+    if scheme == 'unix' and hasattr(socket, 'AF_UNIX'):
+        return socket.AF_UNIX, rest
+    raise ValueError(f"Unsupported ingest address {address}, expected udp://host:port or unix:///path")
+
+
+def parse_timestamp(text: str, arrival: datetime) -> datetime:
+    """
+    Parses a timestamp of the line format, Unix seconds or ISO 8601; 0 stands for the arrival.
+
+    Returns naive local time like every other ingest path, an ISO timestamp with
+    a UTC offset is converted to it.
+
+    Raises:
+        ValueError, OverflowError, OSError: If the timestamp is malformed or out of range.
+    """
+    try:
+        seconds = float(text)
+    except ValueError:
+        timestamp = datetime.fromisoformat(text)
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone().replace(tzinfo=None)
+        return timestamp
+    return arrival if seconds == 0 else datetime.fromtimestamp(seconds)
+
+
+def parse_datagram(payload: bytes, sensor_names: list[str],
+                   arrival: datetime) -> tuple[list[tuple[str, float, datetime]], int]:
+    """
+    Parses the measurements of a datagram in the line or binary format.
+
+    Args:
+        payload (bytes): The datagram.
+        sensor_names (list[str]): The sensors, binary records refer to them by position.
+        arrival (datetime): Timestamp of the measurements sent without one.
+
+    Returns:
+        tuple[list[tuple[str, float, datetime]], int]: The (sensor name, value, timestamp) of every
+            well-formed measurement and the number of malformed ones. A binary datagram whose length
+            does not match its header counts as one malformed measurement.
+    """
+    measurements = []
+    rejected = 0
+    if payload[:1] == bytes([BINARY_MAGIC]):
+        if len(payload) < HEADER.size:
+            return measurements, 1
+        _, version, count = HEADER.unpack_from(payload)
+        if version != BINARY_VERSION or len(payload) != HEADER.size + count * RECORD.size:
+            return measurements, 1
+        for index, seconds, value in RECORD.iter_unpack(payload[HEADER.size:]):
+            try:
+                if index >= len(sensor_names) or not math.isfinite(value):
+                    raise ValueError(index)
+                timestamp = arrival if seconds == 0 else datetime.fromtimestamp(seconds)
+            except (ValueError, OverflowError, OSError):
+                rejected += 1  # e.g. a timestamp beyond the range of datetime
+                continue
+            measurements.append((sensor_names[index], value, timestamp))
+        return measurements, rejected
+
+    for line in payload.decode('utf-8', errors='replace').splitlines():
+        fields = line.split()
+        if not fields or fields[0].startswith('#'):
+            continue
+        try:
+            if len(fields) not in (2, 3):
+                raise ValueError(line)
+            value = float(fields[1])
+            if not math.isfinite(value):
+                raise ValueError(line)
+            timestamp = parse_timestamp(fields[2], arrival) if len(fields) == 3 else arrival
+        except (ValueError, OverflowError, OSError):
+            rejected += 1
+            continue
+        measurements.append((fields[0], value, timestamp))
+    return measurements, rejected
+
+
+@dataclass
+class SourceStats:
+    """What one sender address delivered."""
+    source: str
+    first_seen: float  # time.time()
+    last_seen: float = 0.0
+    datagrams: int = 0
+    bytes: int = 0
+    ingested: int = 0
+    rejected: int = 0  # Malformed measurements
+    dropped: int = 0  # Measurements of an unknown sensor or one that is not measuring
+    rate: float = 0.0  # Ingested measurements per second, over the last full window
+    _window_start: float = 0.0  # time.monotonic()
+    _window_count: int = 0
+
+    def account(self, size: int, ingested: int, rejected: int, dropped: int, now: float, window: float) -> None:
+        """Adds one datagram, rolling the rate window once it is window seconds old."""
+        self.last_seen = time.time()
+        self.datagrams += 1
+        self.bytes += size
+        self.ingested += ingested
+        self.rejected += rejected
+        self.dropped += dropped
+        if not self._window_start:
+            self._window_start = now
+        elif now - self._window_start >= window:
+            self.rate = self._window_count / (now - self._window_start)
+            self._window_start, self._window_count = now, 0
+        self._window_count += ingested
+
+    def summary(self, now: float, window: float) -> dict:
+        """The statistics as a dict, with the rate dropping to 0 once the source went quiet."""
+        summary = {key: value for key, value in asdict(self).items() if not key.startswith('_')}
+        if self._window_start and now - self._window_start >= 2 * window:
+            summary['rate'] = 0.0
+        return summary
+
+
+class SocketIngestServer:
+    def __init__(self, sensors: dict, address: str, batch_size: int = 256, receive_buffer: int = 4 * 2**20,
+                 max_sources: int = 1024, rate_window: float = 1.0) -> None:
+        """
+        Initialize the SocketIngestServer.
+
+        Args:
+            sensors (dict): The sensors by name, in the order of the binary format's sensor index.
+            address (str): 'udp://host:port' or 'unix:///path/of/socket'.
+            batch_size (int, optional): Most datagrams drained before ingesting them. Defaults to 256.
+            receive_buffer (int, optional): Requested kernel receive buffer in bytes, absorbs bursts
+                while a batch is ingested. Defaults to 4 MiB.
+            max_sources (int, optional): Senders accounted; beyond, the longest quiet one is forgotten.
+                Defaults to 1024.
+            rate_window (float, optional): Seconds over which the rate of a sender is measured. Defaults to 1.0.
+        """
+        self.sensors = sensors
+        self.sensor_names = list(sensors)
+        self.address = address
+        self.family, self.bind_address = parse_address(address)
+        self.batch_size = batch_size
+        self.receive_buffer = receive_buffer
+        self.max_sources = max_sources
+        self.rate_window = rate_window
+        self.batches = 0
+        self.largest_batch = 0
+        self._sources = OrderedDict()  # source -> SourceStats, least recently seen first
+        self._lock = threading.Lock()
+        self._socket = None
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def start(self) -> None:
+        """Binds the socket and starts the receiving thread."""
+        sock = socket.socket(self.family, socket.SOCK_DGRAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.receive_buffer)
+            if self.family == socket.AF_UNIX and os.path.exists(self.bind_address):
+                os.unlink(self.bind_address)  # Left behind by a previous run
+            sock.bind(self.bind_address)
+        except OSError:
+            sock.close()
+            raise
+        sock.setblocking(False)
+        self._socket = sock
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='socket-ingest', daemon=True)
+        self._thread.start()
+        print(f"Ingesting measurements from {self.address}")
+
+    def close(self) -> None:
+        """Stops the receiving thread and closes the socket."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+            if self.family == socket.AF_UNIX and os.path.exists(self.bind_address):
+                os.unlink(self.bind_address)
+
+    def _run(self) -> None:
+        """Receives batches of datagrams until closed."""
+        while not self._stop_event.is_set():
+            readable, _, _ = select.select([self._socket], [], [], 0.5)
+            if not readable:
+                continue
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    payload, source = self._socket.recvfrom(MAX_DATAGRAM)
+                except (BlockingIOError, InterruptedError):
+                    break
+                except OSError as e:
+                    print(f"Socket ingest receive failed: {e}")
+                    break
+                batch.append((payload, source))
+            if batch:
+                try:
+                    self.ingest_batch(batch)
+                except Exception as e:
+                    print(f"Socket ingest failed: {e}")
+
+    def ingest_batch(self, batch: list[tuple[bytes, object]]) -> int:
+        """
+        Parses a batch of datagrams, ingests their measurements and accounts them per sender.
+
+        Args:
+            batch (list[tuple[bytes, object]]): The (payload, sender address) of every datagram.
+
+        Returns:
+            int: Number of measurements ingested.
+        """
+        arrival = datetime.now()
+        now = time.monotonic()
+        total = 0
+        for payload, source in batch:
+            measurements, rejected = parse_datagram(payload, self.sensor_names, arrival)
+            ingested = dropped = 0
+            for name, value, timestamp in measurements:
+                sensor = self.sensors.get(name)
+                if sensor is not None and sensor.ingest(value, timestamp):
+                    ingested += 1
+                else:
+                    dropped += 1
+            self._account(self.source_name(source), len(payload), ingested, rejected, dropped, now)
+            total += ingested
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(batch))
+        return total
+
+    def source_name(self, source: object) -> str:
+        """Readable sender address: 'host:port' for UDP, the socket path for Unix senders."""
+        if isinstance(source, tuple):
+            return f"{source[0]}:{source[1]}"
+        if isinstance(source, bytes):  # Abstract Unix address
+            source = source.lstrip(b'\0').decode(errors='replace')
+        return source or 'unix:unbound'
+
+    def _account(self, source: str, size: int, ingested: int, rejected: int, dropped: int, now: float) -> None:
+        """Adds a datagram to the statistics of its sender."""
+        with self._lock:
+            stats = self._sources.get(source)
+            if stats is None:
+                stats = self._sources[source] = SourceStats(source, first_seen=time.time())
+                if len(self._sources) > self.max_sources:
+                    self._sources.popitem(last=False)
+            else:
+                self._sources.move_to_end(source)
+            stats.account(size, ingested, rejected, dropped, now, self.rate_window)
+
+    def stats(self) -> dict:
+        """Returns the address, the batch counts and the statistics of every sender, busiest first."""
+        now = time.monotonic()
+        with self._lock:
+            sources = [stats.summary(now, self.rate_window) for stats in self._sources.values()]
+        return {
+            'address': self.address,
+            'batches': self.batches,
+            'largest_batch': self.largest_batch,
+            'sources': sorted(sources, key=lambda source: source['ingested'], reverse=True),
+        }
+
+
+# Local sender _________________________________________________________________________________
+def encode_binary(records: list[tuple[int, float, float]]) -> bytes:
+    """Encodes (sensor index, timestamp, value) records as one binary datagram."""
+    return HEADER.pack(BINARY_MAGIC, BINARY_VERSION, len(records)) + b''.join(RECORD.pack(*record) for record in records)
+
+
+def encode_lines(records: list[tuple[str, float, float]]) -> bytes:
+    """Encodes (sensor name, timestamp, value) records as one line format datagram."""
+    return ''.join(f"{name} {value} {timestamp:.6f}\n" for name, timestamp, value in records).encode()
+
+
+def main() -> None:
+    """Sends synthetic measurements to a socket ingest address at a fixed rate."""
+    from device_app.control_plane import SENSORS
+
+    parser = argparse.ArgumentParser(description="Send synthetic measurements to a socket ingest address.")
+    parser.add_argument('address', help="udp://host:port or unix:///path of the listening socket.")
+    parser.add_argument('--sensors', nargs='+', default=list(SENSORS), choices=list(SENSORS),
+                        help="Sensors to send measurements of (default: all).")
+    parser.add_argument('--rate', type=float, default=100.0, help="Measurements per second in total (default: 100).")
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds to send (default: 10).")
+    parser.add_argument('--format', choices=('line', 'binary'), default='line')
+    parser.add_argument('--per-datagram', type=int, default=10, help="Measurements per datagram (default: 10).")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    # Values around the middle of the default control limits of every sensor
+    limits = {'temperature_sensor': (30, 60), 'pressure_sensor': (2, 6), 'radiation_sensor': (0.1, 0.3)}
+    indexes = {name: index for index, name in enumerate(SENSORS)}
+    family, address = parse_address(args.address)
+    sock = socket.socket(family, socket.SOCK_DGRAM)
+    if family == socket.AF_UNIX and sys.platform.startswith('linux'):
+        sock.bind(f"\0ingest-sender-{os.getpid()}")  # Abstract address, so the server can account this sender
+    rng = random.Random(args.seed)
+    interval = args.per_datagram / args.rate
+    sent = errors = 0
+    started = deadline = time.monotonic()
+    while time.monotonic() - started < args.duration:
+        records = []
+        for _ in range(args.per_datagram):
+            name = rng.choice(args.sensors)
+            lcl, ucl = limits[name]
+            value = round(rng.gauss((ucl + lcl) / 2, (ucl - lcl) / 2 / 2.6), 3)
+            records.append((indexes[name] if args.format == 'binary' else name, time.time(), value))
+        try:
+            sock.sendto(encode_binary(records) if args.format == 'binary' else encode_lines(records), address)
+            sent += len(records)
+        except OSError:
+            errors += 1  # e.g. the receive buffer of a Unix socket is full
+        deadline += interval
+        delay = deadline - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+    elapsed = time.monotonic() - started
+    print(f"Sent {sent} measurements in {elapsed:.1f}s ({sent / elapsed:.0f}/s), {errors} datagrams failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+
+class StartupReport:
+    def __init__(self, clock: Callable[[], float] = time.perf_counter) -> None:
+        """
+        Initialize the StartupReport.
+
+        Records how long the phases of a process' startup took: the import
+        groups and initialization steps marked while a module loads, and the
+        resources created lazily on first use later on.
+
+        Args:
+            clock (Callable[[], float], optional): Clock in seconds. Defaults to time.perf_counter.
+        """
+        self.clock = clock
+        self.started = self._last = clock()
+        self.phases = []  # (name, seconds)
+        self._lock = threading.Lock()
+
+    def mark(self, name: str) -> None:
+        """Records a phase lasting from the previous mark, or from the start, until now."""
+        now = self.clock()
+        with self._lock:
+            self.phases.append((name, now - self._last))
+            self._last = now
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Records the time spent in the with block as a phase."""
+        started = self.clock()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases.append((name, self.clock() - started))
+
+    def as_dict(self) -> dict[str, Any]:
+        """Returns the phases and the time until the last mark, in seconds."""
+        with self._lock:
+            return {
+                'ready': round(self._last - self.started, 4),
+                'phases': [{'name': name, 'seconds': round(seconds, 4)} for name, seconds in self.phases],
+            }
+
+    def summary(self) -> str:
+        """Formats the report as one line."""
+        report = self.as_dict()
+        phases = ', '.join(f"{phase['name']} {phase['seconds']:.3f}s" for phase in report['phases'])
+        return f"Started in {report['ready']:.3f}s ({phases})"
+
+
+class Lazy:
+    def __init__(self, name: str, factory: Callable[[], Any], report: StartupReport | None = None) -> None:
+        """
+        Initialize the Lazy resource.
+
+        The resource is created by factory on first use, once even if several
+        threads use it at the same time. Attribute access is forwarded to it, so
+        lazy.method() calls the resource's method.
+
+        Args:
+            name (str): Name of the resource, used in the startup report.
+            factory (Callable[[], Any]): Creates the resource.
+            report (StartupReport, optional): Report recording how long the creation took.
+        """
+        self._name = name
+        self._factory = factory
+        self._report = report
+        self._value = None
+        self._created = False
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        """Returns the resource, creating it on the first call."""
+        if not self._created:
+            with self._lock:
+                if not self._created:
+                    if self._report is None:
+                        self._value = self._factory()
+                    else:
+                        with self._report.phase(f"init {self._name}"):
+                            self._value = self._factory()
+                    self._created = True
+        return self._value
+
+    @property
+    def created(self) -> bool:
+        """Whether the resource was created yet."""
+        return self._created
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.get(), name)
@@ -0,0 +1,248 @@
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+from device_app.database import Database
+
+
+class MeasurementStore(ABC):
+    def __init__(self, db: Database) -> None:
+        """
+        Initialize the MeasurementStore.
+
+        A store decides how measurements are laid out in the database. Sensors
+        create and insert through it and the dashboard reads through it, and
+        every read returns the columns timestamp_measured and <data_column> so
+        callers do not depend on the layout.
+
+        Args:
+            db (Database): The database access layer.
+        """
+        self.db = db
+
+    @abstractmethod
+    def create(self, sensor_name: str, data_column: str) -> None:
+        """Creates the tables needed to store the sensor's measurements."""
+
+    @abstractmethod
+    def insert(self, sensor_name: str, value: float, timestamp_measured: datetime,
+               timestamp_logged: datetime | str) -> None:
+        """Stores one measurement."""
+
+    @abstractmethod
+    def fetch_window(self, sensor_name: str, data_column: str, since: datetime | None = None):
+        """
+        Reads the sensor's measurements, oldest first.
+
+        Args:
+            sensor_name (str): The name of the sensor.
+            data_column (str): Name of the value column in the returned frame.
+            since (datetime, optional): Only measurements at or after this time. Defaults to all.
+
+        Returns:
+            pd.DataFrame: Columns timestamp_measured and data_column.
+        """
+
+    @abstractmethod
+    def fetch_fleet(self, since: datetime):
+        """
+        Reads the measurements of all sensors since the given time in one query.
+
+        Args:
+            since (datetime): Only measurements at or after this time.
+
+        Returns:
+            pd.DataFrame: Columns name, timestamp_measured and value, ordered by name and time.
+        """
+
+
+class PerSensorTableStore(MeasurementStore):
+    def __init__(self, db: Database) -> None:
+        """
+        Initialize the PerSensorTableStore.
+
+        Every sensor has its own <sensor>_measurements table with a SERIAL id, the
+        value column and both timestamps. This is the original layout. A store
+        opened on tables another process created, like the dashboard's next to
+        the controller, finds them in the database's catalog.
+
+        Args:
+            db (Database): The database access layer.
+        """
+        super().__init__(db)
+        self._columns = {}
+        self._lock = threading.Lock()
+
+    def create(self, sensor_name: str, data_column: str) -> None:
+        table_name = f"{sensor_name}_measurements"
+        self.db.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table_name} (
+                id {self.db.serial_primary_key},
+                {data_column} DOUBLE PRECISION NOT NULL,
+                timestamp_measured TIMESTAMPTZ NOT NULL,
+                timestamp_logged TIMESTAMPTZ NOT NULL
+            );
+        """)
+        self.db.execute(f"""
+            CREATE INDEX IF NOT EXISTS {table_name}_timestamp_measured_idx
+                ON {table_name} (timestamp_measured);
+        """)
+        self._columns[sensor_name] = data_column
+
+    def _reflect(self) -> None:
+        """Adds the value column of every <sensor>_measurements table already in the database."""
+        for table_name, columns in self.db.table_columns().items():
+            data_columns = [column for column in columns
+                            if column not in ('id', 'timestamp_measured', 'timestamp_logged')]
+            if table_name.endswith('_measurements') and len(data_columns) == 1:
+                self._columns.setdefault(table_name[:-len('_measurements')], data_columns[0])
+
+    def insert(self, sensor_name: str, value: float, timestamp_measured: datetime,
+               timestamp_logged: datetime | str) -> None:
+        table_name = f"{sensor_name}_measurements"
+        data_column = self._columns[sensor_name]
+        self.db.insert(f"""
+            INSERT INTO {table_name} ({data_column}, timestamp_measured, timestamp_logged)
+            VALUES (:value, :timestamp_measured, :timestamp_logged)
+        """, {"value": value, "timestamp_measured": timestamp_measured, "timestamp_logged": timestamp_logged})
+
+    def fetch_window(self, sensor_name: str, data_column: str, since: datetime | None = None):
+        table_name = f"{sensor_name}_measurements"
+        where = "WHERE timestamp_measured >= :since" if since is not None else ""
+        return self.db.read_sql(f"""
+            SELECT timestamp_measured, {data_column} FROM {table_name}
+            {where}
+            ORDER BY timestamp_measured ASC
+        """, {"since": since}, parse_dates=['timestamp_measured'])
+
+    def fetch_fleet(self, since: datetime):
+        # One UNION ALL over the tables of all sensors, created through this store or found in the database
+        with self._lock:
+            if not self._columns:
+                self._reflect()
+        params = {"since": since}
+        selects = []
+        for index, (sensor_name, data_column) in enumerate(sorted(self._columns.items())):
+            params[f"name_{index}"] = sensor_name
+            selects.append(f"""
+                SELECT :name_{index} AS name, timestamp_measured, {data_column} AS value
+                FROM {sensor_name}_measurements WHERE timestamp_measured >= :since
+            """)
+        if not selects:
+            import pandas as pd
+            return pd.DataFrame(columns=['name', 'timestamp_measured', 'value'])
+        return self.db.read_sql(" UNION ALL ".join(selects) + " ORDER BY name, timestamp_measured",
+                                params, parse_dates=['timestamp_measured'])
+
+
+class NarrowTableStore(MeasurementStore):
+    def __init__(self, db: Database, keep_logged: bool = False) -> None:
+        """
+        Initialize the NarrowTableStore.
+
+        All sensors share one measurements(sensor_id smallint, ts, value real) table
+        and a small sensors catalog. Rows are about half as wide as in the per-sensor
+        layout, the surrogate id is dropped, and a covering (sensor_id, ts) index
+        serves the dashboard's time-window queries from the index alone. Views over
+        all sensors become a single scan.
+
+        Args:
+            db (Database): The database access layer.
+            keep_logged (bool, optional): Also store timestamp_logged. An existing measurements
+                table keeps the setting it was created with. Defaults to False.
+        """
+        super().__init__(db)
+        self.keep_logged = keep_logged
+        self._sensor_ids = {}
+        self._lock = threading.Lock()
+
+    def create(self, sensor_name: str, data_column: str) -> None:
+        logged_column = "ts_logged TIMESTAMPTZ," if self.keep_logged else ""
+        self.db.execute(f"""
+            CREATE TABLE IF NOT EXISTS sensors (
+                sensor_id {self.db.small_serial_primary_key},
+                name TEXT NOT NULL UNIQUE,
+                data_column TEXT NOT NULL
+            );
+        """)
+        self.db.execute(f"""
+            CREATE TABLE IF NOT EXISTS measurements (
+                sensor_id SMALLINT NOT NULL REFERENCES sensors (sensor_id),
+                ts TIMESTAMPTZ NOT NULL,
+                {logged_column}
+                value REAL NOT NULL
+            );
+        """)
+        # A table created earlier keeps its columns, whatever keep_logged says now
+        has_logged = 'ts_logged' in self.db.table_columns()['measurements']
+        if has_logged != self.keep_logged:
+            print(f"The existing measurements table {'keeps' if has_logged else 'does not keep'} "
+                  f"timestamp_logged, STORAGE_KEEP_LOGGED={int(self.keep_logged)} is ignored.")
+            self.keep_logged = has_logged
+        # Without INCLUDE support the value becomes a trailing key column, still covering the queries
+        covering = "(sensor_id, ts) INCLUDE (value)" if self.db.supports_index_include else "(sensor_id, ts, value)"
+        self.db.execute(f"""
+            CREATE INDEX IF NOT EXISTS measurements_sensor_ts_idx
+                ON measurements {covering};
+        """)
+        self.db.execute("""
+            INSERT INTO sensors (name, data_column) VALUES (:name, :data_column)
+            ON CONFLICT (name) DO NOTHING
+        """, {"name": sensor_name, "data_column": data_column})
+        self.sensor_id(sensor_name)
+
+    def sensor_id(self, sensor_name: str) -> int:
+        """Returns the catalog id of the sensor, cached after the first lookup."""
+        with self._lock:
+            if sensor_name not in self._sensor_ids:
+                # Looked up on the ingest path, which does not import pandas
+                sensor_id = self.db.scalar("SELECT sensor_id FROM sensors WHERE name = :name", {"name": sensor_name})
+                self._sensor_ids[sensor_name] = int(sensor_id)
+            return self._sensor_ids[sensor_name]
+
+    def insert(self, sensor_name: str, value: float, timestamp_measured: datetime,
+               timestamp_logged: datetime | str) -> None:
+        params = {"sensor_id": self.sensor_id(sensor_name), "ts": timestamp_measured, "value": value}
+        if self.keep_logged:
+            params["ts_logged"] = timestamp_logged
+            sql = "INSERT INTO measurements (sensor_id, ts, ts_logged, value) VALUES (:sensor_id, :ts, :ts_logged, :value)"
+        else:
+            sql = "INSERT INTO measurements (sensor_id, ts, value) VALUES (:sensor_id, :ts, :value)"
+        self.db.insert(sql, params)
+
+    def fetch_window(self, sensor_name: str, data_column: str, since: datetime | None = None):
+        where = "AND ts >= :since" if since is not None else ""
+        return self.db.read_sql(f"""
+            SELECT ts AS timestamp_measured, value AS {data_column} FROM measurements
+            WHERE sensor_id = :sensor_id {where}
+            ORDER BY ts ASC
+        """, {"sensor_id": self.sensor_id(sensor_name), "since": since}, parse_dates=['timestamp_measured'])
+
+    def fetch_fleet(self, since: datetime):
+        # A single scan of the shared table
+        return self.db.read_sql("""
+            SELECT s.name, m.ts AS timestamp_measured, m.value
+            FROM measurements m JOIN sensors s ON s.sensor_id = m.sensor_id
+            WHERE m.ts >= :since
+            ORDER BY s.name, m.ts ASC
+        """, {"since": since}, parse_dates=['timestamp_measured'])
+
+
+def open_store(db: Database, layout: str = 'per_sensor', keep_logged: bool = False) -> MeasurementStore:
+    """
+    Creates the measurement store for the given layout.
+
+    Args:
+        db (Database): The database access layer.
+        layout (str, optional): 'per_sensor' for one table per sensor, 'narrow' for a single
+            measurements table. Defaults to 'per_sensor'.
+        keep_logged (bool, optional): Whether a new narrow measurements table keeps timestamp_logged. Defaults to False.
+
+    Returns:
+        MeasurementStore: The store.
+    """
+    if layout == 'per_sensor':
+        return PerSensorTableStore(db)
+    if layout == 'narrow':
+        return NarrowTableStore(db, keep_logged=keep_logged)
+    raise ValueError(f"Unknown storage layout: {layout}")
@@ -0,0 +1,147 @@
+import threading
+import time
+from datetime import datetime
+from typing import Callable
+
+
+class _Channel:
+    """Bookkeeping for a single sensor watched by the HeartbeatWatchdog."""
+
+    __slots__ = ('sensor', 'expected_interval', 'last_seen', 'armed_at', 'stale')
+
+    def __init__(self, sensor, expected_interval: float) -> None:
+        self.sensor = sensor
+        self.expected_interval = expected_interval
+        self.last_seen = None   # Monotonic time of the last ingested measurement
+        self.armed_at = None    # Monotonic time the sensor was first seen MEASURING
+        self.stale = False
+
+
+class HeartbeatWatchdog:
+    def __init__(self, check_interval: float = 1.0, tolerance: float = 5.0,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        """
+        Initialize the HeartbeatWatchdog.
+
+        The watchdog keeps a last-seen timestamp per sensor which is updated by the
+        sensor itself every time a measurement is ingested. A single timer thread
+        then checks every registered sensor in constant time per sensor, without
+        querying the database.
+
+        Args:
+            check_interval (float, optional): Seconds between two checks of all sensors. Defaults to 1.0.
+            tolerance (float, optional): A sensor is stale once no data arrived for
+                tolerance * expected_interval seconds. Defaults to 5.0.
+            clock (Callable[[], float], optional): Monotonic clock of the last-seen times,
+                e.g. a virtual clock in simulations. Defaults to time.monotonic.
+        """
+        self.check_interval = check_interval
+        self.tolerance = tolerance
+        self.clock = clock
+        self._channels = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def register(self, sensor, expected_interval: float = 1.0) -> None:
+        """
+        Start watching a sensor.
+
+        Args:
+            sensor: Sensor object exposing name, state, ingest_listeners, log_warning and ensure_measuring.
+            expected_interval (float, optional): Expected seconds between two measurements. Defaults to 1.0.
+        """
+        with self._lock:
+            self._channels[sensor.name] = _Channel(sensor, expected_interval)
+        sensor.ingest_listeners.append(self.beat)
+
+    def beat(self, name: str, *args) -> None:
+        """Records that the sensor with the given name just ingested a measurement."""
+        channel = self._channels.get(name)
+        if channel is not None:
+            channel.last_seen = self.clock()
+
+    def age(self, name: str, now: float | None = None) -> float | None:
+        """
+        Returns the seconds since the sensor last produced data while measuring.
+
+        Returns None if the sensor is unknown or not measuring.
+        """
+        channel = self._channels.get(name)
+        if channel is None or channel.armed_at is None:
+            return None
+        now = self.clock() if now is None else now
+        last = channel.armed_at if channel.last_seen is None else max(channel.last_seen, channel.armed_at)
+        return now - last
+
+    def is_stale(self, name: str, now: float | None = None) -> bool:
+        """Returns True if the sensor is measuring but has not produced data within its tolerance."""
+        channel = self._channels.get(name)
+        age = self.age(name, now)
+        if channel is None or age is None:
+            return False
+        return age > self.tolerance * channel.expected_interval
+
+    def check(self) -> list[str]:
+        """
+        Checks all registered sensors once.
+
+        Stale sensors are reported once per failure with a warning in the sensor's
+        log, and sensors which are MEASURING without a live worker thread get their
+        worker restarted.
+
+        Returns:
+            list[str]: The warning messages raised during this check.
+        """
+        warnings = []
+        now = self.clock()
+        with self._lock:
+            channels = list(self._channels.values())
+
+        for channel in channels:
+            sensor = channel.sensor
+            if sensor.state != sensor.state.MEASURING:
+                channel.armed_at = None
+                channel.stale = False
+                continue
+            if channel.armed_at is None:
+                channel.armed_at = now
+
+            if sensor.ensure_measuring():
+                warning_msg = f"{sensor.name}: Measurement worker died and was restarted."
+                sensor.log_warning(warning_msg)
+                warnings.append(warning_msg)
+
+            stale = self.is_stale(sensor.name, now)
+            if stale and not channel.stale:
+                warning_msg = (f"{sensor.name}: No data for {self.age(sensor.name, now):.1f}s "
+                               f"(expected every {channel.expected_interval}s). Possible device failure.")
+                sensor.log_warning(warning_msg)
+                warnings.append(warning_msg)
+            elif channel.stale and not stale:
+                sensor.log_messages.append(f"{datetime.now()}: {sensor.name} data flow recovered")
+            channel.stale = stale
+        return warnings
+
+    def start(self) -> None:
+        """Starts the single timer thread checking all sensors."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='heartbeat-watchdog', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops the timer thread."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        """Runs check() every check_interval seconds until stopped."""
+        while not self._stop_event.wait(self.check_interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Watchdog check failed: {e}")
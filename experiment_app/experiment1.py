@@ -4,13 +4,15 @@ import random
 import threading
 import os
 from pathlib import Path
-import queue
 
-# Initialize a global queue for passing log messages
-log_queue = queue.Queue()
+from device_app.events import bus
+from device_app.scheduler import TickScheduler
+
+# Topic of this experiment's lifecycle events on the event bus
+TOPIC = 'experiment1'
 
 class Experiment:
-    def __init__(self, mean: float = 50.0, stddev: float = 5.0, bias: float = 30.0, data_file: str = 'data_exp1.txt') -> None:
+    def __init__(self, mean: float = 50.0, stddev: float = 5.0, bias: float = 30.0, data_file: str = 'data_exp1.txt', interval: float = 3.0, hold: float = 2.0) -> None:
         """
         Initialize the Experiment object.
 
@@ -19,6 +21,8 @@ class Experiment:
             stddev (float): The standard deviation of the temperature data.
             bias (float): The bias value to be injected into the data.
             data_file (str): The file name of the data file used by the sensor.
+            interval (float): Seconds between two generated data points.
+            hold (float): Seconds a data point stays in the data file before it is cleared.
 
         Returns:
             None
@@ -30,9 +34,23 @@ class Experiment:
         root_dir = current_file.parent.parent
         #self.data_file = str(root_dir) +'\\logs\\' +data_file
         self.data_file = os.path.join(root_dir, 'logs', data_file)
+        self.interval = interval
+        self.hold = min(hold, interval)
         self.running = False
         self.bias_injected = False
         self.device_failure = False
+        self.scheduler = TickScheduler(interval)  # Fixed-rate ticks on the monotonic clock
+        self._stop_event = threading.Event()
+
+    def arm(self) -> None:
+        """
+        Marks the experiment as running and clears a previous stop, before start_experiment runs.
+
+        Called by the thread starting the experiment, so a stop issued before the
+        new thread reached start_experiment is not lost.
+        """
+        self.running = True
+        self._stop_event.clear()
 
     def start_experiment(self) -> None:
         """
@@ -54,11 +72,12 @@ class Experiment:
         Returns:
             None
         """
-        self.running = True
-        while self.running:
+        self.scheduler.interval = self.interval
+        self.scheduler.reset()
+        bus.publish(TOPIC, 'started', {'message': "Experiment 1 started."})
+        while self.running and self.scheduler.wait(self._stop_event):
             # If device failure, skip data generation
             if self.device_failure:
-                time.sleep(2)
                 continue
 
             # Generate temperature data
@@ -75,11 +94,9 @@ class Experiment:
                 file.write(f"{temperature}, {datetime.now().isoformat()}, {time.time()}\n")
 
             log_message = f"Generated Temperature: {temperature} °C at {datetime.now().isoformat()}"
-            #log_queue.put(log_message)     # Don't log it because you have to empty entire queue then
             print(log_message)
-            time.sleep(2)
+            self._stop_event.wait(self.hold)
             self.clear_data()
-            time.sleep(1)  # Small delay after clearing the file
 
     def stop_experiment(self) -> str:
         """
@@ -89,11 +106,14 @@ class Experiment:
         file. It will also log a message indicating that the experiment has stopped.
 
         Returns:
-            str: The log message that was written to the log queue.
+            str: The log message, also published on the event bus.
         """
         self.running = False
-        log_message = "Experiment 1 stopped."
-        log_queue.put(log_message)
+        self._stop_event.set()
+        stats = self.scheduler.stats
+        log_message = (f"Experiment 1 stopped after {stats.ticks} ticks "
+                       f"(jitter mean {stats.mean * 1000:.1f} ms, max {stats.max * 1000:.1f} ms, {stats.missed} missed).")
+        bus.publish(TOPIC, 'stopped', {'message': log_message, 'ticks': stats.ticks, 'missed': stats.missed})
         print(log_message)
         return log_message
 
@@ -112,7 +132,7 @@ class Experiment:
         self.bias_injected = not self.bias_injected
         state = "enabled" if self.bias_injected else "disabled"
         log_message = f"Bias 1 injection {state}."
-        log_queue.put(log_message)
+        bus.publish(TOPIC, 'bias', {'message': log_message, 'enabled': self.bias_injected})
         print(log_message)
         return log_message
 
@@ -129,7 +149,7 @@ class Experiment:
         self.device_failure = not self.device_failure
         state = "active" if self.device_failure else "inactive"
         log_message = f"Device 1 failure simulation {state}."
-        log_queue.put(log_message)
+        bus.publish(TOPIC, 'device_failure', {'message': log_message, 'active': self.device_failure})
         print(log_message)
         return log_message
 
@@ -140,10 +160,11 @@ class Experiment:
         #print("Data file cleared.")
 
 # Use threading for controlling the experiment in a non-blocking way
-exp = Experiment()
+exp = Experiment(interval=float(os.getenv('EXPERIMENT1_INTERVAL', 3.0)))
 
 def run_experiment() -> None:
     """Starts the experiment in a separate thread."""
+    exp.arm()
     thread = threading.Thread(target=exp.start_experiment)
     thread.start()
 
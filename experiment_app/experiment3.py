@@ -4,7 +4,9 @@ import random
 import threading
 import os
 from pathlib import Path
-import queue
+
+from device_app.events import bus
+from device_app.scheduler import TickScheduler
 
 # Get the current file's path
 current_file = Path(__file__)
@@ -16,12 +18,12 @@ root_dir = current_file.parent.parent  # Adjust as necessary (src is one level d
 #print(f"Current File Parent: {current_file.parent}")
 #print(f"Root Directory: {root_dir}")
 
-# Initialize a global queue for passing log messages
-log_queue = queue.Queue()
+# Topic of this experiment's lifecycle events on the event bus
+TOPIC = 'experiment3'
 
 
 class Experiment:
-    def __init__(self, mean: float = 0.2, stddev: float = 0.05, bias: float = 0.2, data_file: str = 'data_exp3.txt') -> None:
+    def __init__(self, mean: float = 0.2, stddev: float = 0.05, bias: float = 0.2, data_file: str = 'data_exp3.txt', interval: float = 2.5, hold: float = 2.0) -> None:
         """
         Initialize the Experiment object.
 
@@ -30,6 +32,8 @@ class Experiment:
             stddev (float, optional): The standard deviation of the radiation data. Defaults to 0.05.
             bias (float, optional): The bias value to be injected into the data. Defaults to 0.2.
             data_file (str, optional): The file name of the data file used by the sensor. Defaults to 'data_exp3.txt'.
+            interval (float, optional): Seconds between two generated data points. Defaults to 2.5.
+            hold (float, optional): Seconds a data point stays in the data file before it is cleared. Defaults to 2.0.
         """
         self.mean = mean
         self.stddev = stddev
@@ -38,9 +42,23 @@ class Experiment:
         current_file = Path(__file__)
         root_dir = current_file.parent.parent
         self.data_file = os.path.join(root_dir, 'logs', data_file)
+        self.interval = interval
+        self.hold = min(hold, interval)
         self.running = False
         self.bias_injected = False
         self.device_failure = False
+        self.scheduler = TickScheduler(interval)  # Fixed-rate ticks on the monotonic clock
+        self._stop_event = threading.Event()
+
+    def arm(self) -> None:
+        """
+        Marks the experiment as running and clears a previous stop, before start_experiment runs.
+
+        Called by the thread starting the experiment, so a stop issued before the
+        new thread reached start_experiment is not lost.
+        """
+        self.running = True
+        self._stop_event.clear()
 
     def start_experiment(self) -> None:
         """
@@ -56,11 +74,12 @@ class Experiment:
         Returns:
             None
         """
-        self.running = True
-        while self.running:
+        self.scheduler.interval = self.interval
+        self.scheduler.reset()
+        bus.publish(TOPIC, 'started', {'message': "Experiment 3 started."})
+        while self.running and self.scheduler.wait(self._stop_event):
             # If device failure, skip data generation            
             if self.device_failure:
-                time.sleep(2)
                 continue
 
             # Generate Radiation data
@@ -77,9 +96,8 @@ class Experiment:
                 file.write(f"{radiation}, {datetime.now().isoformat()}, {time.time()}\n")
 
             print(f"Generated Radiation: {radiation} mSv")
-            time.sleep(2)
+            self._stop_event.wait(self.hold)
             self.clear_data()
-            time.sleep(0.5)  # Small delay after clearing the file
 
     def stop_experiment(self) -> str:
         """
@@ -89,8 +107,11 @@ class Experiment:
             str: Log message indicating experiment stopped.
         """
         self.running = False
-        log_message = "Experiment 3 stopped."
-        log_queue.put(log_message)
+        self._stop_event.set()
+        stats = self.scheduler.stats
+        log_message = (f"Experiment 3 stopped after {stats.ticks} ticks "
+                       f"(jitter mean {stats.mean * 1000:.1f} ms, max {stats.max * 1000:.1f} ms, {stats.missed} missed).")
+        bus.publish(TOPIC, 'stopped', {'message': log_message, 'ticks': stats.ticks, 'missed': stats.missed})
         print(log_message)
         return log_message
 
@@ -105,7 +126,7 @@ class Experiment:
         self.bias_injected = not self.bias_injected
         state = "enabled" if self.bias_injected else "disabled"
         log_message = f"Bias 3 injection {state}."
-        log_queue.put(log_message)
+        bus.publish(TOPIC, 'bias', {'message': log_message, 'enabled': self.bias_injected})
         print(log_message)
         return log_message
 
@@ -119,7 +140,7 @@ class Experiment:
         self.device_failure = not self.device_failure
         state = "active" if self.device_failure else "inactive"
         log_message = f"Device 3 failure simulation {state}."
-        log_queue.put(log_message)
+        bus.publish(TOPIC, 'device_failure', {'message': log_message, 'active': self.device_failure})
         print(log_message)
         return log_message
 
@@ -130,10 +151,11 @@ class Experiment:
         #print("Data file cleared.")
 
 # Use threading for controlling the experiment in a non-blocking way
-exp = Experiment()
+exp = Experiment(interval=float(os.getenv('EXPERIMENT3_INTERVAL', 2.5)))
 
 def run_experiment() -> None:
     """Starts the experiment in a separate thread."""
+    exp.arm()
     thread = threading.Thread(target=exp.start_experiment)
     thread.start()
 
@@ -0,0 +1,281 @@
+"""
+Replay recorded measurements into the sensors.
+
+Streams a sensor's recorded CSV log (logs/<sensor>.csv) or its rows in the
+database back through the ingest pipeline, at real-time speed, N times faster
+or as fast as possible. The recorded gaps between two measurements are kept,
+scaled by the speed, unless a fixed interval is given.
+
+Two transports deliver the measurements:
+    file:   writes them to the sensor's data file, like the experiments. The
+            sensors running elsewhere (dashboard, ingest daemon) pick them up,
+            so the speed is bounded by their polling interval.
+    direct: hands them to sensor.ingest() of sensors created by this command,
+            bypassing the data file, for speeds beyond the polling interval.
+
+Usage:
+    python -m experiment_app.replay [--sensors temperature_sensor ...] [--source csv|db]
+        [--speed 10 | --max-speed] [--interval 0.5] [--max-gap 5] [--transport direct|file]
+"""
+import argparse
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+LOGS_DIR = Path(__file__).parent.parent / 'logs'
+
+# Measurement column and data file of every sensor
+SENSOR_FILES = {
+    'temperature_sensor': ('temperature', 'data_exp1.txt'),
+    'pressure_sensor': ('pressure', 'data_exp2.txt'),
+    'radiation_sensor': ('radiation', 'data_exp3.txt'),
+}
+
+
+def read_csv_log(path: str) -> Iterator[tuple[float, datetime]]:
+    """
+    Reads the measurements of a sensor's CSV log, oldest first.
+
+    The log mixes 'YYYY-MM-DDTHH:MM:SS' and 'YYYY-MM-DD HH:MM:SS' timestamps,
+    some with leading spaces; unparseable rows are skipped. Only the rows
+    present when the file is opened are read, so replaying a log into the
+    sensor appending to it ends.
+
+    Args:
+        path (str): Path to the CSV log, rows of value, timestamp_measured, timestamp_logged.
+
+    Yields:
+        tuple[float, datetime]: The value and timestamp_measured of every row.
+    """
+    size = os.path.getsize(path)
+    read = 0
+    with open(path, 'rb') as file:
+        for line in file:
+            read += len(line)
+            if read > size:
+                break
+            fields = line.decode('utf-8', errors='replace').split(',')
+            try:
+                yield float(fields[0]), datetime.fromisoformat(fields[1].strip())
+            except (IndexError, ValueError):
+                continue
+
+
+def read_store(store, sensor_name: str, column: str, since: datetime | None = None) -> Iterator[tuple[float, datetime]]:
+    """
+    Reads the measurements of a sensor from the measurement store, oldest first.
+
+    Args:
+        store (MeasurementStore): The store to read from.
+        sensor_name (str): The name of the sensor.
+        column (str): The measurement column of the sensor.
+        since (datetime, optional): Only read measurements taken from then on. Defaults to all.
+
+    Yields:
+        tuple[float, datetime]: The value and timestamp_measured of every row.
+    """
+    df = store.fetch_window(sensor_name, column, since=since)
+    for value, timestamp in zip(df[column], df['timestamp_measured']):
+        yield float(value), timestamp.to_pydatetime()
+
+
+def file_transport(data_file: str) -> Callable[[float, datetime], bool]:
+    """Returns a transport writing each measurement to the data file polled by the sensor."""
+    def deliver(value: float, timestamp: datetime) -> bool:
+        with open(data_file, 'w') as file:
+            file.write(f"{value}, {timestamp.isoformat()}, {time.time()}\n")
+        return True
+    return deliver
+
+
+def direct_transport(sensor) -> Callable[[float, datetime], bool]:
+    """Returns a transport handing each measurement to sensor.ingest()."""
+    return sensor.ingest
+
+
+class Replay:
+    def __init__(self, name: str, samples: Iterable[tuple[float, datetime]],
+                 deliver: Callable[[float, datetime], bool], speed: float | None = 1.0,
+                 interval: float | None = None, max_gap: float | None = None, restamp: bool = True) -> None:
+        """
+        Initialize the Replay.
+
+        Measurements are delivered on a schedule of the monotonic clock, so
+        delays do not add up over a long replay, and a replay that falls behind
+        catches up without waiting.
+
+        Args:
+            name (str): Name of the replay, e.g. the sensor name, used in the log messages.
+            samples (Iterable[tuple[float, datetime]]): The recorded (value, timestamp) pairs, oldest first.
+            deliver (Callable[[float, datetime], bool]): The transport, see file_transport and direct_transport.
+            speed (float, optional): Replay speed, 1.0 for real time; None as fast as possible. Defaults to 1.0.
+            interval (float, optional): Seconds between two measurements instead of the recorded gaps.
+            max_gap (float, optional): Longest recorded gap replayed, in recorded seconds, e.g. between two runs.
+            restamp (bool, optional): Deliver the measurements with the time of delivery instead of their
+                recorded timestamps. Defaults to True.
+        """
+        self.name = name
+        self.samples = samples
+        self.deliver = deliver
+        self.speed = speed
+        self.interval = interval
+        self.max_gap = max_gap
+        self.restamp = restamp
+        self.delivered = 0
+        self.rejected = 0
+        self.max_lag = 0.0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def run(self) -> str:
+        """
+        Delivers the measurements until all are replayed or stop() is called.
+
+        Returns:
+            str: A summary of the replay.
+        """
+        started = None  # The schedule starts with the first measurement, after the source is opened
+        offset = 0.0  # Seconds after started at which the next measurement is due
+        previous = None
+        for value, recorded in self.samples:
+            if previous is None:
+                started = time.monotonic()
+            else:
+                offset += self._gap(previous, recorded)
+            previous = recorded
+
+            lag = time.monotonic() - started - offset
+            if lag < 0:
+                if self._stop_event.wait(-lag):
+                    break
+            elif self.speed is not None or self.interval is not None:
+                self.max_lag = max(self.max_lag, lag)
+            if self._stop_event.is_set():
+                break
+
+            if self.deliver(value, datetime.now() if self.restamp else recorded):
+                self.delivered += 1
+            else:
+                self.rejected += 1
+
+        elapsed = 0.0 if started is None else time.monotonic() - started
+        log_message = (f"Replay of {self.name} delivered {self.delivered} measurements in {elapsed:.1f}s "
+                       f"({self.rejected} rejected, max lag {self.max_lag * 1000:.1f} ms).")
+        print(log_message)
+        return log_message
+
+    def _gap(self, previous: datetime, recorded: datetime) -> float:
+        """Seconds to wait between two measurements."""
+        if self.interval is not None:
+            return self.interval
+        if self.speed is None:
+            return 0.0
+        gap = max((recorded - previous).total_seconds(), 0.0)
+        if self.max_gap is not None:
+            gap = min(gap, self.max_gap)
+        return gap / self.speed
+
+    def start(self) -> None:
+        """Runs the replay in a separate thread."""
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self.run, name=f'replay-{self.name}', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops the replay."""
+        self._stop_event.set()
+
+    @property
+    def running(self) -> bool:
+        """Whether the replay thread is still delivering."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def join(self, timeout: float | None = None) -> None:
+        """Waits for the replay thread to finish."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def main() -> None:
+    """Parses the command line and replays the selected sensors in parallel."""
+    parser = argparse.ArgumentParser(description="Replay recorded measurements into the sensors.")
+    parser.add_argument('--sensors', nargs='+', default=list(SENSOR_FILES), choices=list(SENSOR_FILES),
+                        help="Sensors to replay (default: all).")
+    parser.add_argument('--source', choices=('csv', 'db'), default='csv',
+                        help="Replay the CSV logs (default) or the measurements in the database.")
+    parser.add_argument('--logs-dir', default=str(LOGS_DIR), help="Directory holding the <sensor>.csv files.")
+    parser.add_argument('--since', type=datetime.fromisoformat,
+                        help="With --source db, only replay measurements taken from then on.")
+    speed = parser.add_mutually_exclusive_group()
+    speed.add_argument('--speed', type=float, default=1.0, help="Replay speed, 1 for real time (default).")
+    speed.add_argument('--max-speed', action='store_true', help="Replay as fast as possible.")
+    parser.add_argument('--interval', type=float, help="Seconds between two measurements instead of the recorded gaps.")
+    parser.add_argument('--max-gap', type=float, help="Longest recorded gap replayed, in recorded seconds.")
+    parser.add_argument('--transport', choices=('direct', 'file'), default='direct',
+                        help="Hand the measurements to sensors created here (default), or write the data files "
+                             "polled by the running sensors.")
+    parser.add_argument('--keep-timestamps', action='store_true',
+                        help="Deliver the recorded timestamps instead of the time of delivery.")
+    args = parser.parse_args()
+    if args.speed <= 0:
+        parser.error("--speed must be positive, use --max-speed to replay as fast as possible")
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    control = database = store = None
+    if args.transport == 'direct' or args.source == 'db':
+        from device_app.database import open_database
+        from device_app.storage import open_store
+        database = open_database(os.getenv("DATABASE_URL", "sqlite:///logs/sensor_data.db"),
+                                 ingest_pool_size=int(os.getenv("DB_INGEST_POOL_SIZE", 3)), query_pool_size=1)
+        store = open_store(database, layout=os.getenv("STORAGE_LAYOUT", "per_sensor"),
+                           keep_logged=os.getenv("STORAGE_KEEP_LOGGED", "0") == "1")
+    if args.transport == 'direct':
+        from device_app.control_plane import ControlPlane
+        control = ControlPlane(store)
+        control.start()
+
+    replays = []
+    for sensor_name in args.sensors:
+        column, data_file = SENSOR_FILES[sensor_name]
+        if args.source == 'csv':
+            csv_path = os.path.join(args.logs_dir, f"{sensor_name}.csv")
+            if not os.path.exists(csv_path):
+                print(f"{sensor_name}: no CSV log at {csv_path}, skipping")
+                continue
+            samples = read_csv_log(csv_path)
+        else:
+            samples = read_store(store, sensor_name, column, since=args.since)
+
+        if args.transport == 'direct':
+            control.sensor_command(sensor_name, 'start')
+            control.sensor_command(sensor_name, 'start_measuring')
+            deliver = direct_transport(control.sensors[sensor_name])
+        else:
+            deliver = file_transport(str(LOGS_DIR / data_file))
+        replays.append(Replay(sensor_name, samples, deliver, speed=None if args.max_speed else args.speed,
+                              interval=args.interval, max_gap=args.max_gap, restamp=not args.keep_timestamps))
+
+    for replay in replays:
+        replay.start()
+    try:
+        for replay in replays:
+            while replay.running:
+                replay.join(0.5)
+    except KeyboardInterrupt:
+        for replay in replays:
+            replay.stop()
+            replay.join()
+    finally:
+        if control is not None:
+            control.shutdown()
+        if database is not None:
+            database.dispose()
+
+
+if __name__ == "__main__":
+    main()
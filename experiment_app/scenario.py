@@ -0,0 +1,451 @@
+"""
+Declarative fault-injection scenarios.
+
+A scenario schedules bias injections and device failures on a set of
+channels, e.g. "at t=30s inject bias on 40 channels for 10s, fail 5 devices at
+t=60s". It is a JSON file:
+
+    {
+        "name": "fleet-faults",
+        "seed": 7,
+        "duration": 120,
+        "channels": 200,
+        "interval": 1.0,
+        "steps": [
+            {"at": 30, "inject": "bias", "channels": 40, "for": 10},
+            {"at": 60, "inject": "failure", "channels": 5}
+        ]
+    }
+
+A step's channels are a number of channels drawn with the scenario's seed, or
+a list of channel names. Without "for" the fault lasts until the end.
+
+The same scenario runs on the three experiments through the
+ExperimentSupervisor, or here on hundreds of simulated devices: each device
+generates values like the experiment of its kind, with a random generator
+seeded from the scenario's seed and its name, on a virtual clock. The alerting
+of the dashboard checks them, the HeartbeatWatchdog for stale devices and
+MonitoringService for values out of the control limits, and the report lists
+how fast every fault was detected and the alarms raised outside of faults.
+Runs are deterministic: the same scenario and seed give the same alarms, as
+fast as possible or paced at N times real time.
+
+Usage:
+    python -m experiment_app.scenario experiment_app/scenarios/fleet_faults.json
+        [--channels 500] [--seed 1] [--speed 10 | --max-speed] [--json]
+"""
+import argparse
+import hashlib
+import heapq
+import json
+import math
+import random
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+from device_app.monitoring_service import MonitoringService
+from device_app.sensor_runtime import SensorState
+from device_app.watchdog import HeartbeatWatchdog
+
+FAULTS = ('bias', 'failure')
+
+
+@dataclass(frozen=True)
+class Step:
+    """One fault of a scenario: inject it at `at` seconds on the channels, for duration seconds or until the end."""
+    at: float
+    inject: str
+    channels: int | tuple[str, ...]
+    duration: float | None = None
+
+
+@dataclass(frozen=True)
+class Fault:
+    """A fault injected on one channel from start to end, in scenario seconds."""
+    channel: str
+    fault: str
+    start: float
+    end: float
+
+
+@dataclass
+class Scenario:
+    name: str
+    steps: list[Step]
+    seed: int = 0
+    duration: float = 120.0
+    channels: int = 100  # Simulated devices
+    interval: float = 1.0  # Seconds between two values of a simulated device
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> 'Scenario':
+        """
+        Creates a scenario from its JSON representation, see the module docstring.
+
+        Raises:
+            ValueError: If a step has an unknown fault, or the times or counts are out of range.
+        """
+        steps = []
+        for item in data.get('steps', []):
+            if item.get('inject') not in FAULTS:
+                raise ValueError(f"Unknown fault {item.get('inject')!r}, expected one of {', '.join(FAULTS)}")
+            channels = item.get('channels', 1)
+            channels = int(channels) if isinstance(channels, (int, float)) else tuple(channels)
+            step = Step(float(item['at']), item['inject'], channels,
+                        None if item.get('for') is None else float(item['for']))
+            if step.at < 0 or (step.duration is not None and step.duration <= 0):
+                raise ValueError(f"Step at {step.at}s: 'at' must not be negative and 'for' must be positive")
+            if isinstance(channels, int) and channels < 1:
+                raise ValueError(f"Step at {step.at}s: 'channels' must be at least 1")
+            steps.append(step)
+        scenario = cls(
+            name=data.get('name', 'scenario'),
+            steps=sorted(steps, key=lambda step: step.at),
+            seed=int(data.get('seed', 0)),
+            duration=float(data.get('duration', 120.0)),
+            channels=int(data.get('channels', 100)),
+            interval=float(data.get('interval', 1.0)),
+        )
+        if scenario.duration <= 0 or scenario.channels < 1 or scenario.interval <= 0:
+            raise ValueError("'duration', 'channels' and 'interval' must be positive")
+        return scenario
+
+    @classmethod
+    def load(cls, path: str) -> 'Scenario':
+        """Reads a scenario from a JSON file."""
+        with open(path) as file:
+            return cls.from_dict(json.load(file))
+
+    def channel_names(self) -> list[str]:
+        """Names of the simulated devices."""
+        width = len(str(self.channels - 1))
+        return [f"device-{index:0{width}d}" for index in range(self.channels)]
+
+    def faults(self, channels: list[str]) -> list[Fault]:
+        """
+        Resolves the steps to the faults of every channel.
+
+        The channels of a step given by number are drawn with the scenario's
+        seed, so they are the same on every run. A step on more channels than
+        there are affects all of them.
+
+        Args:
+            channels (list[str]): The channels of the run.
+
+        Raises:
+            ValueError: If a step names a channel that is not part of the run.
+        """
+        rng = random.Random(self.seed)
+        faults = []
+        for step in self.steps:
+            if isinstance(step.channels, int):
+                targets = rng.sample(channels, min(step.channels, len(channels)))
+            else:
+                unknown = set(step.channels) - set(channels)
+                if unknown:
+                    raise ValueError(f"Step at {step.at}s: unknown channels {', '.join(sorted(unknown))}")
+                targets = step.channels
+            end = self.duration if step.duration is None else min(step.at + step.duration, self.duration)
+            faults.extend(Fault(channel, step.inject, step.at, end) for channel in sorted(targets))
+        return faults
+
+    def transitions(self, channels: list[str]) -> list[tuple[float, str, str, bool]]:
+        """Returns the (time, channel, fault, active) switches of the faults, in time order."""
+        switches = []
+        for fault in self.faults(channels):
+            switches.append((fault.start, fault.channel, fault.fault, True))
+            if fault.end < self.duration:
+                switches.append((fault.end, fault.channel, fault.fault, False))
+        # At the same time a fault ends before the next one starts
+        return sorted(switches, key=lambda switch: (switch[0], switch[3]))
+
+
+# Simulation ___________________________________________________________________________________
+@dataclass(frozen=True)
+class DeviceModel:
+    """Data generated by an experiment and the default control limits of its sensor."""
+    kind: str
+    mean: float
+    stddev: float
+    bias: float
+    ucl: float
+    lcl: float
+
+
+# Defaults of experiment1-3 and of the temperature, pressure and radiation sensors
+MODELS = (
+    DeviceModel('temperature', mean=50.0, stddev=5.0, bias=30.0, ucl=60, lcl=30),
+    DeviceModel('pressure', mean=5.0, stddev=0.5, bias=4.0, ucl=6, lcl=2),
+    DeviceModel('radiation', mean=0.2, stddev=0.05, bias=0.2, ucl=0.3, lcl=0.1),
+)
+
+
+class VirtualClock:
+    def __init__(self, speed: float | None = None) -> None:
+        """
+        Initialize the VirtualClock.
+
+        Scenario seconds, advanced by the simulation. With a speed, advancing
+        sleeps until that much wall time passed, scaled by the speed.
+
+        Args:
+            speed (float, optional): Times faster than real time, None for as fast as possible.
+        """
+        self.now = 0.0
+        self.speed = speed
+        self._started = time.monotonic()
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, to: float) -> None:
+        """Moves the clock forward to the given scenario second."""
+        if self.speed is not None:
+            delay = self._started + to / self.speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        self.now = max(self.now, to)
+
+
+class SimulatedDevice:
+    def __init__(self, name: str, model: DeviceModel, seed: int, clock: VirtualClock) -> None:
+        """
+        Initialize the SimulatedDevice.
+
+        Looks like a sensor to the HeartbeatWatchdog and MonitoringService, and
+        generates its values like the experiment of its kind.
+
+        Args:
+            name (str): The channel name.
+            model (DeviceModel): What the device measures.
+            seed (int): Seed of the scenario, the device's generator is seeded with it and the name.
+            clock (VirtualClock): The simulation's clock.
+        """
+        self.name = name
+        self.model = model
+        self.ucl = model.ucl
+        self.lcl = model.lcl
+        self.state = SensorState.MEASURING
+        self.ingest_listeners = []
+        self.log_messages = []
+        self.warnings = []  # (scenario second, message)
+        self.bias_injected = False
+        self.device_failure = False
+        self.random = random.Random(f"{seed}:{name}")
+        self.clock = clock
+        self._batch = {'timestamp_measured': [], 'value': []}
+
+    def generate(self) -> None:
+        """Generates one value like Experiment.start_experiment and ingests it, unless the device failed."""
+        if self.device_failure:
+            return
+        model = self.model
+        value = round(self.random.gauss(model.mean, model.stddev), 2)
+        if self.bias_injected:
+            value = round(value + round(self.random.uniform(model.bias, model.stddev), 2), 2)
+        self._batch['timestamp_measured'].append(self.clock.now)
+        self._batch['value'].append(value)
+        for listener in self.ingest_listeners:
+            listener(self.name, value, self.clock.now)
+
+    def take_batch(self) -> dict[str, list]:
+        """Returns the values generated since the last call, in the columns MonitoringService checks."""
+        batch, self._batch = self._batch, {'timestamp_measured': [], 'value': []}
+        return batch
+
+    def log_warning(self, message: str) -> None:
+        self.warnings.append((self.clock.now, message))
+
+    def ensure_measuring(self) -> bool:
+        return False  # No worker thread to restart
+
+
+@dataclass
+class ScenarioReport:
+    """Outcome of a simulated scenario."""
+    scenario: str
+    seed: int
+    channels: int
+    duration: float
+    wall_seconds: float
+    samples: int
+    checks: int
+    alarms: dict[str, int]  # by kind, 'out_of_control' or 'stale'
+    false_alarms: dict[str, int]
+    faults: list[dict[str, Any]] = field(default_factory=list)  # Fault with detected_at and latency
+    digest: str = ''  # Hash of every alarm, equal for equal runs
+
+    def latencies(self, fault: str) -> list[float]:
+        """Detection latencies of the detected faults of a kind, in seconds."""
+        return sorted(item['latency'] for item in self.faults if item['fault'] == fault and item['latency'] is not None)
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+    def summary(self) -> str:
+        """The report as text."""
+        def percentile(values, q):
+            return values[min(len(values) - 1, max(0, math.ceil(q / 100 * len(values)) - 1))]
+        lines = [
+            f"Scenario {self.scenario} (seed {self.seed}): {self.channels} channels, {self.duration:g}s simulated "
+            f"in {self.wall_seconds:.2f}s ({self.duration / max(self.wall_seconds, 1e-9):.0f}x)",
+            f"{self.samples} values, {self.checks} checks, alarms: "
+            + ', '.join(f"{kind} {count}" for kind, count in self.alarms.items()),
+            f"{'fault':<10}{'injected':>10}{'detected':>10}{'p50 s':>8}{'p95 s':>8}{'max s':>8}",
+        ]
+        for fault in FAULTS:
+            injected = [item for item in self.faults if item['fault'] == fault]
+            if not injected:
+                continue
+            latencies = self.latencies(fault)
+            timing = (f"{percentile(latencies, 50):>8.1f}{percentile(latencies, 95):>8.1f}{latencies[-1]:>8.1f}"
+                      if latencies else f"{'-':>8}{'-':>8}{'-':>8}")
+            lines.append(f"{fault:<10}{len(injected):>10}{len(latencies):>10}{timing}")
+        lines.append("False alarms: " + ', '.join(f"{kind} {count}" for kind, count in self.false_alarms.items()))
+        lines.append(f"Digest {self.digest}")
+        return '\n'.join(lines)
+
+
+# Alarms of the checks, by the fault they detect
+ALARM_FAULTS = {'out_of_control': 'bias', 'stale': 'failure'}
+
+
+def simulate(scenario: Scenario, speed: float | None = None, check_interval: float = 1.0,
+             tolerance: float = 3.0) -> ScenarioReport:
+    """
+    Runs a scenario on simulated devices and checks them like the dashboard.
+
+    Every check_interval the HeartbeatWatchdog checks all devices, like the
+    control plane's, and MonitoringService checks the values generated since
+    the previous check against the control limits. A fault counts as detected
+    by the first alarm of its kind on its channel while it lasts, or within the
+    check after it ended; every other alarm is a false alarm.
+
+    Args:
+        scenario (Scenario): The scenario to run.
+        speed (float, optional): Times faster than real time, None for as fast as possible.
+        check_interval (float, optional): Seconds between two checks. Defaults to 1.0.
+        tolerance (float, optional): Tolerance of the watchdog, in intervals. Defaults to 3.0.
+
+    Returns:
+        ScenarioReport: The detection latencies and alarms.
+    """
+    started = time.perf_counter()
+    clock = VirtualClock(speed)
+    watchdog = HeartbeatWatchdog(check_interval=check_interval, tolerance=tolerance, clock=clock)
+    names = scenario.channel_names()
+    devices = {}
+    for index, name in enumerate(names):
+        devices[name] = SimulatedDevice(name, MODELS[index % len(MODELS)], scenario.seed, clock)
+        watchdog.register(devices[name], expected_interval=scenario.interval)
+    monitors = {name: MonitoringService(device) for name, device in devices.items()}
+    faults = scenario.faults(names)
+
+    # Events in time order: fault switches, then values, then checks at the same time
+    events = []
+    sequence = 0
+
+    def schedule(at, priority, kind, payload):
+        nonlocal sequence
+        sequence += 1
+        heapq.heappush(events, (at, priority, sequence, kind, payload))
+
+    for at, channel, fault, active in scenario.transitions(names):
+        schedule(at, 0, 'switch', (channel, fault, active))
+    phase = random.Random(scenario.seed)
+    for name in names:
+        schedule(phase.uniform(0, scenario.interval), 1, 'value', name)
+    schedule(check_interval, 2, 'check', None)
+
+    samples = checks = 0
+    alarms = []  # (scenario second, channel, kind)
+    while events and events[0][0] <= scenario.duration:
+        at, _, _, kind, payload = heapq.heappop(events)
+        clock.advance(at)
+        if kind == 'switch':
+            channel, fault, active = payload
+            setattr(devices[channel], 'bias_injected' if fault == 'bias' else 'device_failure', active)
+        elif kind == 'value':
+            device = devices[payload]
+            samples += not device.device_failure
+            device.generate()
+            schedule(at + scenario.interval, 1, 'value', payload)
+        else:
+            checks += 1
+            watchdog.check()
+            for name, device in devices.items():
+                for _ in monitors[name].check_out_of_control(device.take_batch(), 'value'):
+                    alarms.append((at, name, 'out_of_control'))
+                alarms.extend((when, name, 'stale') for when, _ in device.warnings)
+                device.warnings.clear()
+            schedule(at + check_interval, 2, 'check', None)
+
+    # Match the alarms with the faults
+    by_channel = {}
+    for alarm in alarms:
+        by_channel.setdefault(alarm[1], []).append(alarm)
+    explained = set()
+    detected = []
+    for fault in faults:
+        detected_at = None
+        for alarm in by_channel.get(fault.channel, []):
+            at, _, kind = alarm
+            if ALARM_FAULTS[kind] == fault.fault and fault.start <= at <= fault.end + check_interval:
+                explained.add(alarm)
+                detected_at = at if detected_at is None else detected_at
+        detected.append({**asdict(fault), 'detected_at': detected_at,
+                         'latency': None if detected_at is None else round(detected_at - fault.start, 6)})
+
+    digest = hashlib.sha256()
+    for at, name, kind in alarms:
+        digest.update(f"{at:.6f} {name} {kind}\n".encode())
+    return ScenarioReport(
+        scenario=scenario.name,
+        seed=scenario.seed,
+        channels=scenario.channels,
+        duration=scenario.duration,
+        wall_seconds=time.perf_counter() - started,
+        samples=samples,
+        checks=checks,
+        alarms={kind: sum(alarm[2] == kind for alarm in alarms) for kind in ALARM_FAULTS},
+        false_alarms={kind: sum(alarm[2] == kind and alarm not in explained for alarm in alarms)
+                      for kind in ALARM_FAULTS},
+        faults=detected,
+        digest=digest.hexdigest()[:16],
+    )
+
+
+def main() -> None:
+    """Parses the command line, simulates the scenario and prints its report."""
+    parser = argparse.ArgumentParser(description="Run a fault-injection scenario on simulated devices.")
+    parser.add_argument('scenario', help="Path of the scenario's JSON file.")
+    parser.add_argument('--channels', type=int, help="Simulated devices, instead of the scenario's.")
+    parser.add_argument('--seed', type=int, help="Seed, instead of the scenario's.")
+    parser.add_argument('--duration', type=float, help="Seconds simulated, instead of the scenario's.")
+    speed = parser.add_mutually_exclusive_group()
+    speed.add_argument('--speed', type=float, help="Times faster than real time.")
+    speed.add_argument('--max-speed', action='store_true', help="As fast as possible (default).")
+    parser.add_argument('--check-interval', type=float, default=1.0, help="Seconds between two checks (default: 1).")
+    parser.add_argument('--tolerance', type=float, default=3.0,
+                        help="Intervals without data until a device is stale (default: 3).")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON.")
+    args = parser.parse_args()
+    if args.speed is not None and args.speed <= 0:
+        parser.error("--speed must be positive, use --max-speed to run as fast as possible")
+
+    scenario = Scenario.load(args.scenario)
+    for option in ('channels', 'seed', 'duration'):
+        if getattr(args, option) is not None:
+            setattr(scenario, option, getattr(args, option))
+    try:
+        scenario.faults(scenario.channel_names())
+    except ValueError as e:
+        parser.error(f"{e}. The simulated devices are named {scenario.channel_names()[0]} and so on; scenarios "
+                     f"naming the experiments run on them with the ingest daemon's --scenario")
+    report = simulate(scenario, speed=args.speed, check_interval=args.check_interval, tolerance=args.tolerance)
+    print(json.dumps(report.to_dict(), indent=2) if args.json else report.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Supervisor of the experiments' generator threads.
+
+The ExperimentSupervisor owns one generator thread per experiment: starting a
+running experiment does nothing, stopping one waits for its thread to end, so
+two threads never write to the same data file. Bias and device failure are set
+on or off explicitly rather than toggled, which makes them safe to repeat, and
+a Scenario (see experiment_app.scenario) can drive them on a schedule.
+"""
+import threading
+import time
+from typing import Any
+
+from device_app.events import bus
+from experiment_app.scenario import FAULTS, Scenario
+
+# Topic of the scenario lifecycle events on the event bus
+TOPIC = 'scenario'
+
+
+class ExperimentSupervisor:
+    def __init__(self, experiments: dict[str, Any], join_timeout: float = 5.0) -> None:
+        """
+        Initialize the ExperimentSupervisor.
+
+        Args:
+            experiments (dict[str, Any]): The Experiment objects by name, e.g. {'experiment1': experiment1.exp}.
+            join_timeout (float, optional): Seconds stop() waits for a generator thread to end. Defaults to 5.0.
+        """
+        self.experiments = dict(experiments)
+        self.join_timeout = join_timeout
+        self._threads = {}
+        self._lock = threading.RLock()
+        self._scenario = None  # (thread, stop event) of the running scenario
+
+    def _alive(self, name: str) -> bool:
+        """Whether the generator thread of an experiment is alive."""
+        thread = self._threads.get(name)
+        return thread is not None and thread.is_alive()
+
+    def start(self, name: str) -> str:
+        """
+        Starts the generator thread of an experiment, unless it already runs.
+
+        Returns:
+            str: Log message of the outcome.
+        """
+        exp = self.experiments[name]
+        with self._lock:
+            if self._alive(name):
+                if exp.running:
+                    return f"{name} is already running."
+                return f"{name} is still stopping, start it again once it stopped."
+            exp.arm()  # Running from now on; a stop before the thread got to run is kept
+            thread = threading.Thread(target=exp.start_experiment, name=f'{name}-generator', daemon=True)
+            self._threads[name] = thread
+            thread.start()
+        return f"{name} started."
+
+    def stop(self, name: str) -> str:
+        """
+        Stops an experiment, waits for its generator thread and clears its bias and device failure.
+
+        Returns:
+            str: Log message of the outcome.
+        """
+        exp = self.experiments[name]
+        with self._lock:
+            if not self._alive(name) and not exp.running:
+                return f"{name} is not running."
+            log_message = exp.stop_experiment()
+            thread = self._threads.get(name)
+            if thread is not None:
+                thread.join(self.join_timeout)
+                if thread.is_alive():
+                    log_message = f"{name} did not stop within {self.join_timeout}s."
+                    print(log_message)
+            for fault in FAULTS:
+                self.set_fault(name, fault, False)
+        return log_message
+
+    def restart(self, name: str) -> str:
+        """Stops an experiment if it runs and starts it again."""
+        with self._lock:
+            self.stop(name)
+            return self.start(name)
+
+    def join(self, name: str | None = None, timeout: float | None = None) -> bool:
+        """
+        Waits for the generator thread of an experiment, or of all experiments, to end.
+
+        Returns:
+            bool: True if the threads ended, False on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in [self._threads[name]] if name in self._threads else list(self._threads.values()):
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+            if thread.is_alive():
+                return False
+        return True
+
+    def set_fault(self, name: str, fault: str, active: bool) -> str | None:
+        """
+        Switches the bias injection or device failure of an experiment on or off.
+
+        Args:
+            name (str): The experiment.
+            fault (str): 'bias' or 'failure'.
+            active (bool): Whether the fault is injected.
+
+        Returns:
+            str | None: Log message of the experiment, None if the fault already was in that state.
+        """
+        if fault not in FAULTS:
+            raise ValueError(f"Unknown fault: {fault}")
+        exp = self.experiments[name]
+        with self._lock:
+            if fault == 'bias' and exp.bias_injected != active:
+                return exp.toggle_bias()
+            if fault == 'failure' and exp.device_failure != active:
+                return exp.toggle_device_failure()
+        return None
+
+    def toggle_fault(self, name: str, fault: str) -> str:
+        """Switches the bias injection or device failure of an experiment to its other state."""
+        exp = self.experiments[name]
+        with self._lock:
+            active = exp.bias_injected if fault == 'bias' else exp.device_failure
+            return self.set_fault(name, fault, not active)
+
+    def status(self) -> dict[str, dict[str, bool]]:
+        """Returns whether every experiment is running, and has bias or a device failure injected."""
+        with self._lock:
+            return {
+                name: {'running': self._alive(name) and exp.running,
+                       'bias': exp.bias_injected, 'failure': exp.device_failure}
+                for name, exp in self.experiments.items()
+            }
+
+    # Scenarios __________________________________________________________________________________
+    def run_scenario(self, scenario: Scenario, speed: float = 1.0) -> str:
+        """
+        Runs a scenario on the supervised experiments in a background thread.
+
+        The scenario's channels are the experiments; a step on more channels than
+        there are experiments affects all of them. The experiments are started
+        first, and a scenario still running is stopped.
+
+        Args:
+            scenario (Scenario): The scenario to run.
+            speed (float, optional): Runs the schedule this many times faster than real time. The
+                experiments keep generating at their own interval. Defaults to 1.0.
+
+        Returns:
+            str: Log message of the outcome.
+
+        Raises:
+            ValueError: If the speed is not positive or a step names a channel that is not an experiment.
+        """
+        if speed <= 0:
+            raise ValueError("The speed of a scenario must be positive")
+        scenario.faults(list(self.experiments))  # Raises on channels that are not experiments
+        self.stop_scenario()
+        for name in self.experiments:
+            self.start(name)
+        stop_event = threading.Event()
+        thread = threading.Thread(target=self._run_scenario, args=(scenario, speed, stop_event),
+                                  name='experiment-scenario', daemon=True)
+        with self._lock:
+            self._scenario = (thread, stop_event)
+        thread.start()
+        return f"Scenario {scenario.name} started."
+
+    def stop_scenario(self) -> None:
+        """Stops the running scenario, leaving the faults it injected as they are."""
+        with self._lock:
+            scenario, self._scenario = self._scenario, None
+        if scenario is not None:
+            thread, stop_event = scenario
+            stop_event.set()
+            thread.join()
+
+    def _run_scenario(self, scenario: Scenario, speed: float, stop_event: threading.Event) -> None:
+        """Applies the fault transitions of a scenario at their time."""
+        bus.publish(TOPIC, 'started', {'message': f"Scenario {scenario.name} started (seed {scenario.seed}, "
+                                                  f"{speed:g}x)."})
+        started = time.monotonic()
+        for at, channel, fault, active in scenario.transitions(list(self.experiments)):
+            if stop_event.wait(max(0.0, started + at / speed - time.monotonic())):
+                bus.publish(TOPIC, 'stopped', {'message': f"Scenario {scenario.name} stopped."})
+                return
+            self.set_fault(channel, fault, active)
+        if not stop_event.wait(max(0.0, started + scenario.duration / speed - time.monotonic())):
+            bus.publish(TOPIC, 'finished', {'message': f"Scenario {scenario.name} finished."})
+
+    def shutdown(self) -> None:
+        """Stops the running scenario and every running experiment."""
+        self.stop_scenario()
+        for name in self.experiments:
+            self.stop(name)
@@ -0,0 +1,282 @@
+"""
+Load test of the dashboard with concurrent simulated sessions.
+
+Every session sends the real Dash callback requests of a browser tab left
+open on the dashboard (see loadtest.sessions). By default the dashboard is
+started as a local stand-in on a seeded SQLite database (see
+loadtest.standin); --url tests a running deployment instead. The report lists
+the latency percentiles and error rate per request kind, the CPU used by the
+server process and its children (Linux only) and, when the admin routes are
+reachable, the server-side time of every callback.
+
+Usage:
+    python -m loadtest [--sessions 50] [--duration 60] [--ramp-up 10]
+    python -m loadtest --url http://localhost:8050 --server-pid 1234 --admin-token $ADMIN_TOKEN
+"""
+import argparse
+import json
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from loadtest.sessions import SENSORS, TIME_INTERVALS, Mix, Recorder, Session
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """The value below which the given fraction of the sorted values lies."""
+    return values[min(int(fraction * len(values)), len(values) - 1)]
+
+
+def process_tree_cpu(pid: int) -> float | None:
+    """
+    Returns the CPU seconds used by a process and its live child processes, e.g. gunicorn workers.
+
+    Returns:
+        float | None: User plus system seconds, None where /proc is not available.
+    """
+    ticks = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+    stats = {}
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        return None
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as file:
+                # The command name may contain spaces, the fields after it do not
+                fields = file.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        stats[int(entry)] = (int(fields[1]), (int(fields[11]) + int(fields[12])) / ticks)  # ppid, utime + stime
+    if pid not in stats:
+        return None
+    total, pending = 0.0, [pid]
+    while pending:
+        current = pending.pop()
+        total += stats[current][1]
+        pending.extend(child for child, (parent, _) in stats.items() if parent == current)
+    return total
+
+
+def fetch_json(url: str, token: str | None = None, timeout: float = 10.0):
+    """GETs a JSON document."""
+    request = urllib.request.Request(url, headers={'X-Admin-Token': token} if token else {})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.load(response)
+
+
+def start_standin(args: argparse.Namespace, workdir: str, token: str) -> tuple[subprocess.Popen, str]:
+    """
+    Starts the stand-in dashboard on a free local port and waits until it is healthy.
+
+    Returns:
+        tuple[subprocess.Popen, str]: The server process and its URL.
+    """
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    env = {**os.environ, 'ADMIN_TOKEN': token, 'CALLBACK_PROFILING': '1'}
+    log = open(os.path.join(workdir, 'server.log'), 'w')
+    command = [sys.executable, '-m', 'loadtest.standin', '--workdir', workdir, '--port', str(port),
+               '--history-hours', str(args.history_hours), '--ingest-interval', str(args.ingest_interval)]
+    process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, env=env,
+                               cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    url = f'http://127.0.0.1:{port}'
+    print(f"Starting the stand-in dashboard with {args.history_hours:g} h of history per sensor "
+          f"(log: {log.name})")
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"The stand-in dashboard exited with code {process.returncode}, see {log.name}")
+        try:
+            fetch_json(f'{url}/health', timeout=2.0)
+            return process, url
+        except (OSError, urllib.error.URLError, ValueError):
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"The stand-in dashboard was not ready within {args.startup_timeout:g}s, see {log.name}")
+
+
+def report(recorder: Recorder, seconds: float, cpu: float | None, client_cpu: float,
+           server_stats: dict | None) -> dict:
+    """Prints the results of the measured window and returns them."""
+    results = {'seconds': round(seconds, 2), 'requests': {}}
+    print(f"\n{'request':<22} {'count':>7} {'req/s':>7} {'errors':>7} {'204':>6} "
+          f"{'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    every = []
+    total_errors = 0
+    for kind in sorted(recorder.latencies):
+        latencies = sorted(recorder.latencies[kind])
+        every.extend(latencies)
+        outcomes = recorder.outcomes[kind]
+        errors = sum(count for outcome, count in outcomes.items() if outcome not in ('ok', 'unchanged'))
+        total_errors += errors
+        row = {'count': len(latencies), 'per_second': round(len(latencies) / seconds, 2),
+               'error_rate': round(errors / len(latencies), 4), 'unchanged': outcomes.get('unchanged', 0),
+               'outcomes': outcomes,
+               **{name: round(percentile(latencies, fraction) * 1000, 1)
+                  for name, fraction in (('p50_ms', 0.5), ('p95_ms', 0.95), ('p99_ms', 0.99))},
+               'max_ms': round(latencies[-1] * 1000, 1)}
+        results['requests'][kind] = row
+        print(f"{kind:<22} {row['count']:>7} {row['per_second']:>7.1f} {row['error_rate']:>7.1%} "
+              f"{row['unchanged']:>6} {row['p50_ms']:>7.1f}ms {row['p95_ms']:>7.1f}ms {row['p99_ms']:>7.1f}ms "
+              f"{row['max_ms']:>7.1f}ms")
+    if every:
+        every.sort()
+        results.update(count=len(every), per_second=round(len(every) / seconds, 2),
+                       error_rate=round(total_errors / len(every), 4),
+                       p50_ms=round(percentile(every, 0.5) * 1000, 1), p99_ms=round(percentile(every, 0.99) * 1000, 1))
+        print(f"{'all':<22} {len(every):>7} {results['per_second']:>7.1f} {results['error_rate']:>7.1%} "
+              f"{'':>6} {results['p50_ms']:>7.1f}ms {'':>9} {results['p99_ms']:>7.1f}ms")
+        errors = {outcome: count for outcomes in recorder.outcomes.values()
+                  for outcome, count in outcomes.items() if outcome not in ('ok', 'unchanged')}
+        if errors:
+            print(f"Errors: {', '.join(f'{outcome} x{count}' for outcome, count in sorted(errors.items()))}")
+
+    if cpu is not None:
+        results['server_cpu'] = round(cpu / seconds, 3)
+        print(f"\nServer CPU: {cpu:.1f}s over {seconds:.1f}s, {cpu / seconds:.2f} cores on average")
+    results['client_cpu'] = round(client_cpu / seconds, 3)
+    print(f"Load generator CPU: {client_cpu / seconds:.2f} cores on average"
+          + (" (close to one core: the load generator may be the bottleneck)" if client_cpu / seconds > 0.8 else ""))
+
+    if server_stats:
+        results['server_callbacks'] = {}
+        print(f"\n{'server callback':<28} {'calls':>7} {'wall p50':>10} {'wall p99':>10} {'db p50':>9} "
+              f"{'db p99':>9} {'bytes p50':>10}")
+        for name, stats in server_stats['callbacks'].items():
+            if not stats['wall_ms'].get('count'):
+                continue
+            row = {key: stats[metric].get(percent) for key, metric, percent in (
+                ('wall_p50_ms', 'wall_ms', 'p50'), ('wall_p99_ms', 'wall_ms', 'p99'), ('db_p50_ms', 'db_ms', 'p50'),
+                ('db_p99_ms', 'db_ms', 'p99'), ('bytes_p50', 'response_bytes', 'p50'))}
+            row['calls'] = stats['calls']
+            results['server_callbacks'][name] = row
+            print(f"{name:<28} {row['calls']:>7} {row['wall_p50_ms']:>8.1f}ms {row['wall_p99_ms']:>8.1f}ms "
+                  f"{row['db_p50_ms']:>7.1f}ms {row['db_p99_ms']:>7.1f}ms {row['bytes_p50'] or 0:>10}")
+    return results
+
+
+def main() -> None:
+    """Parses the command line, runs the sessions and prints the report."""
+    parser = argparse.ArgumentParser(description="Load test the dashboard with concurrent simulated sessions.")
+    parser.add_argument('--url', help="Dashboard to test. Default: start a local stand-in on a seeded SQLite file.")
+    parser.add_argument('--sessions', type=int, default=20, help="Concurrent sessions (default: 20).")
+    parser.add_argument('--duration', type=float, default=60.0, help="Measured seconds after the ramp-up (default: 60).")
+    parser.add_argument('--ramp-up', type=float, default=10.0,
+                        help="Seconds over which the sessions start, not measured (default: 10).")
+    parser.add_argument('--devices', default=','.join(SENSORS),
+                        help="Weights of the selected sensors, e.g. temperature_sensor:3,pressure_sensor:1.")
+    parser.add_argument('--intervals', default='5min:2,15min:2,1h:3,12h:1,1d:1,5d:0.5,1M:0.5',
+                        help=f"Weights of the selected time intervals ({', '.join(TIME_INTERVALS)}).")
+    parser.add_argument('--fleet-share', type=float, default=0.2,
+                        help="Share of the sessions on the fleet overview (default: 0.2).")
+    parser.add_argument('--experiments-share', type=float, default=0.1,
+                        help="Share of the sessions on the experiments tab (default: 0.1).")
+    parser.add_argument('--overlay-share', type=float, default=0.2,
+                        help="Share of the sensor views overlaying a second sensor (default: 0.2).")
+    parser.add_argument('--switch-every', type=float, default=60.0,
+                        help="Mean seconds between two changes of a session's sensor view, 0 for never (default: 60).")
+    parser.add_argument('--refresh-interval', type=float, default=2.0,
+                        help="Seconds between two refreshes of the sensor view; 2 while polling, 10 with the "
+                             "event stream connected (default: 2).")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the session behaviour (default: 0).")
+    parser.add_argument('--server-pid', type=int, help="With --url, the server process whose CPU is reported.")
+    parser.add_argument('--admin-token', default=os.getenv("ADMIN_TOKEN"),
+                        help="With --url, ADMIN_TOKEN of the server to report its callback statistics.")
+    parser.add_argument('--history-hours', type=float, default=24.0,
+                        help="Stand-in only: synthetic history per sensor (default: 24).")
+    parser.add_argument('--ingest-interval', type=float, default=1.0,
+                        help="Stand-in only: seconds between two live measurements per sensor (default: 1).")
+    parser.add_argument('--startup-timeout', type=float, default=180.0,
+                        help="Stand-in only: seconds to wait for the server (default: 180).")
+    parser.add_argument('--json', help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+    if args.sessions < 1 or args.duration <= 0:
+        parser.error("--sessions and --duration must be positive")
+    if args.fleet_share + args.experiments_share > 1:
+        parser.error("--fleet-share and --experiments-share must add up to at most 1")
+    try:
+        mix = Mix(devices=Mix.parse_weights(args.devices, SENSORS),
+                  intervals=Mix.parse_weights(args.intervals, TIME_INTERVALS),
+                  fleet_share=args.fleet_share, experiments_share=args.experiments_share, overlay_share=args.overlay_share, switch_every=args.switch_every,
+                  refresh_interval=args.refresh_interval)
+    except ValueError as e:
+        parser.error(str(e))
+
+    process = workdir = None
+    url, server_pid, token = args.url, args.server_pid, args.admin_token
+    if url is None:
+        workdir = tempfile.TemporaryDirectory(prefix='loadtest-')
+        token = secrets.token_hex(16)
+        process, url = start_standin(args, workdir.name, token)
+        server_pid = process.pid
+
+    try:
+        try:
+            dependencies = fetch_json(f'{url}/_dash-dependencies')
+        except (OSError, urllib.error.URLError) as e:
+            sys.exit(f"Cannot load the callbacks of {url}: {e}")
+        if token:
+            try:
+                fetch_json(f'{url}/admin/callbacks', token)
+            except (OSError, urllib.error.URLError) as e:
+                print(f"No server callback statistics, /admin/callbacks failed: {e}")
+                token = None
+
+        started = time.monotonic()
+        recorder = Recorder(measure_from=started + args.ramp_up)
+        stop_event = threading.Event()
+        threads = []
+        for number in range(args.sessions):
+            session = Session(number, url, dependencies, mix, recorder, stop_event, seed=args.seed)
+            thread = threading.Thread(target=session.run, args=(args.ramp_up * number / args.sessions,),
+                                      name=f'session-{number}', daemon=True)
+            thread.start()
+            threads.append(thread)
+        print(f"{args.sessions} sessions against {url}: {args.ramp_up:g}s ramp-up, {args.duration:g}s measured")
+
+        time.sleep(max(recorder.measure_from - time.monotonic(), 0.0))
+        cpu_before, client_before = process_tree_cpu(server_pid) if server_pid else None, time.process_time()
+        measured_from = time.monotonic()
+        time.sleep(args.duration)
+        cpu_after, client_after = process_tree_cpu(server_pid) if server_pid else None, time.process_time()
+        seconds = time.monotonic() - measured_from
+        stop_event.set()
+        for thread in threads:
+            thread.join(timeout=35.0)
+
+        server_stats = None
+        if token:
+            server_stats = fetch_json(f'{url}/admin/callbacks', token)
+            if args.url is not None:
+                print(f"\nThe server callback statistics are those of worker {server_stats['pid']}: its last 1000 "
+                      f"invocations per callback, including traffic before this run")
+        cpu = cpu_after - cpu_before if cpu_before is not None and cpu_after is not None else None
+        results = report(recorder, seconds, cpu, client_after - client_before, server_stats)
+        results.update(sessions=args.sessions, url=args.url or 'stand-in', warmup_requests=recorder.warmup_requests)
+        if args.json:
+            with open(args.json, 'w') as file:
+                json.dump(results, file, indent=2)
+            print(f"\nResults written to {args.json}")
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            workdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
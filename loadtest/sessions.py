@@ -0,0 +1,304 @@
+"""
+Simulated dashboard sessions.
+
+A session behaves like a browser tab left open on the dashboard: it loads the
+page, renders its tab and then sends the callback requests of the interval
+components, carrying the state the responses return (e.g. refresh-versions)
+into the next request like the Dash renderer does. The request bodies are
+built from the server's /_dash-dependencies, so they match the deployed
+callbacks.
+"""
+import http.client
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any
+from urllib.parse import urlsplit
+
+# Component ids the sessions drive
+SENSOR_VIEW_TAB = 'tab1'
+EXPERIMENTS_TAB = 'tab3'
+FLEET_TAB = 'tab4'
+SENSORS = ('temperature_sensor', 'pressure_sensor', 'radiation_sensor')
+TIME_INTERVALS = ('5min', '15min', '1h', '12h', '1d', '5d', '1M')
+
+# Dash callbacks sent by the sessions, by the output they are identified with
+SENSOR_VIEW = 'refresh-versions.data'
+FLEET = 'fleet-tiles.children'
+EXPERIMENT_CONTROL = 'experiment1-state.data'
+EXPERIMENT_LOG = 'terminal_experiment.children'
+EXPERIMENT_STATES = ('experiment1-state', 'experiment2-state', 'experiment3-state')
+TAB = 'app-content.children'
+
+
+@dataclass
+class Mix:
+    """What the simulated users look at, as relative weights."""
+    devices: dict[str, float] = field(default_factory=lambda: dict.fromkeys(SENSORS, 1.0))
+    intervals: dict[str, float] = field(default_factory=lambda: {
+        '5min': 2.0, '15min': 2.0, '1h': 3.0, '12h': 1.0, '1d': 1.0, '5d': 0.5, '1M': 0.5})
+    fleet_share: float = 0.2  # Sessions on the fleet overview instead of the sensor view
+    experiments_share: float = 0.1  # Sessions on the experiments tab instead of the sensor view
+    overlay_share: float = 0.2  # Sensor views overlaying a second sensor
+    switch_every: float = 60.0  # Mean seconds between two changes of the sensor view, 0 for never
+    refresh_interval: float = 2.0  # refresh-update interval of the sensor view
+    fleet_interval: float = 5.0  # fleet-update interval of the fleet overview
+    experiment_interval: float = 1.0  # experiment-update interval of the experiments tab
+
+    @staticmethod
+    def parse_weights(text: str, choices: tuple[str, ...]) -> dict[str, float]:
+        """
+        Parses 'name:weight,name:weight' weights, a name without weight counts 1.
+
+        Raises:
+            ValueError: If a name is not one of choices.
+        """
+        weights = {}
+        for item in filter(None, (part.strip() for part in text.split(','))):
+            name, _, weight = item.partition(':')
+            if name not in choices:
+                raise ValueError(f"Unknown value {name}, expected one of {', '.join(choices)}")
+            weights[name] = float(weight or 1.0)
+        return weights
+
+
+class Recorder:
+    def __init__(self, measure_from: float) -> None:
+        """
+        Initialize the Recorder.
+
+        Collects the latency and outcome of every request started after
+        measure_from; earlier ones are the warm-up and only counted.
+
+        Args:
+            measure_from (float): time.monotonic() from which requests are measured.
+        """
+        self.measure_from = measure_from
+        self.latencies = {}  # kind -> seconds of every measured request
+        self.outcomes = {}  # kind -> {outcome: count}
+        self.warmup_requests = 0
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, started: float, seconds: float, outcome: str) -> None:
+        """Records one request: outcome is 'ok', 'unchanged' (204, PreventUpdate) or an error description."""
+        with self._lock:
+            if started < self.measure_from:
+                self.warmup_requests += 1
+                return
+            self.latencies.setdefault(kind, []).append(seconds)
+            outcomes = self.outcomes.setdefault(kind, {})
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+
+def split_outputs(output: str) -> dict[str, str] | list[dict[str, str]]:
+    """Turns the output string of a dependency into the outputs of a callback request."""
+    def spec(item):
+        component_id, _, prop = item.rpartition('.')
+        return {'id': component_id, 'property': prop}
+    if output.startswith('..'):
+        return [spec(item) for item in output[2:-2].split('...')]
+    return spec(output)
+
+
+class Session:
+    def __init__(self, number: int, url: str, dependencies: list[dict[str, Any]], mix: Mix,
+                 recorder: Recorder, stop_event: threading.Event, seed: int = 0, timeout: float = 30.0) -> None:
+        """
+        Initialize the Session.
+
+        Args:
+            number (int): Number of the session, part of its random seed.
+            url (str): Base URL of the dashboard.
+            dependencies (list[dict[str, Any]]): The server's /_dash-dependencies.
+            mix (Mix): What the simulated users look at.
+            recorder (Recorder): Collects the requests.
+            stop_event (threading.Event): Ends the session when set.
+            seed (int, optional): Seed of the run. Defaults to 0.
+            timeout (float, optional): Seconds a request may take. Defaults to 30.
+        """
+        self.url = urlsplit(url)
+        self.dependencies = {dependency['output']: dependency for dependency in dependencies}
+        self.mix = mix
+        self.recorder = recorder
+        self.stop_event = stop_event
+        self.timeout = timeout
+        self.random = random.Random(f"{seed}-{number}")
+        self.connection = None
+        self.versions = {}
+        self.device = self.time_interval = None
+        self.overlays = []
+
+    # HTTP __________________________________________________________________________________________
+    def request(self, kind: str, method: str, path: str, body: dict | None = None) -> tuple[int, bytes]:
+        """
+        Sends a request over the session's keep-alive connection and records it.
+
+        Returns:
+            tuple[int, bytes]: Status and body of the response, status 0 if the request failed.
+        """
+        payload = None if body is None else json.dumps(body).encode()
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        started = time.monotonic()
+        try:
+            if self.connection is None:
+                connection_class = (http.client.HTTPSConnection if self.url.scheme == 'https'
+                                    else http.client.HTTPConnection)
+                self.connection = connection_class(self.url.netloc, timeout=self.timeout)
+            self.connection.request(method, self.url.path.rstrip('/') + path, payload, headers)
+            response = self.connection.getresponse()
+            data = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException) as e:
+            # Reconnect on the next request, like a browser would
+            if self.connection is not None:
+                self.connection.close()
+            self.connection = None
+            self.recorder.record(kind, started, time.monotonic() - started, e.__class__.__name__)
+            return 0, b''
+        if status == 204:
+            outcome = 'unchanged'
+        elif status < 400:
+            outcome = 'ok'
+        else:
+            outcome = f'HTTP {status}'
+        self.recorder.record(kind, started, time.monotonic() - started, outcome)
+        return status, data
+
+    def callback(self, kind: str, output: str, values: dict[str, Any], changed: list[str]) -> dict | None:
+        """
+        Sends a callback request.
+
+        Args:
+            kind (str): Label of the request in the report.
+            output (str): Output string of the callback's dependency.
+            values (dict[str, Any]): Values of its inputs and state by 'id.property'; missing ones are None.
+            changed (list[str]): The 'id.property' of the inputs that triggered it.
+
+        Returns:
+            dict | None: The response's outputs by component id, None if nothing was returned.
+        """
+        dependency = self.dependencies[output]
+
+        def with_values(items):
+            return [{**item, 'value': values.get(f"{item['id']}.{item['property']}")} for item in items]
+        body = {'output': output, 'outputs': split_outputs(output), 'inputs': with_values(dependency['inputs']),
+                'state': with_values(dependency['state']), 'changedPropIds': changed}
+        status, data = self.request(kind, 'POST', '/_dash-update-component', body)
+        if status != 200:
+            return None
+        return json.loads(data).get('response')
+
+    def find_output(self, suffix: str) -> str:
+        """Returns the output string of the dependency with the given output, also as part of a multi output."""
+        for output in self.dependencies:
+            if output == suffix or f'.{suffix}' in output or output.startswith(f'..{suffix}'):
+                return output
+        raise KeyError(f"The server has no callback with output {suffix}")
+
+    # Behaviour _____________________________________________________________________________________
+    def choose_view(self) -> None:
+        """Picks the device, time interval and overlays shown by the sensor view."""
+        def pick(weights):
+            names = [name for name, weight in weights.items() if weight > 0]
+            return self.random.choices(names, weights=[weights[name] for name in names])[0]
+        self.device = pick(self.mix.devices)
+        self.time_interval = pick(self.mix.intervals)
+        self.overlays = []
+        if self.random.random() < self.mix.overlay_share:
+            self.overlays = [self.random.choice([name for name in SENSORS if name != self.device])]
+
+    def run(self, start_delay: float = 0.0) -> None:
+        """Loads the dashboard and keeps refreshing it until the stop event is set."""
+        if self.stop_event.wait(start_delay):
+            return
+        try:
+            self.request('page', 'GET', '/')
+            self.request('layout', 'GET', '/_dash-layout')
+            draw = self.random.random()
+            if draw < self.mix.fleet_share:
+                tab, run = FLEET_TAB, self.run_fleet
+            elif draw < self.mix.fleet_share + self.mix.experiments_share:
+                tab, run = EXPERIMENTS_TAB, self.run_experiments
+            else:
+                tab, run = SENSOR_VIEW_TAB, self.run_sensor_view
+            self.callback('render_tab_content', self.find_output(TAB), {'app-tabs.value': tab}, ['app-tabs.value'])
+            run()
+        finally:
+            if self.connection is not None:
+                self.connection.close()
+
+    def run_sensor_view(self) -> None:
+        """Sends the refresh-update callback of the sensor view every refresh interval."""
+        sensor_view = self.find_output(SENSOR_VIEW)
+        self.choose_view()
+        n_intervals = 0
+        next_switch = self.next_switch()
+        changed = ['device-selector.value']
+        deadline = time.monotonic()
+        while not self.stop_event.is_set():
+            values = {'refresh-update.n_intervals': n_intervals, 'device-selector.value': self.device,
+                      'time-interval.value': self.time_interval, 'overlay-sensors.value': self.overlays,
+                      'refresh-versions.data': self.versions}
+            response = self.callback('refresh_sensor_view', sensor_view, values, changed)
+            if response and 'refresh-versions' in response:
+                self.versions = response['refresh-versions']['data']
+
+            # A slow response delays the next tick, the interval does not fire again to catch up
+            deadline = max(deadline + self.mix.refresh_interval, time.monotonic())
+            if self.stop_event.wait(deadline - time.monotonic()):
+                break
+            n_intervals += 1
+            changed = ['refresh-update.n_intervals']
+            if time.monotonic() >= next_switch:
+                self.choose_view()
+                changed = ['device-selector.value', 'time-interval.value']
+                next_switch = self.next_switch()
+
+    def run_fleet(self) -> None:
+        """Sends the fleet-update callback of the fleet overview every fleet interval."""
+        fleet = self.find_output(FLEET)
+        n_intervals = 0
+        deadline = time.monotonic()
+        while not self.stop_event.is_set():
+            self.callback('update_fleet', fleet, {'fleet-update.n_intervals': n_intervals},
+                          ['fleet-update.n_intervals'])
+            deadline = max(deadline + self.mix.fleet_interval, time.monotonic())
+            if self.stop_event.wait(deadline - time.monotonic()):
+                break
+            n_intervals += 1
+
+    def run_experiments(self) -> None:
+        """
+        Sends the experiment-update callbacks of the experiments tab every experiment interval.
+
+        Like the browser, the tick first reads the experiment states, then the
+        terminal with the states and log version the previous responses returned.
+        """
+        control, log = self.find_output(EXPERIMENT_CONTROL), self.find_output(EXPERIMENT_LOG)
+        states = dict.fromkeys(EXPERIMENT_STATES, {'running': False, 'bias': False, 'failure': False})
+        log_version = None
+        n_intervals = 0
+        deadline = time.monotonic()
+        while not self.stop_event.is_set():
+            values = {'experiment-update.n_intervals': n_intervals, 'experiment-log-version.data': log_version,
+                      **{f'{state}.data': data for state, data in states.items()}}
+            response = self.callback('control_experiments', control, values, ['experiment-update.n_intervals'])
+            if response:
+                states.update({state: response[state]['data'] for state in EXPERIMENT_STATES if state in response})
+                values.update({f'{state}.data': data for state, data in states.items()})
+            response = self.callback('refresh_experiment_log', log, values, ['experiment-update.n_intervals'])
+            if response and 'experiment-log-version' in response:
+                log_version = response['experiment-log-version']['data']
+
+            deadline = max(deadline + self.mix.experiment_interval, time.monotonic())
+            if self.stop_event.wait(deadline - time.monotonic()):
+                break
+            n_intervals += 1
+
+    def next_switch(self) -> float:
+        """Monotonic time of the next change of the sensor view."""
+        if self.mix.switch_every <= 0:
+            return float('inf')
+        return time.monotonic() + self.random.expovariate(1 / self.mix.switch_every)
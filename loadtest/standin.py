@@ -0,0 +1,114 @@
+"""
+Local stand-in of a production dashboard for the load tests.
+
+Serves the dashboard on an embedded SQLite file seeded with a synthetic
+history of every sensor, while the sensors keep measuring synthetic values, so
+the version-gated callbacks see new data like in production. Everything the
+sensors write (database, CSV logs, data files) goes to the working directory
+instead of logs/.
+
+Usage:
+    python -m loadtest.standin --workdir /tmp/loadtest [--port 8050] [--history-hours 24]
+"""
+import argparse
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+def seed_history(store, database, sensors: dict, hours: float, step: float, seed: int = 0) -> int:
+    """
+    Inserts a synthetic history ending now for every sensor.
+
+    Values are normally distributed around the middle of the sensor's control
+    limits, so about 1% of them are out of control.
+
+    Args:
+        store (MeasurementStore): The store to insert into.
+        database (Database): The database of the store, flushed at the end.
+        sensors (dict): The sensors by name.
+        hours (float): Length of the history.
+        step (float): Seconds between two measurements.
+        seed (int, optional): Seed of the values. Defaults to 0.
+
+    Returns:
+        int: Number of measurements inserted.
+    """
+    rng = random.Random(seed)
+    rows = int(hours * 3600 / step)
+    end = datetime.now()
+    for name, sensor in sensors.items():
+        middle, sigma = (sensor.ucl + sensor.lcl) / 2, (sensor.ucl - sensor.lcl) / 2 / 2.6
+        for index in range(rows, 0, -1):
+            timestamp = end - timedelta(seconds=index * step)
+            store.insert(name, round(rng.gauss(middle, sigma), 2), timestamp, timestamp)
+        print(f"Seeded {rows} measurements of {name}")
+    database.flush()
+    return rows * len(sensors)
+
+
+def feed(sensors: dict, interval: float, stop_event: threading.Event, seed: int = 1) -> None:
+    """Ingests a synthetic measurement into every sensor each interval seconds until stop_event is set."""
+    rng = random.Random(seed)
+    while not stop_event.wait(interval):
+        for sensor in sensors.values():
+            middle, sigma = (sensor.ucl + sensor.lcl) / 2, (sensor.ucl - sensor.lcl) / 2 / 2.6
+            sensor.ingest(round(rng.gauss(middle, sigma), 2), datetime.now())
+
+
+def main() -> None:
+    """Parses the command line, seeds the database and serves the dashboard until interrupted."""
+    parser = argparse.ArgumentParser(description="Serve the dashboard on a seeded local SQLite database.")
+    parser.add_argument('--workdir', required=True, help="Directory for the database, CSV logs and data files.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--history-hours', type=float, default=24.0, help="Synthetic history per sensor (default: 24).")
+    parser.add_argument('--history-step', type=float, default=1.0,
+                        help="Seconds between two historical measurements (default: 1).")
+    parser.add_argument('--ingest-interval', type=float, default=1.0,
+                        help="Seconds between two live measurements per sensor, 0 for none (default: 1).")
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    # Read by app at import time
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(args.workdir, 'loadtest.db')}"
+    os.environ.pop("CONTROL_PLANE_ADDRESS", None)
+
+    from werkzeug.serving import make_server
+
+    import app
+
+    control = app.control.get()
+    for sensor in control.sensors.values():
+        sensor.log_file = os.path.join(args.workdir, f'{sensor.name}.csv')
+        sensor.data_file = os.path.join(args.workdir, os.path.basename(sensor.data_file))
+        open(sensor.data_file, 'w').close()  # Empty, the measurements are ingested directly
+
+    started = time.perf_counter()
+    rows = seed_history(app.store, app.database, control.sensors, args.history_hours, args.history_step)
+    print(f"Seeded {rows} measurements in {time.perf_counter() - started:.1f}s")
+
+    stop_event = threading.Event()
+    if args.ingest_interval > 0:
+        for name in control.sensors:
+            control.sensor_command(name, 'start')
+            control.sensor_command(name, 'start_measuring')
+        threading.Thread(target=feed, args=(control.sensors, args.ingest_interval, stop_event),
+                         name='loadtest-feed', daemon=True).start()
+
+    server = make_server(args.host, args.port, app.server, threaded=True)
+    print(f"Serving the dashboard on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
+        control.shutdown()
+        app.database.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Builds the ingest side like the ingest daemon does and prints the heavy modules it loaded
+PROGRAM = """
+import sys
+from datetime import datetime
+
+import device_app.ingest_daemon
+from device_app.control_plane import ControlPlane
+from device_app.database import open_database
+from device_app.storage import open_store
+
+database = open_database(sys.argv[1])
+store = open_store(database, layout=sys.argv[2])
+control = ControlPlane(store)
+for name in control.sensor_names():
+    store.insert(name, 1.0, datetime.now(), datetime.now())
+database.dispose()
+print(sorted(name for name in ('pandas', 'numpy', 'dash', 'plotly') if name in sys.modules))
+"""
+
+
+@pytest.mark.parametrize('layout', ['per_sensor', 'narrow'])
+def test_ingest_side_does_not_import_pandas(tmp_path, layout):
+    result = subprocess.run(
+        [sys.executable, '-c', PROGRAM, f"sqlite:///{tmp_path / 'sensors.db'}", layout],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    assert result.stdout.strip().splitlines()[-1] == '[]'
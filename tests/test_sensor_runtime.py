@@ -0,0 +1,48 @@
+import threading
+import time
+from datetime import datetime
+
+from device_app.sensor1 import TemperatureSensor
+from device_app.sensor_runtime import SensorState
+
+
+class RecordingStore:
+    """Measurement store recording the sensor's state at every insert, slow enough to overlap a stop."""
+
+    def __init__(self) -> None:
+        self.sensor = None
+        self.states = []
+
+    def create(self, sensor_name, data_column):
+        pass
+
+    def insert(self, sensor_name, value, timestamp_measured, timestamp_logged):
+        time.sleep(0.001)
+        self.states.append(self.sensor.state)
+
+
+def test_no_measurement_is_ingested_after_stop_measuring(tmp_path):
+    store = RecordingStore()
+    sensor = TemperatureSensor('temperature_sensor', store=store)
+    store.sensor = sensor
+    sensor.data_file = str(tmp_path / 'data.txt')
+    sensor.log_file = str(tmp_path / 'temperature_sensor.csv')
+    sensor.start()
+    sensor.start_measuring()
+
+    ingesting = threading.Event()
+
+    def ingest():
+        while sensor.ingest(42.0, datetime.now()):
+            ingesting.set()
+
+    threads = [threading.Thread(target=ingest) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    ingesting.wait(5)
+    sensor.stop_measuring()
+    for thread in threads:
+        thread.join(5)
+
+    assert store.states
+    assert set(store.states) == {SensorState.MEASURING}
@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+from device_app.database import open_database
+from device_app.storage import NarrowTableStore, PerSensorTableStore
+
+
+def test_fetch_fleet_finds_tables_created_by_another_store(tmp_path):
+    # The controller creates the tables and writes the measurements
+    url = f"sqlite:///{tmp_path / 'sensors.db'}"
+    writer_db = open_database(url)
+    writer = PerSensorTableStore(writer_db)
+    writer.create('temperature_sensor', 'temperature')
+    writer.create('pressure_sensor', 'pressure')
+    now = datetime.now()
+    writer.insert('temperature_sensor', 42.0, now, now)
+    writer.insert('pressure_sensor', 1.5, now, now)
+    writer_db.dispose()
+
+    # A dashboard worker opens its own store on the same database without creating anything
+    reader_db = open_database(url)
+    try:
+        fleet = PerSensorTableStore(reader_db).fetch_fleet(since=now - timedelta(minutes=1))
+    finally:
+        reader_db.dispose()
+
+    assert list(fleet.columns) == ['name', 'timestamp_measured', 'value']
+    assert sorted(zip(fleet['name'], fleet['value'])) == [('pressure_sensor', 1.5), ('temperature_sensor', 42.0)]
+
+
+def test_existing_narrow_table_keeps_its_timestamp_logged_setting(tmp_path, capsys):
+    url = f"sqlite:///{tmp_path / 'sensors.db'}"
+    db = open_database(url)
+    NarrowTableStore(db, keep_logged=False).create('temperature_sensor', 'temperature')
+
+    # Reopened with the other setting, the table created without ts_logged wins
+    store = NarrowTableStore(db, keep_logged=True)
+    store.create('temperature_sensor', 'temperature')
+    now = datetime.now()
+    store.insert('temperature_sensor', 42.0, now, now)
+    window = store.fetch_window('temperature_sensor', 'temperature')
+    db.dispose()
+
+    assert store.keep_logged is False
+    assert 'STORAGE_KEEP_LOGGED=1 is ignored' in capsys.readouterr().out
+    assert list(window['temperature']) == [42.0]